@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# hadoop-scripts/approx_analytics.py - Analyses approchées par sketches fusionnables
+"""
+Mode approché (opt-in) pour les rapports à grande échelle : clients
+distincts et quantiles de la valeur des commandes sans COUNT(DISTINCT) ni
+tri global.
+
+Deux niveaux :
+- dans la requête : approx_count_distinct et percentile_approx de Spark ;
+- sketches journaliers stockés en Parquet à côté des agrégats du jour,
+  fusionnés ensuite en chiffres mensuels ou globaux sans relire les ventes.
+
+Sketches (colonnes Spark natives, sans UDF Python) :
+- HyperLogLog : registres creux (day, register, rank), fusion = max du rang.
+  Erreur type relative 1.04 / sqrt(2^precision), soit 1,6 % en précision 12 ;
+- quantiles à erreur relative (type DDSketch) : compteurs par bucket
+  logarithmique (day, bucket, count), fusion = somme. Toute valeur estimée
+  est à ±alpha (relatif) de la valeur exacte de même rang.
+
+La fusion est exacte : les registres/compteurs fusionnés depuis les jours
+sont identiques à ceux calculés directement sur le mois.
+
+Usage:
+    python3 approx_analytics.py                         # sketches + rapport mensuel
+    python3 approx_analytics.py --skip-build --level all
+    python3 approx_analytics.py --compare               # + exact et approx_* : erreurs, durées
+"""
+import argparse
+import json
+import math
+import os
+
+from pyspark.sql import SparkSession, Window
+from pyspark.sql import functions as F
+
+from ingest_parquet import HDFS, read_sales
+from stage_metrics import run_measured
+
+SALES_SKETCHES = f"{HDFS}/data/sales_sketches"
+
+# Paramètres des sketches : identiques à la construction et à la fusion
+HLL_PRECISION = int(os.environ.get("APPROX_HLL_PRECISION", "12"))
+QUANTILE_ALPHA = float(os.environ.get("APPROX_QUANTILE_ALPHA", "0.01"))
+
+# Paramètres des fonctions approchées de Spark
+APPROX_RSD = 0.02
+PERCENTILE_ACCURACY = 10000
+
+QUANTILES = [0.5, 0.9, 0.99]
+
+# Bucket des valeurs nulles ou négatives (estimées à 0)
+ZERO_BUCKET = -(1 << 30)
+
+# Granularité du rapport -> expression de la période à partir de `day`
+LEVELS = {
+    "day": lambda: F.date_format("day", "yyyy-MM-dd"),
+    "month": lambda: F.date_format("day", "yyyy-MM"),
+    "all": lambda: F.lit("all"),
+}
+
+
+def hll_error(precision=HLL_PRECISION):
+    """Erreur type relative de HyperLogLog"""
+    return 1.04 / math.sqrt(1 << precision)
+
+
+def quantile_column(q):
+    return f"p{int(round(q * 100))}"
+
+
+def sale_values(sales):
+    """Ventes réduites aux colonnes des sketches : day, customer_id, quantity, value"""
+    value = F.col("total_value") if "total_value" in sales.columns \
+        else F.col("quantity") * F.col("price")
+    return sales.select(
+        F.col("date").cast("date").alias("day"),
+        F.col("customer_id"),
+        F.col("quantity"),
+        value.alias("value"),
+    )
+
+
+def hll_registers(sales, group_columns, precision=HLL_PRECISION):
+    """Registres HLL creux de customer_id : (groupes..., register, rank)"""
+    h = F.xxhash64("customer_id")
+    # p bits de poids fort : registre ; rang : zéros de tête du reste + 1
+    register = F.shiftrightunsigned(h, 64 - precision).cast("int")
+    rest = F.shiftleft(h, precision)
+    rank = F.least(F.lit(65) - F.length(F.bin(rest)), F.lit(64 - precision + 1))
+    return sales.filter(F.col("customer_id").isNotNull()) \
+        .select(*group_columns, register.alias("register"), rank.cast("byte").alias("rank")) \
+        .groupBy(*group_columns, "register") \
+        .agg(F.max("rank").alias("rank"))
+
+
+def merge_hll(registers, group_columns):
+    """Fusion de registres (max du rang par registre)"""
+    return registers.groupBy(*group_columns, "register").agg(F.max("rank").alias("rank"))
+
+
+def hll_estimate(registers, group_columns, precision=HLL_PRECISION):
+    """Cardinalité estimée par groupe (même formule que webapp/stats_engine.py)"""
+    m = 1 << precision
+    alpha = 0.7213 / (1 + 1.079 / m)
+    summary = registers.groupBy(*group_columns).agg(
+        F.count("*").alias("present"),
+        F.sum(F.pow(F.lit(2.0), -F.col("rank"))).alias("harmonic"),
+    )
+    empty = F.lit(m) - F.col("present")
+    raw = F.lit(alpha * m * m) / (F.col("harmonic") + empty)
+    # Petites cardinalités : linear counting tant qu'il reste des registres vides
+    estimate = F.when((raw <= 2.5 * m) & (empty > 0), F.lit(m) * F.log(F.lit(m) / empty)) \
+        .otherwise(raw)
+    return summary.select(*group_columns, F.round(estimate).cast("long").alias("distinct_customers"))
+
+
+def quantile_buckets(sales, group_columns, alpha=QUANTILE_ALPHA):
+    """Compteurs par bucket logarithmique : (groupes..., bucket, count)"""
+    gamma = (1 + alpha) / (1 - alpha)
+    bucket = F.when(F.col("value") > 0, F.ceil(F.log(F.col("value")) / math.log(gamma))) \
+        .otherwise(F.lit(ZERO_BUCKET))
+    return sales.filter(F.col("value").isNotNull()) \
+        .groupBy(*group_columns, bucket.cast("int").alias("bucket")) \
+        .agg(F.count("*").alias("count"))
+
+
+def merge_buckets(buckets, group_columns):
+    """Fusion de compteurs (somme par bucket)"""
+    return buckets.groupBy(*group_columns, "bucket").agg(F.sum("count").alias("count"))
+
+
+def quantile_estimate(buckets, group_columns, quantiles=QUANTILES, alpha=QUANTILE_ALPHA):
+    """Quantiles estimés par groupe, définition de percentile_disc : première
+    valeur triée dont la fréquence cumulée atteint q"""
+    gamma = (1 + alpha) / (1 - alpha)
+    by_group = Window.partitionBy(*group_columns)
+    cumulative = by_group.orderBy("bucket").rowsBetween(Window.unboundedPreceding, Window.currentRow)
+    ranked = buckets \
+        .withColumn("cumulative", F.sum("count").over(cumulative)) \
+        .withColumn("total", F.sum("count").over(by_group))
+
+    def value_of(b):
+        return F.when(b == ZERO_BUCKET, F.lit(0.0)) \
+            .otherwise(F.lit(2.0) * F.pow(F.lit(gamma), b) / (gamma + 1))
+
+    # Premier bucket dont le cumul atteint q * n
+    firsts = [
+        F.min(F.when(F.col("cumulative") >= F.lit(q) * F.col("total"), F.col("bucket")))
+        .alias(quantile_column(q))
+        for q in quantiles
+    ]
+    return ranked.groupBy(*group_columns).agg(*firsts) \
+        .select(*group_columns, *[value_of(F.col(quantile_column(q))).alias(quantile_column(q))
+                                  for q in quantiles])
+
+
+def build_sketches(sales, target=SALES_SKETCHES, precision=HLL_PRECISION, alpha=QUANTILE_ALPHA):
+    """Agrégats et sketches journaliers, partitionnés par mois"""
+    prepared = sale_values(sales).withColumn("month", F.date_format("day", "yyyy-MM"))
+    daily = prepared.groupBy("month", "day").agg(
+        F.count("*").alias("orders"),
+        F.sum("quantity").alias("quantity"),
+        F.sum("value").alias("revenue"),
+    )
+    outputs = {
+        "daily": daily,
+        "hll": hll_registers(prepared, ["month", "day"], precision),
+        "quantiles": quantile_buckets(prepared, ["month", "day"], alpha),
+    }
+    for name, df in outputs.items():
+        df.write.mode("overwrite").partitionBy("month").parquet(f"{target}/{name}")
+    return {name: f"{target}/{name}" for name in outputs}
+
+
+def load_sketches(spark, source=SALES_SKETCHES):
+    return {name: spark.read.parquet(f"{source}/{name}") for name in ("daily", "hll", "quantiles")}
+
+
+def sketch_report(sketches, level="month", precision=HLL_PRECISION, alpha=QUANTILE_ALPHA,
+                  quantiles=QUANTILES):
+    """Rapport par période calculé uniquement à partir des sketches"""
+    period = LEVELS[level]().alias("period")
+    totals = sketches["daily"].groupBy(period).agg(
+        F.sum("orders").alias("orders"),
+        F.sum("revenue").alias("revenue"),
+    )
+    registers = merge_hll(sketches["hll"].select(period, "register", "rank"), ["period"])
+    buckets = merge_buckets(sketches["quantiles"].select(period, "bucket", "count"), ["period"])
+    return totals \
+        .join(hll_estimate(registers, ["period"], precision), "period") \
+        .join(quantile_estimate(buckets, ["period"], quantiles, alpha), "period") \
+        .orderBy("period")
+
+
+def _raw_report(sales, level, distinct, percentiles):
+    prepared = sale_values(sales)
+    return prepared.groupBy(LEVELS[level]().alias("period")).agg(
+        F.count("*").alias("orders"),
+        F.sum("value").alias("revenue"),
+        distinct.alias("distinct_customers"),
+        *[percentiles(q).alias(quantile_column(q)) for q in QUANTILES],
+    ).orderBy("period")
+
+
+def exact_report(sales, level="month"):
+    """Référence exacte : COUNT(DISTINCT) et percentile (tri complet par groupe)"""
+    return _raw_report(sales, level, F.countDistinct("customer_id"),
+                       lambda q: F.expr(f"percentile_disc({q}) WITHIN GROUP (ORDER BY value)"))
+
+
+def approx_report(sales, level="month", rsd=APPROX_RSD, accuracy=PERCENTILE_ACCURACY):
+    """Fonctions approchées de Spark sur les ventes brutes"""
+    return _raw_report(sales, level, F.approx_count_distinct("customer_id", rsd),
+                       lambda q: F.percentile_approx("value", q, accuracy))
+
+
+def relative_errors(report, reference, columns):
+    """Écart relatif maximal par colonne entre deux rapports (jointure sur period)"""
+    ref = reference.select("period", *[F.col(c).alias(f"ref_{c}") for c in columns])
+    joined = report.join(ref, "period")
+    errors = joined.agg(*[
+        F.max(F.abs(F.col(c) - F.col(f"ref_{c}")) / F.greatest(F.abs(F.col(f"ref_{c}")), F.lit(1e-12)))
+        .alias(c)
+        for c in columns
+    ]).first()
+    return {c: errors[c] for c in columns}
+
+
+def compare(spark, sales, sketches, level="month"):
+    """Durées et erreurs : exact, fonctions approchées, sketches stockés"""
+    columns = ["distinct_customers"] + [quantile_column(q) for q in QUANTILES]
+    reports = {
+        "exact": lambda: exact_report(sales, level),
+        "approx_functions": lambda: approx_report(sales, level),
+        "sketches": lambda: sketch_report(sketches, level),
+    }
+    results = {}
+    frames = {}
+    for name, build in reports.items():
+        frames[name] = build().cache()
+        _, elapsed, metrics = run_measured(spark, f"approx_{name}", frames[name].count)
+        results[name] = {
+            "wall_time_s": round(elapsed, 3),
+            "shuffle_bytes": metrics["shuffle_write_bytes"],
+        }
+    for name in ("approx_functions", "sketches"):
+        results[name]["max_relative_error"] = relative_errors(frames[name], frames["exact"], columns)
+    results["bounds"] = {
+        "hll_standard_error": round(hll_error(), 4),
+        "approx_count_distinct_rsd": APPROX_RSD,
+        "quantile_relative_error": QUANTILE_ALPHA,
+        "percentile_approx_rank_error": 1.0 / PERCENTILE_ACCURACY,
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyses approchées (HLL, quantiles)")
+    parser.add_argument("--source", help="Parquet des ventes (défaut : ingest_parquet.SALES_PARQUET)")
+    parser.add_argument("--sketches", default=SALES_SKETCHES)
+    parser.add_argument("--skip-build", action="store_true", help="Rapport depuis les sketches existants")
+    parser.add_argument("--level", choices=list(LEVELS), default="month")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--master", help="ex. local[*] hors cluster")
+    args = parser.parse_args()
+
+    builder = SparkSession.builder.appName("Sales-Approx-Analytics")
+    if args.master:
+        builder = builder.master(args.master)
+    spark = builder.getOrCreate()
+
+    try:
+        sales = read_sales(spark, args.source) if args.source else read_sales(spark)
+        if not args.skip_build:
+            paths = build_sketches(sales, args.sketches)
+            print(f"✓ Sketches journaliers écrits: {', '.join(paths.values())}")
+
+        sketches = load_sketches(spark, args.sketches)
+        print(f"=== Rapport approché ({args.level}, HLL ±{hll_error():.1%}, "
+              f"quantiles ±{QUANTILE_ALPHA:.0%}) ===")
+        sketch_report(sketches, args.level).show(50, truncate=False)
+
+        if args.compare:
+            print("=== Exact vs approx_* vs sketches ===")
+            print(json.dumps(compare(spark, sales, sketches, args.level), indent=2))
+    finally:
+        spark.stop()
+
+
+if __name__ == "__main__":
+    main()
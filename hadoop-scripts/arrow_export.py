@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# hadoop-scripts/arrow_export.py - Export des agrégats Spark en fichiers Arrow
+"""
+Les tables d'agrégats (petites) sont écrites en fichiers Arrow IPC (Feather
+v2) dans un répertoire partagé avec la webapp (./data monté sur /data et
+/app/data). La webapp les ouvre par memory-map : ni analyse de CSV ni copie,
+et les pages sont partagées entre les workers gunicorn via le cache de pages.
+
+- collecte par toPandas() avec spark.sql.execution.arrow.pyspark.enabled :
+  les partitions arrivent au driver en lots Arrow, sans sérialisation ligne
+  à ligne ;
+- fichiers non compressés : seule condition pour une lecture sans copie ;
+- écriture sous un nom temporaire puis renommage : un lecteur garde
+  l'ancienne version mappée jusqu'à sa prochaine ouverture ;
+- métadonnées du schéma : nom, source, date d'export, nombre de lignes.
+"""
+import os
+from datetime import datetime, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+ARROW_EXPORT_DIR = os.environ.get("ARROW_EXPORT_DIR", "/data/arrow")
+ARROW_SUFFIX = ".arrow"
+
+
+def to_arrow(df):
+    """DataFrame Spark -> pyarrow.Table, collecte en lots Arrow"""
+    spark = df.sparkSession
+    previous = spark.conf.get("spark.sql.execution.arrow.pyspark.enabled", "false")
+    spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", "true")
+    try:
+        pdf = df.toPandas()
+    finally:
+        spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", previous)
+    return pa.Table.from_pandas(pdf, preserve_index=False)
+
+
+def write_table(table, name, source, export_dir=ARROW_EXPORT_DIR):
+    """Écrit une table Arrow (non compressée) de façon atomique ; retourne le chemin"""
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, name + ARROW_SUFFIX)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    metadata = dict(table.schema.metadata or {})
+    # Métadonnées pandas inutiles pour les lecteurs Arrow
+    metadata.pop(b"pandas", None)
+    metadata.update({
+        b"table": name.encode("utf-8"),
+        b"source": source.encode("utf-8"),
+        b"exported_at": datetime.now(timezone.utc).isoformat().encode("utf-8"),
+        b"rows": str(table.num_rows).encode("utf-8"),
+    })
+    table = table.replace_schema_metadata(metadata)
+    try:
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def export_tables(tables, source, export_dir=ARROW_EXPORT_DIR):
+    """Exporte {nom: DataFrame Spark} ; retourne {nom: chemin} (vide sans pyarrow)"""
+    if not PYARROW_AVAILABLE:
+        print("⚠️ pyarrow absent: export Arrow ignoré")
+        return {}
+    return {name: write_table(to_arrow(df), name, source, export_dir)
+            for name, df in tables.items()}
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# hadoop-scripts/ingest_parquet.py - Ingestion CSV -> Parquet partitionné
+"""
+Convertit le CSV des ventes en Parquet partitionné par année/mois/région,
+avec un schéma explicite (pas d'inferSchema, donc pas de passe supplémentaire).
+Les jobs en aval lisent ce jeu de données et profitent du predicate pushdown
+(filtres sur les partitions et statistiques Parquet) et de l'élagage de
+colonnes.
+
+Usage:
+    python3 ingest_parquet.py                 # ingestion
+    python3 ingest_parquet.py --benchmark     # ingestion + comparaison CSV/Parquet
+"""
+import argparse
+import json
+
+from pyspark.sql import SparkSession
+from pyspark.sql.functions import col, month, sum as sum_, year
+
+from sales_schema import DATE_FORMAT, DELIMITER, spark_schema
+from stage_metrics import run_measured
+
+HDFS = "hdfs://hadoop-master:8020"
+SALES_CSV = f"{HDFS}/data/sales_data.csv"
+SALES_PARQUET = f"{HDFS}/data/sales_parquet"
+
+# Schéma déclaré dans data/sales_schema.json
+SALES_SCHEMA = spark_schema()
+
+PARTITION_COLUMNS = ["year", "month", "region"]
+
+
+def read_sales_csv(spark, path=SALES_CSV, header=True):
+    """Lecture du CSV avec le schéma déclaré (header=False : ventes préparées)"""
+    return spark.read \
+        .option("header", "true" if header else "false") \
+        .option("sep", DELIMITER) \
+        .option("dateFormat", DATE_FORMAT) \
+        .option("mode", "DROPMALFORMED") \
+        .schema(SALES_SCHEMA) \
+        .csv(path)
+
+
+def read_sales(spark, path=SALES_PARQUET):
+    """Lecture du jeu de ventes Parquet (colonnes year/month/region de partition)"""
+    return spark.read.parquet(path)
+
+
+def ingest(spark, source=SALES_CSV, target=SALES_PARQUET):
+    """CSV -> Parquet partitionné ; retourne le nombre de lignes écrites"""
+    sales = read_sales_csv(spark, source) \
+        .withColumn("total_value", col("quantity") * col("price")) \
+        .withColumn("year", year("date")) \
+        .withColumn("month", month("date"))
+
+    # Un fichier par partition plutôt qu'un fichier par tâche et par partition
+    sales.repartition(*PARTITION_COLUMNS) \
+        .write \
+        .mode("overwrite") \
+        .option("compression", "snappy") \
+        .partitionBy(*PARTITION_COLUMNS) \
+        .parquet(target)
+
+    return spark.read.parquet(target).count()
+
+
+def benchmark(spark, csv_path=SALES_CSV, parquet_path=SALES_PARQUET):
+    """Même requête (CA par catégorie sur un mois et une région) sur les deux formats"""
+    sample = read_sales(spark, parquet_path).select("year", "month", "region").first()
+    if sample is None:
+        return {}
+    y, m, r = sample["year"], sample["month"], sample["region"]
+
+    def csv_query():
+        # Chemin historique : inferSchema relit tout le fichier avant la requête
+        df = spark.read.option("header", "true").option("inferSchema", "true").csv(csv_path)
+        return df.filter((year("date") == y) & (month("date") == m) & (col("region") == r)) \
+            .groupBy("category").agg(sum_(col("quantity") * col("price")).alias("revenue")) \
+            .collect()
+
+    def parquet_query():
+        df = read_sales(spark, parquet_path)
+        return df.filter((col("year") == y) & (col("month") == m) & (col("region") == r)) \
+            .groupBy("category").agg(sum_("total_value").alias("revenue")) \
+            .collect()
+
+    results = {}
+    for name, action in (("csv_infer_schema", csv_query), ("parquet", parquet_query)):
+        _, elapsed, metrics = run_measured(spark, f"bench_{name}", action)
+        results[name] = {
+            "wall_time_s": round(elapsed, 3),
+            "scan_bytes": metrics["input_bytes"],
+            "scan_records": metrics["input_records"],
+            "jobs": metrics["jobs"],
+        }
+    results["filter"] = {"year": y, "month": m, "region": r}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion des ventes en Parquet")
+    parser.add_argument("--source", default=SALES_CSV)
+    parser.add_argument("--target", default=SALES_PARQUET)
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+
+    spark = SparkSession.builder \
+        .appName("Sales-Parquet-Ingestion") \
+        .config("spark.sql.adaptive.enabled", "true") \
+        .getOrCreate()
+
+    try:
+        rows = ingest(spark, args.source, args.target)
+        print(f"✓ {rows} ventes écrites en Parquet: {args.target}")
+
+        if args.benchmark:
+            print("=== Benchmark CSV (inferSchema) vs Parquet ===")
+            print(json.dumps(benchmark(spark, args.source, args.target), indent=2))
+    finally:
+        spark.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# hadoop-scripts/local_engine.py - Exécution locale (pandas/NumPy) des analyses Pig
+"""
+Exécute sans Hadoop les analyses de `sales_analysis.pig` (ex-
+`load_and_explore.pig` et `advanced_analysis.pig`) : résumé par catégorie, top 5 des produits, CA
+régional, ventes importantes, résumé mensuel et clients de valeur
+(> 1500). Le CSV est lu par blocs (mémoire bornée), les agrégations sont
+vectorisées.
+
+Les sorties reproduisent octet pour octet celles des STORE Pig
+(PigStorage(',')) :
+- types Pig du schéma partagé (data/sales_schema.json) : quantity * price
+  calculé dans le type de price (float ou double), SUM/AVG accumulés en
+  double dans l'ordre de lecture, SUM d'int en long ;
+- nombres formatés comme Float.toString / Double.toString de Java ;
+- groupes triés par octets UTF-8 de la clé (tri Hadoop), null en tête ;
+- fichiers part-r-00000 (jobs avec réduction) ou part-m-00000 (map seul)
+  et marqueur _SUCCESS.
+
+Hypothèses : un seul split d'entrée et un seul réducteur, ce que Pig
+choisit sous la taille d'un bloc HDFS (128 Mo). Au-delà, Pig additionne
+les sommes partielles de plusieurs splits dans un ordre non déterministe :
+les derniers chiffres des sommes flottantes peuvent différer.
+
+Usage:
+    python3 local_engine.py data/sales_data.csv --output-root /tmp/pig_local
+    python3 local_engine.py data/generated/*.csv --analyses category_analysis top_products
+    python3 local_engine.py sales_prepared/part-*.csv.bz2   # ventes préparées (bzip2, sans en-tête)
+"""
+import argparse
+import csv
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from sales_schema import DELIMITER, FIELDS as SALES_FIELDS, PIG_LOGICAL_TYPES, numpy_type
+
+# Type de price vu par Pig (data/sales_schema.json, pig_type) : float 32 bits ou double
+PRICE_DTYPE = np.dtype(numpy_type("price", pig=True))
+PRICE_KIND = PIG_LOGICAL_TYPES["price"]
+
+# Analyse -> (chemin du STORE Pig, fichier produit)
+STORE_PATHS = {
+    "category_analysis": ("output/category_analysis", "part-r-00000"),
+    "top_products": ("output/top_products", "part-r-00000"),
+    "regional_analysis": ("output/regional_analysis", "part-r-00000"),
+    "high_value_sales": ("output/high_value_sales", "part-m-00000"),
+    "monthly_analysis": ("output/monthly_analysis", "part-r-00000"),
+    "valuable_customers": ("output/valuable_customers", "part-r-00000"),
+}
+
+DEFAULT_CHUNKSIZE = 1_000_000
+HIGH_VALUE_THRESHOLD = 1000
+VALUABLE_CUSTOMER_THRESHOLD = 1500
+TOP_PRODUCTS = 5
+
+
+# ---------------------------------------------------------------- formatage Java
+
+def java_number(value, float32=False):
+    """Float.toString / Double.toString de Java
+
+    Chiffres : plus courte représentation qui relit la même valeur (en
+    simple précision pour un float). Notation décimale entre 1e-3 et 1e7,
+    sinon scientifique (1.0E7, 1.5E-4).
+    """
+    if value is None:
+        return ""
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "Infinity" if value > 0 else "-Infinity"
+    if value == 0:
+        return "-0.0" if math.copysign(1.0, value) < 0 else "0.0"
+    number = np.float32(value) if float32 else np.float64(value)
+    mantissa, exponent = np.format_float_scientific(number, unique=True, trim="-").split("e")
+    exponent = int(exponent)
+    sign = "-" if mantissa.startswith("-") else ""
+    digits = mantissa.lstrip("-").replace(".", "")
+    if 1e-3 <= abs(float(number)) < 1e7:
+        point = exponent + 1
+        if point <= 0:
+            integer, fraction = "0", "0" * (-point) + digits
+        elif point >= len(digits):
+            integer, fraction = digits + "0" * (point - len(digits)), ""
+        else:
+            integer, fraction = digits[:point], digits[point:]
+        return f"{sign}{integer}.{fraction or '0'}"
+    return f"{sign}{digits[0]}.{digits[1:] or '0'}E{exponent}"
+
+
+def pig_field(value, kind):
+    """Champ PigStorage : null -> vide, float/double au format Java"""
+    if value is None:
+        return ""
+    if kind == "float":
+        return java_number(value, float32=True)
+    if kind == "double":
+        return java_number(value)
+    return str(value)
+
+
+def pig_key_order(key):
+    """Tri Hadoop des clés chararray : null d'abord, puis octets UTF-8"""
+    return (key is not None, key.encode("utf-8") if key is not None else b"")
+
+
+# ---------------------------------------------------------------- lecture
+
+def parse_pig_int(text):
+    """Conversion chararray -> int du chargeur Pig (Utf8StorageConverter)
+
+    Entier (espaces retirés) si possible ; sinon lecture en double tronquée
+    (« 2.7 » -> 2), null au-delà de Integer.MAX_VALUE + 1 ou si illisible.
+    """
+    text = text.fillna("").str.strip()
+    numeric = pd.to_numeric(text.where(text != ""), errors="coerce").to_numpy(dtype=np.float64)
+    integer_like = text.str.fullmatch(r"[+-]?\d+").to_numpy(dtype=bool)
+    valid = ~np.isnan(numeric)
+    valid &= np.where(integer_like,
+                      (numeric >= -2.0 ** 31) & (numeric <= 2.0 ** 31 - 1),
+                      numeric <= 2.0 ** 31)
+    # Double.intValue() : troncature, saturée aux bornes des int
+    quantity = np.zeros(len(numeric), dtype=np.int64)
+    quantity[valid] = np.clip(np.trunc(numeric[valid]), -2 ** 31, 2 ** 31 - 1).astype(np.int64)
+    return quantity, valid
+
+
+def read_sales(paths, chunksize=DEFAULT_CHUNKSIZE):
+    """Blocs de ventes typés comme le LOAD Pig (en-têtes filtrés)
+
+    Colonnes : chaînes (None si vide), quantity en int64 avec masque de
+    nullité, price dans le type du schéma (NaN si non convertible). Les
+    fichiers compressés (.bz2, .gz, .zst) sont décompressés à la volée.
+    """
+    for path in paths:
+        # PigStorage ne gère pas les guillemets : découpage brut sur les virgules
+        reader = pd.read_csv(path, sep=DELIMITER, header=None, names=SALES_FIELDS, usecols=range(len(SALES_FIELDS)),
+                             dtype=str, keep_default_na=False, chunksize=chunksize,
+                             quoting=csv.QUOTE_NONE, engine="c")
+        for chunk in reader:
+            # Champ vide ou absent = null ; FILTER date != 'date' écarte aussi les null
+            chunk = chunk.astype(object).where(~(chunk.isna() | chunk.eq("")), None)
+            chunk = chunk[chunk["date"].notna() & (chunk["date"] != "date")]
+            if chunk.empty:
+                continue
+            quantity, quantity_valid = parse_pig_int(chunk["quantity"])
+            price = pd.to_numeric(chunk["price"].str.strip(), errors="coerce") \
+                .to_numpy(dtype=np.float64).astype(PRICE_DTYPE)
+            yield {
+                "frame": chunk,
+                "quantity": quantity,
+                "quantity_valid": quantity_valid,
+                "price": price,
+            }
+
+
+def total_value(block):
+    """quantity * price dans le type de price (règle Java) ; NaN si un opérande est null"""
+    value = block["quantity"].astype(PRICE_DTYPE) * block["price"]
+    value[~block["quantity_valid"]] = np.nan
+    return value
+
+
+# ---------------------------------------------------------------- agrégation
+
+class GroupAccumulator:
+    """Agrégats par clé accumulés bloc par bloc
+
+    Les sommes flottantes sont ajoutées une à une dans l'ordre de lecture
+    (np.add.at, non tamponné) comme le fait SUM dans Pig : pas de sommation
+    par paires, résultats identiques au bit près.
+    """
+
+    def __init__(self, float_values=(), int_values=()):
+        self.index = {}
+        self.keys = []
+        self.rows = np.zeros(0, dtype=np.int64)
+        self.float_sums = {name: np.zeros(0) for name in float_values}
+        self.int_sums = {name: np.zeros(0, dtype=np.int64) for name in int_values}
+        self.counts = {name: np.zeros(0, dtype=np.int64)
+                       for name in list(float_values) + list(int_values)}
+
+    def _grow(self, size):
+        if size <= len(self.rows):
+            return
+        extra = size - len(self.rows)
+        self.rows = np.concatenate([self.rows, np.zeros(extra, dtype=np.int64)])
+        for name in self.float_sums:
+            self.float_sums[name] = np.concatenate([self.float_sums[name], np.zeros(extra)])
+        for name in self.int_sums:
+            self.int_sums[name] = np.concatenate([self.int_sums[name],
+                                                  np.zeros(extra, dtype=np.int64)])
+        for name in self.counts:
+            self.counts[name] = np.concatenate([self.counts[name],
+                                                np.zeros(extra, dtype=np.int64)])
+
+    def add(self, keys, float_values=None, int_values=None):
+        """keys : Series de clés ; *_values : {nom: (valeurs, masque non-null)}"""
+        codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, key in enumerate(uniques):
+            key = None if key is None or (isinstance(key, float) and math.isnan(key)) else key
+            group = self.index.get(key)
+            if group is None:
+                group = self.index[key] = len(self.keys)
+                self.keys.append(key)
+            mapping[i] = group
+        self._grow(len(self.keys))
+        groups = mapping[codes]
+        self.rows += np.bincount(groups, minlength=len(self.rows))
+        for name, (values, valid) in (float_values or {}).items():
+            np.add.at(self.float_sums[name], groups[valid], values[valid].astype(np.float64))
+            self.counts[name] += np.bincount(groups[valid], minlength=len(self.rows))
+        for name, (values, valid) in (int_values or {}).items():
+            np.add.at(self.int_sums[name], groups[valid], values[valid])
+            self.counts[name] += np.bincount(groups[valid], minlength=len(self.rows))
+
+    def ordered(self):
+        """Indices des groupes dans l'ordre de sortie d'un réducteur Hadoop"""
+        return sorted(range(len(self.keys)), key=lambda g: pig_key_order(self.keys[g]))
+
+    def sum(self, name, group):
+        """SUM Pig : null si aucune valeur non nulle"""
+        if self.counts[name][group] == 0:
+            return None
+        if name in self.float_sums:
+            return float(self.float_sums[name][group])
+        return int(self.int_sums[name][group])
+
+    def avg(self, name, group):
+        """AVG Pig : somme double / nombre de valeurs non nulles"""
+        if self.counts[name][group] == 0:
+            return None
+        return float(self.float_sums[name][group]) / int(self.counts[name][group])
+
+
+# ---------------------------------------------------------------- moteur
+
+class LocalPigEngine:
+    """Une passe de lecture, toutes les analyses demandées"""
+
+    def __init__(self, analyses=None):
+        self.analyses = list(analyses or STORE_PATHS)
+        self.category = GroupAccumulator(float_values=["price"], int_values=["quantity"])
+        self.product = GroupAccumulator(int_values=["quantity"])
+        self.region = GroupAccumulator(float_values=["revenue"])
+        self.month = GroupAccumulator(float_values=["total_value"])
+        self.customer = GroupAccumulator(float_values=["revenue"])
+        self.high_value_lines = []
+        self.rows = 0
+
+    def consume(self, block):
+        frame = block["frame"]
+        quantity = (block["quantity"], block["quantity_valid"])
+        price = block["price"]
+        price_valid = ~np.isnan(price)
+        value = total_value(block)
+        value_valid = ~np.isnan(value)
+        self.rows += len(frame)
+
+        if "category_analysis" in self.analyses:
+            self.category.add(frame["category"], {"price": (price, price_valid)},
+                              {"quantity": quantity})
+        if "top_products" in self.analyses:
+            self.product.add(frame["product"], int_values={"quantity": quantity})
+        if "regional_analysis" in self.analyses:
+            self.region.add(frame["region"], {"revenue": (value, value_valid)})
+        if "monthly_analysis" in self.analyses:
+            # SUBSTRING(date, 0, 7) ; null si la date est trop courte
+            dates = frame["date"]
+            month = dates.str.slice(0, 7).where(dates.str.len() >= 7, None)
+            self.month.add(month, {"total_value": (value, value_valid)})
+        if "valuable_customers" in self.analyses:
+            self.customer.add(frame["customer_id"], {"revenue": (value, value_valid)})
+        if "high_value_sales" in self.analyses:
+            selected = value_valid & (value > HIGH_VALUE_THRESHOLD)
+            if selected.any():
+                rows = frame[selected]
+                quantities = block["quantity"][selected]
+                prices = price[selected]
+                for i, row in enumerate(rows.itertuples(index=False)):
+                    self.high_value_lines.append(",".join([
+                        pig_field(row.date, "chararray"),
+                        pig_field(row.product, "chararray"),
+                        pig_field(row.category, "chararray"),
+                        pig_field(int(quantities[i]), "int"),
+                        pig_field(None if np.isnan(prices[i]) else float(prices[i]), PRICE_KIND),
+                        pig_field(row.customer_id, "chararray"),
+                        pig_field(row.region, "chararray"),
+                    ]))
+
+    def results(self):
+        """Analyse -> lignes de sortie (sans fin de ligne)"""
+        out = {}
+        if "category_analysis" in self.analyses:
+            acc = self.category
+            out["category_analysis"] = [
+                ",".join([pig_field(acc.keys[g], "chararray"), str(int(acc.rows[g])),
+                          pig_field(acc.sum("quantity", g), "long"),
+                          pig_field(acc.avg("price", g), "double")])
+                for g in acc.ordered()
+            ]
+        if "top_products" in self.analyses:
+            acc = self.product
+            # ORDER imbriqué DESC (stable sur l'ordre des groupes), null en dernier, puis LIMIT
+            ordered = sorted(acc.ordered(), key=lambda g: (acc.sum("quantity", g) is None,
+                                                           -(acc.sum("quantity", g) or 0)))
+            out["top_products"] = [
+                ",".join([pig_field(acc.keys[g], "chararray"),
+                          pig_field(acc.sum("quantity", g), "long")])
+                for g in ordered[:TOP_PRODUCTS]
+            ]
+        if "regional_analysis" in self.analyses:
+            acc = self.region
+            out["regional_analysis"] = [
+                ",".join([pig_field(acc.keys[g], "chararray"), str(int(acc.rows[g])),
+                          pig_field(acc.sum("revenue", g), "double")])
+                for g in acc.ordered()
+            ]
+        if "high_value_sales" in self.analyses:
+            out["high_value_sales"] = list(self.high_value_lines)
+        if "monthly_analysis" in self.analyses:
+            acc = self.month
+            # COUNT ignore les tuples dont le premier champ (month) est null
+            out["monthly_analysis"] = [
+                ",".join([pig_field(acc.keys[g], "chararray"),
+                          str(int(acc.rows[g]) if acc.keys[g] is not None else 0),
+                          pig_field(acc.sum("total_value", g), "double"),
+                          pig_field(acc.avg("total_value", g), "double")])
+                for g in acc.ordered()
+            ]
+        if "valuable_customers" in self.analyses:
+            acc = self.customer
+            out["valuable_customers"] = [
+                ",".join([pig_field(acc.keys[g], "chararray"), str(int(acc.rows[g])),
+                          pig_field(acc.sum("revenue", g), "double")])
+                for g in acc.ordered()
+                if (acc.sum("revenue", g) or 0) > VALUABLE_CUSTOMER_THRESHOLD
+            ]
+        return out
+
+
+def run(paths, output_root, analyses=None, chunksize=DEFAULT_CHUNKSIZE):
+    """Exécute les analyses et écrit les sorties ; retourne {analyse: fichier}"""
+    engine = LocalPigEngine(analyses)
+    for block in read_sales(paths, chunksize):
+        engine.consume(block)
+
+    written = {}
+    for name, lines in engine.results().items():
+        directory, part = STORE_PATHS[name]
+        directory = os.path.join(output_root, directory)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, part)
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            f.writelines(line + "\n" for line in lines)
+        open(os.path.join(directory, "_SUCCESS"), "w").close()
+        written[name] = path
+    return written, engine.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyses Pig exécutées localement")
+    parser.add_argument("inputs", nargs="+", help="Fichiers CSV de ventes (format sales_data.csv)")
+    parser.add_argument("--output-root", default="pig_local",
+                        help="Racine des sorties (équivalent de / pour les STORE Pig)")
+    parser.add_argument("--analyses", nargs="+", choices=list(STORE_PATHS))
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    written, rows = run(args.inputs, args.output_root, args.analyses, args.chunksize)
+    elapsed = time.perf_counter() - start
+    print(f"=== {rows} ventes analysées localement en {elapsed:.2f}s ===")
+    for name, path in written.items():
+        print(f"✓ {name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
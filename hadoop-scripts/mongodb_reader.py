@@ -1,91 +1,409 @@
 #!/usr/bin/env python3
 
-from pyspark.sql import SparkSession
+from pyspark import StorageLevel
 from pyspark.sql.functions import *
+from pyspark.sql.types import DoubleType, StringType, StructField, StructType
+import argparse
+import builtins
+import csv
+import json
 import os
+import time
 
-def main():
-    # Configuration Spark
-    spark = SparkSession.builder \
-        .appName("MongoDB-Hadoop-Reader") \
-        .config("spark.mongodb.input.uri", "mongodb://mongodb:27017/bigdata.sales") \
-        .config("spark.mongodb.output.uri", "mongodb://mongodb:27017/bigdata.results") \
-        .config("spark.jars.packages", "org.mongodb.spark:mongo-spark-connector_2.12:3.0.1") \
-        .getOrCreate()
-    
-    # Lecture des données depuis MongoDB
-    df_sales = spark.read \
-        .format("com.mongodb.spark.sql.DefaultSource") \
-        .option("database", "bigdata") \
-        .option("collection", "sales") \
-        .load()
-    
-    print("=== Données de ventes depuis MongoDB ===")
-    df_sales.show()
-    
-    # Analyses
-    print("=== Analyse des ventes par catégorie ===")
-    category_analysis = df_sales.groupBy("category") \
-        .agg(
-            count("*").alias("total_orders"),
-            sum("quantity").alias("total_quantity"),
-            sum("total_value").alias("total_revenue"),
-            avg("price").alias("avg_price")
-        )
-    
-    category_analysis.show()
-    
-    # Sauvegarde sur HDFS
-    category_analysis.write \
-        .mode("overwrite") \
-        .option("header", "true") \
-        .csv("hdfs://hadoop-master:8020/mongodb_analysis/category_analysis")
-    
-    # Analyse régionale
-    print("=== Analyse régionale ===")
-    regional_analysis = df_sales.groupBy("region") \
-        .agg(
-            count("*").alias("orders_count"),
-            sum("total_value").alias("total_revenue"),
-            avg("total_value").alias("avg_order_value")
-        )
-    
-    regional_analysis.show()
-    
-    # Sauvegarde sur HDFS
-    regional_analysis.write \
-        .mode("overwrite") \
-        .option("header", "true") \
-        .csv("hdfs://hadoop-master:8020/mongodb_analysis/regional_analysis")
-    
-    # Lecture des données clients
-    df_customers = spark.read \
+from arrow_export import export_tables
+from incremental import IncrementalAggregates
+from mongo_sink import MONGO_SINK_BATCH_SIZE, MONGO_SINK_CONCURRENCY, MongoResultSink
+from sales_schema import spark_schema
+from spark_metrics import export as export_prometheus
+from spark_session import get_session
+from stage_metrics import collect_stage_metrics, count_source_scans, last_sql_execution_id
+
+HDFS_OUTPUT = "hdfs://hadoop-master:8020/mongodb_analysis"
+
+# Rapports (plan d'exécution, métriques de shuffle) écrits côté driver
+REPORT_DIR = os.environ.get("REPORT_DIR", "/tmp/mongodb_analysis_reports")
+
+# Partitionnement de la lecture des ventes : plusieurs partitions pour que
+# les trois workers lisent MongoDB en parallèle
+MONGO_PARTITIONER = os.environ.get("MONGO_PARTITIONER", "MongoSamplePartitioner")
+MONGO_PARTITION_SIZE_MB = os.environ.get("MONGO_PARTITION_SIZE_MB", "32")
+
+# Seuls champs lus ; un schéma explicite évite l'échantillonnage d'inférence.
+# Schéma partagé (data/sales_schema.json), dates stockées en chaînes dans MongoDB
+SALES_SCHEMA = spark_schema(dates_as_string=True,
+                            extra=[StructField("total_value", DoubleType(), True)])
+
+# Lecture incrémentale : _id (ObjectId croissant) sert de filigrane. Les
+# ObjectId de plusieurs clients ne sont ordonnés qu'à la seconde : chaque
+# exécution relit WATERMARK_OVERLAP_SECONDS avant le filigrane et écarte les
+# _id déjà agrégés, mémorisés avec le filigrane (même principe que
+# webapp/stats_engine.py)
+WATERMARK_OVERLAP_SECONDS = int(os.environ.get("WATERMARK_OVERLAP_SECONDS", "5"))
+SALES_SCHEMA_WITH_ID = StructType(
+    [StructField("_id", StructType([StructField("oid", StringType(), True)]), True)]
+    + SALES_SCHEMA.fields
+)
+
+CUSTOMERS_SCHEMA = StructType([
+    StructField("_id", StringType(), True),
+    StructField("name", StringType(), True),
+    StructField("email", StringType(), True),
+    StructField("city", StringType(), True),
+])
+
+# Répertoire local partagé avec la webapp (./data monté sur /data et /app/data)
+CUBE_EXPORT_DIR = os.environ.get("CUBE_EXPORT_DIR", "/data/cubes")
+
+UNKNOWN_CITY = "Inconnue"
+
+# Dimensions de l'agrégation unique ; chaque analyse est un grouping set
+DIMENSIONS = ["month", "category", "region", "city"]
+
+# Agrégats partiels au grain le plus fin (mois x catégorie x région x ville),
+# stockés par mois : toutes les mesures sont additives
+PARTIALS_STORE = f"{HDFS_OUTPUT}/_partials"
+PARTIAL_MEASURES = ["orders", "quantity", "revenue", "price_sum", "price_count", "value_count"]
+
+# Analyse -> (colonnes groupées, colonnes de sortie renommées, tri)
+ANALYSES = {
+    "category_analysis": (
+        ["category"],
+        {"category": "category", "orders": "total_orders", "quantity": "total_quantity",
+         "revenue": "total_revenue", "avg_price": "avg_price"},
+        None,
+    ),
+    "regional_analysis": (
+        ["region"],
+        {"region": "region", "orders": "orders_count", "revenue": "total_revenue",
+         "avg_order_value": "avg_order_value"},
+        None,
+    ),
+    "city_analysis": (
+        ["city"],
+        {"city": "city", "orders": "total_orders", "revenue": "city_revenue"},
+        "city_revenue",
+    ),
+    "monthly_analysis": (
+        ["month"],
+        {"month": "month", "orders": "total_transactions", "revenue": "monthly_revenue",
+         "avg_order_value": "avg_transaction_value"},
+        None,
+    ),
+    "sales_cube": (
+        ["month", "category", "region", "city"],
+        {"month": "month", "category": "category", "region": "region", "city": "city",
+         "orders": "orders", "quantity": "quantity", "revenue": "revenue"},
+        None,
+    ),
+}
+
+def grouping_id_of(columns):
+    """Valeur de grouping_id() pour un grouping set (bit à 1 = colonne agrégée)"""
+    # Boucle explicite : `sum` est masqué par l'import de pyspark.sql.functions
+    n = len(DIMENSIONS)
+    gid = 0
+    for i, dim in enumerate(DIMENSIONS):
+        if dim not in columns:
+            gid |= 1 << (n - 1 - i)
+    return gid
+
+def mongo_pipeline(schema, match=None):
+    """Pipeline d'agrégation poussé à MongoDB : $match puis $project"""
+    pipeline = []
+    if match:
+        pipeline.append({"$match": match})
+    projection = {field.name: 1 for field in schema.fields}
+    if "_id" not in projection:
+        projection["_id"] = 0
+    pipeline.append({"$project": projection})
+    return pipeline
+
+def load_collection(spark, collection, schema, match=None, partitioned=False):
+    """Lecture d'une collection bigdata.* via le connecteur MongoDB
+
+    Filtres et projection sont exécutés par MongoDB : seuls les documents
+    et champs utiles traversent le réseau.
+    """
+    reader = spark.read \
         .format("com.mongodb.spark.sql.DefaultSource") \
         .option("database", "bigdata") \
-        .option("collection", "customers") \
-        .load()
-    
-    # Jointure sales-customers
-    sales_with_customers = df_sales.join(df_customers, 
-                                       df_sales.customer_id == df_customers._id, 
-                                       "inner")
-    
+        .option("collection", collection) \
+        .option("pipeline", json.dumps(mongo_pipeline(schema, match))) \
+        .schema(schema)
+    if partitioned:
+        reader = reader \
+            .option("partitioner", MONGO_PARTITIONER) \
+            .option("partitionerOptions.partitionSizeMB", MONGO_PARTITION_SIZE_MB)
+    return reader.load()
+
+def explain_string(df, mode="formatted"):
+    """Plan d'exécution sous forme de texte (df.explain() ne fait qu'afficher)"""
+    jvm = df.sparkSession.sparkContext._jvm
+    return jvm.PythonSQLUtils.explainString(df._jdf.queryExecution(), mode)
+
+def write_report(name, content):
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    path = os.path.join(REPORT_DIR, name)
+    with open(path, "w") as f:
+        f.write(content if isinstance(content, str) else json.dumps(content, indent=2))
+    return path
+
+def partial_aggregate(sales_enriched):
+    """Agrégats partiels additifs au grain (mois, catégorie, région, ville)"""
+    return sales_enriched.groupBy(*DIMENSIONS).agg(
+        count(lit(1)).alias("orders"),
+        sum("quantity").alias("quantity"),
+        sum("total_value").alias("revenue"),
+        sum("price").alias("price_sum"),
+        count("price").alias("price_count"),
+        count("total_value").alias("value_count"),
+    )
+
+def rollup(spark, partials):
+    """Toutes les analyses en une seule agrégation (GROUPING SETS) des partiels"""
+    partials.createOrReplaceTempView("sales_partials")
+    grouping_sets = ", ".join(
+        "(" + ", ".join(columns) + ")" for columns, _, _ in ANALYSES.values()
+    )
+    dims = ", ".join(DIMENSIONS)
+    return spark.sql(f"""
+        SELECT {dims},
+               grouping_id({dims}) AS gid,
+               SUM(orders) AS orders,
+               SUM(quantity) AS quantity,
+               SUM(revenue) AS revenue,
+               SUM(price_sum) / SUM(price_count) AS avg_price,
+               SUM(revenue) / SUM(value_count) AS avg_order_value
+        FROM sales_partials
+        GROUP BY {dims} GROUPING SETS ({grouping_sets})
+    """)
+
+def multi_aggregate(spark, sales_enriched):
+    """Toutes les analyses en une seule passe sur les ventes"""
+    return rollup(spark, partial_aggregate(sales_enriched))
+
+def analysis_keys(name):
+    """Colonnes clés (dimensions) et champ de tri d'une analyse, noms de sortie"""
+    columns, renames, order_by = ANALYSES[name]
+    return [renames[c] for c in columns], order_by or renames.get("revenue")
+
+def select_analysis(combined, name):
+    """Extrait une analyse du résultat combiné, avec ses noms de colonnes"""
+    columns, renames, order_by = ANALYSES[name]
+    df = combined.filter(col("gid") == grouping_id_of(columns)) \
+        .select([col(src).alias(dst) for src, dst in renames.items()])
+    if name == "city_analysis":
+        # Comme l'ancienne jointure interne : ventes sans client exclues
+        df = df.filter(col("city") != UNKNOWN_CITY)
+    if order_by:
+        df = df.orderBy(desc(order_by))
+    return df
+
+def export_cube(cube_df, export_dir=CUBE_EXPORT_DIR):
+    """Exporte le cube agrégé en CSV local pour le dashboard
+
+    Le fichier est écrit à côté puis renommé : le dashboard ne lit jamais
+    un cube à moitié écrit.
+    """
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, "sales_cube.csv")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(cube_df.columns)
+        for row in cube_df.toLocalIterator():
+            writer.writerow(row)
+    os.replace(tmp_path, path)
+    return path
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Analyse des ventes MongoDB avec Spark")
+    parser.add_argument("--date-from", help="Première date incluse (AAAA-MM-JJ)")
+    parser.add_argument("--date-to", help="Dernière date incluse (AAAA-MM-JJ)")
+    parser.add_argument("--no-mongo-sink", action="store_true",
+                        help="Pas de publication des analyses dans MongoDB")
+    parser.add_argument("--sink-batch-size", type=int, default=MONGO_SINK_BATCH_SIZE)
+    parser.add_argument("--sink-concurrency", type=int, default=MONGO_SINK_CONCURRENCY)
+    parser.add_argument("--full-rebuild", action="store_true",
+                        help="Recalcule les agrégats depuis tout l'historique (sinon : "
+                             "ventes postérieures au dernier _id traité seulement)")
+    return parser.parse_args()
+
+def oid_floor(oid, seconds_before=0):
+    """Plus petit ObjectId (hexadécimal) horodaté `seconds_before` s avant `oid`"""
+    timestamp = builtins.max(0, int(oid[:8], 16) - seconds_before)
+    return f"{timestamp:08x}" + "0" * 16
+
+
+def overlap_ids(sales, previous_ids, watermark, overlap=WATERMARK_OVERLAP_SECONDS):
+    """_id du recouvrement (horodatés à moins de `overlap` s du filigrane)"""
+    floor = oid_floor(watermark, overlap)
+    recent = {oid for oid in previous_ids if oid >= floor}
+    recent.update(row[0] for row in sales.filter(col("sale_oid") >= floor)
+                  .select("sale_oid").collect())
+    return sorted(recent)
+
+
+def main():
+    args = parse_args()
+
+    # Configuration Spark
+    # Profil SPARK_PROFILE (cluster-3-workers par défaut), connecteur pré-installé
+    spark = get_session("MongoDB-Hadoop-Reader", mongo=True, extra={
+        "spark.mongodb.input.uri": "mongodb://mongodb:27017/bigdata.sales",
+        "spark.mongodb.output.uri": "mongodb://mongodb:27017/bigdata.results",
+    })
+
+    started = time.time()
+    first_execution = last_sql_execution_id(spark)
+    spark.sparkContext.setJobGroup("mongodb_reader", "Analyse des ventes MongoDB")
+
+    # Lecture unique des données depuis MongoDB (filtre de dates poussé au serveur)
+    date_match = {}
+    if args.date_from:
+        date_match["$gte"] = args.date_from
+    if args.date_to:
+        date_match["$lte"] = args.date_to
+
+    # Sans filtre de dates : mode incrémental, seules les ventes d'_id
+    # supérieur au filigrane (moins le recouvrement) sont lues et fusionnées
+    # dans les partiels
+    store = None
+    watermark = None
+    seen_ids = []
+    if not date_match:
+        store = IncrementalAggregates(spark, "mongodb_reader", PARTIALS_STORE, DIMENSIONS[1:],
+                                      {measure: "sum" for measure in PARTIAL_MEASURES})
+        if not args.full_rebuild:
+            watermark = store.watermark()
+            if watermark:
+                seen_ids = store.state().get("overlap_ids", [])
+        print(f"Mode: {'incrémental depuis _id ' + watermark if watermark else 'reconstruction complète'}")
+
+    if date_match:
+        match = {"date": date_match}
+    elif watermark:
+        # Recouvrement : un _id plus petit validé après le filigrane n'est pas perdu
+        match = {"_id": {"$gte": {"$oid": oid_floor(watermark, WATERMARK_OVERLAP_SECONDS)}}}
+    else:
+        match = None
+    # _id aplati : la collection customers a aussi un _id
+    df_sales = load_collection(spark, "sales", SALES_SCHEMA_WITH_ID, match=match, partitioned=True) \
+        .withColumn("sale_oid", col("_id.oid")).drop("_id")
+    if seen_ids:
+        # Ventes du recouvrement déjà comptées à l'exécution précédente
+        seen = spark.createDataFrame([(oid,) for oid in seen_ids], "sale_oid string")
+        df_sales = df_sales.join(broadcast(seen), "sale_oid", "left_anti")
+    df_customers = load_collection(spark, "customers", CUSTOMERS_SCHEMA)
+
+    # Ventes enrichies (client, mois), matérialisées une seule fois :
+    # toutes les analyses et affichages suivants lisent ce cache.
+    # Les clients (petite dimension) sont diffusés : pas de shuffle des ventes.
+    sales_enriched = df_sales.join(broadcast(df_customers),
+                                   df_sales.customer_id == df_customers._id,
+                                   "left") \
+        .withColumn("month", substring("date", 1, 7)) \
+        .fillna({"city": UNKNOWN_CITY}) \
+        .persist(StorageLevel.MEMORY_AND_DISK)
+
+    plan_path = write_report("sales_enriched_plan.txt", explain_string(sales_enriched))
+    print(f"Plan d'exécution de la lecture/jointure: {plan_path}")
+
+    print(f"=== {sales_enriched.count()} ventes {'nouvelles ' if watermark else ''}chargées depuis MongoDB ===")
+    sales_enriched.select("date", "product", "category", "quantity", "price",
+                          "customer_id", "region", "total_value").show()
+
     print("=== Ventes avec informations clients ===")
-    sales_with_customers.select("date", "product", "quantity", "price", 
-                               "name", "email", "city").show()
-    
-    # Analyse par ville
-    city_analysis = sales_with_customers.groupBy("city") \
-        .agg(
-            count("*").alias("total_orders"),
-            sum("total_value").alias("city_revenue")
-        ) \
-        .orderBy(desc("city_revenue"))
-    
-    print("=== Top villes par chiffre d'affaires ===")
-    city_analysis.show()
-    
+    sales_enriched.filter(col("name").isNotNull()) \
+        .select("date", "product", "quantity", "price", "name", "email", "city").show()
+
+    # Toutes les analyses en une passe, résultat (petit) matérialisé
+    if store is None:
+        combined = multi_aggregate(spark, sales_enriched)
+    else:
+        new_watermark = builtins.max(filter(None, [sales_enriched.agg(max("sale_oid")).first()[0],
+                                                    watermark]), default=None)
+        extra = {"overlap_ids": overlap_ids(sales_enriched, seen_ids, new_watermark)} \
+            if new_watermark else None
+        months = store.update(partial_aggregate(sales_enriched), new_watermark,
+                              full=watermark is None, extra=extra)
+        print(f"Mois recalculés: {', '.join(str(m) for m in months) or 'aucun'} "
+              f"(filigrane: {new_watermark})")
+        partials = store.read()
+        combined = rollup(spark, partials if partials is not None
+                          else partial_aggregate(sales_enriched))
+    combined = combined.persist(StorageLevel.MEMORY_AND_DISK)
+    combined.count()
+    sales_enriched.unpersist()
+
+    # Publication MongoDB : staging puis bascule atomique en fin d'exécution.
+    # Toute erreur avant la bascule (HDFS, staging, exports) abandonne
+    # l'exécution et ses collections de staging ; les partiels déjà validés
+    # restent cohérents, l'exécution suivante republie depuis eux.
+    sink = None
+    if not args.no_mongo_sink:
+        sink = MongoResultSink(batch_size=args.sink_batch_size,
+                               concurrency=args.sink_concurrency)
+        print(f"Exécution MongoDB: {sink.start_run()}")
+
+    titles = {
+        "category_analysis": "Analyse des ventes par catégorie",
+        "regional_analysis": "Analyse régionale",
+        "city_analysis": "Top villes par chiffre d'affaires",
+        "monthly_analysis": "Analyse mensuelle",
+    }
+    try:
+        for name in ANALYSES:
+            analysis = select_analysis(combined, name)
+            if name in titles:
+                print(f"=== {titles[name]} ===")
+                analysis.show()
+
+            # Sauvegarde sur HDFS
+            analysis.write \
+                .mode("overwrite") \
+                .parquet(f"{HDFS_OUTPUT}/{name}")
+
+            if sink is not None:
+                key_columns, sort_field = analysis_keys(name)
+                sink.write(name, analysis, key_columns, sort_field)
+
+        print(f"✓ Cube du dashboard exporté: {export_cube(select_analysis(combined, 'sales_cube'))}")
+
+        # Tables d'agrégats en Arrow (memory-map côté webapp, /api/arrow/<nom>)
+        arrow_files = export_tables({name: select_analysis(combined, name) for name in ANALYSES},
+                                    "mongodb_reader")
+        for name, path in arrow_files.items():
+            print(f"✓ Table Arrow {name}: {path}")
+    except Exception as e:
+        if sink is not None:
+            sink.abort(e)
+            sink.close()
+        raise
+
+    if sink is not None:
+        # commit() marque lui-même l'exécution en échec si une bascule échoue
+        try:
+            for name, info in sink.commit().items():
+                print(f"✓ {info['documents']} documents publiés dans bigdata.{info['collection']}")
+        finally:
+            sink.close()
+
+    scans = count_source_scans(spark, first_execution)
+    print(f"=== Lectures des sources: {scans['total']} ===")
+    for source, count_ in scans["par_source"].items():
+        print(f"  - {source}: {count_}")
+
+    metrics = collect_stage_metrics(spark, "mongodb_reader")
+    print(f"Shuffle: {metrics['shuffle_read_bytes']} octets lus, "
+          f"{metrics['shuffle_write_bytes']} octets écrits "
+          f"({metrics['stages']} stages, {metrics['tasks']} tâches)")
+    print(f"Métriques Prometheus: "
+          f"{export_prometheus('mongodb_reader', metrics, wall_seconds=time.time() - started)}")
+    metrics["source_scans"] = scans
+    print(f"Métriques: {write_report('mongodb_reader_metrics.json', metrics)}")
+
     spark.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# hadoop-scripts/prepare_sales.py - Ventes préparées pour Pig et Spark
+"""
+Réécrit le CSV brut des ventes (en-tête, non compressé) en un jeu préparé :
+- sans ligne d'en-tête : plus de FILTER date != 'date' dans Pig ni d'option
+  header côté Spark ;
+- typé selon le schéma déclaré (data/sales_schema.json), les lignes mal
+  formées sont écartées une fois pour toutes ;
+- compressé en bzip2 (découpable : un gros fichier reste lisible par
+  plusieurs mappers) ;
+- découpé en fichiers d'au plus un bloc HDFS une fois compressés, triés par
+  date, pour qu'un split corresponde à un bloc local au datanode.
+
+Pig lit ce répertoire avec la clause AS générée par sales_schema.py
+(pig -param_file), Spark avec ingest_parquet.read_sales_csv(header=False).
+
+Usage:
+    python3 prepare_sales.py                  # /data/sales_data.csv -> /data/sales_prepared
+    python3 prepare_sales.py --benchmark      # + comparaison brut (inferSchema) / préparé
+    python3 prepare_sales.py --source data/generated --target /tmp/sales_prepared --master local[*]
+"""
+import argparse
+import json
+import math
+
+from pyspark.sql import SparkSession
+from pyspark.sql.functions import avg, count, sum as sum_
+
+from ingest_parquet import HDFS, SALES_CSV, read_sales_csv
+from sales_schema import DATE_FORMAT, DELIMITER, PREPARED_SALES, VERSION
+from stage_metrics import run_measured
+
+SALES_PREPARED = f"{HDFS}{PREPARED_SALES}"
+
+# Codecs acceptés par le writer CSV ; zstd demande les bibliothèques natives Hadoop
+CODECS = ("bzip2", "zstd", "none")
+
+# Taux de compression attendu du CSV des ventes (bzip2 : ~5 à 6 fois plus petit)
+DEFAULT_COMPRESSION_RATIO = 0.2
+# Marge sous la taille de bloc pour absorber l'écart au taux estimé
+BLOCK_FILL = 0.9
+
+
+def _path(spark, path):
+    jvm = spark.sparkContext._jvm
+    hpath = jvm.org.apache.hadoop.fs.Path(path)
+    return hpath, hpath.getFileSystem(spark.sparkContext._jsc.hadoopConfiguration())
+
+
+def input_size(spark, path):
+    """Octets du fichier ou du répertoire source"""
+    hpath, fs = _path(spark, path)
+    return fs.getContentSummary(hpath).getLength()
+
+
+def block_size(spark, path):
+    """Taille de bloc par défaut du système de fichiers cible (dfs.blocksize)"""
+    hpath, fs = _path(spark, path)
+    return fs.getDefaultBlockSize(hpath)
+
+
+def file_count(source_bytes, block_bytes, ratio=DEFAULT_COMPRESSION_RATIO):
+    """Nombre de fichiers pour que chaque fichier compressé tienne dans un bloc"""
+    return max(1, math.ceil(source_bytes * ratio / (block_bytes * BLOCK_FILL)))
+
+
+def prepare(spark, source=SALES_CSV, target=SALES_PREPARED, codec="bzip2",
+            ratio=DEFAULT_COMPRESSION_RATIO, files=None):
+    """CSV brut -> CSV préparé ; retourne (lignes, fichiers)"""
+    if files is None:
+        files = file_count(input_size(spark, source), block_size(spark, target), ratio)
+
+    sales = read_sales_csv(spark, source)
+    # Découpage par plages de dates : fichiers contigus, mieux compressés
+    sales.repartitionByRange(files, "date") \
+        .sortWithinPartitions("date", "product") \
+        .write \
+        .mode("overwrite") \
+        .option("header", "false") \
+        .option("sep", DELIMITER) \
+        .option("dateFormat", DATE_FORMAT) \
+        .option("compression", codec) \
+        .csv(target)
+
+    rows = read_sales_csv(spark, target, header=False).count()
+    return rows, files
+
+
+def benchmark(spark, raw_path=SALES_CSV, prepared_path=SALES_PREPARED):
+    """Même agrégation (analyse par catégorie) sur le CSV brut et le jeu préparé"""
+
+    def category_summary(df):
+        return df.groupBy("category").agg(
+            count("*").alias("total_orders"),
+            sum_("quantity").alias("total_quantity"),
+            avg("price").alias("avg_price"),
+        ).collect()
+
+    def raw_query():
+        # Chemin historique : inferSchema relit tout le fichier avant la requête
+        df = spark.read.option("header", "true").option("inferSchema", "true").csv(raw_path)
+        return category_summary(df)
+
+    def prepared_query():
+        return category_summary(read_sales_csv(spark, prepared_path, header=False))
+
+    results = {}
+    for name, action in (("raw_infer_schema", raw_query), ("prepared", prepared_query)):
+        _, elapsed, metrics = run_measured(spark, f"bench_{name}", action)
+        results[name] = {
+            "wall_time_s": round(elapsed, 3),
+            "scan_bytes": metrics["input_bytes"],
+            "scan_records": metrics["input_records"],
+            "jobs": metrics["jobs"],
+        }
+    if results["prepared"]["wall_time_s"] > 0:
+        results["speedup"] = round(
+            results["raw_infer_schema"]["wall_time_s"] / results["prepared"]["wall_time_s"], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Préparation des ventes (sans en-tête, compressées)")
+    parser.add_argument("--source", default=SALES_CSV)
+    parser.add_argument("--target", default=SALES_PREPARED)
+    parser.add_argument("--codec", choices=CODECS, default="bzip2")
+    parser.add_argument("--ratio", type=float, default=DEFAULT_COMPRESSION_RATIO,
+                        help="taux de compression estimé pour le calcul du nombre de fichiers")
+    parser.add_argument("--files", type=int, help="nombre de fichiers imposé")
+    parser.add_argument("--master", help="ex. local[*] hors cluster")
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+
+    builder = SparkSession.builder.appName("Sales-Prepare")
+    if args.master:
+        builder = builder.master(args.master)
+    spark = builder.getOrCreate()
+
+    try:
+        rows, files = prepare(spark, args.source, args.target, args.codec, args.ratio, args.files)
+        size = input_size(spark, args.target)
+        print(f"✓ {rows} ventes préparées (schéma v{VERSION}, {args.codec}, "
+              f"{files} fichier(s), {size} octets): {args.target}")
+
+        if args.benchmark:
+            print("=== Benchmark CSV brut (inferSchema) vs préparé (schéma déclaré) ===")
+            print(json.dumps(benchmark(spark, args.source, args.target), indent=2))
+    finally:
+        spark.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# hadoop-scripts/sales_schema.py - Schéma des ventes partagé (Pig, Spark, pandas)
+"""
+Le schéma des ventes est déclaré une seule fois dans `data/sales_schema.json`.
+Ce module le lit et en dérive les formes attendues par chaque moteur :
+schéma Spark (StructType), clause AS de Pig, types pandas/NumPy.
+
+Recherche du fichier : $SALES_SCHEMA_PATH, puis /data (hadoop-master),
+/app/data (webapp) et data/ à la racine du dépôt.
+
+Un champ peut déclarer `pig_type` : type vu par Pig s'il diffère. price
+reste ainsi un float 32 bits côté Pig, comme dans les scripts d'origine, et
+un double côté Spark et pandas : les sorties Pig sont inchangées.
+
+Usage:
+    python3 sales_schema.py pig-params > /tmp/sales.params   # pour pig -param_file
+    python3 sales_schema.py show
+"""
+import json
+import os
+import sys
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+SCHEMA_PATHS = [
+    os.environ.get("SALES_SCHEMA_PATH"),
+    "/data/sales_schema.json",
+    "/app/data/sales_schema.json",
+    os.path.join(_HERE, "..", "data", "sales_schema.json"),
+    os.path.join(_HERE, "sales_schema.json"),
+]
+
+# Type logique -> type Pig
+PIG_TYPES = {
+    "string": "chararray",
+    "date": "chararray",
+    "int": "int",
+    "long": "long",
+    "float": "float",
+    "double": "double",
+}
+
+# Type logique -> dtype NumPy des valeurs numériques
+NUMPY_TYPES = {
+    "int": "int64",
+    "long": "int64",
+    "float": "float32",
+    "double": "float64",
+}
+
+# Répertoire HDFS des ventes préparées (sans en-tête, bzip2) lu par Pig
+PREPARED_SALES = "/data/sales_prepared"
+
+
+def schema_path():
+    for path in SCHEMA_PATHS:
+        if path and os.path.exists(path):
+            return path
+    searched = ", ".join(os.path.normpath(path) for path in SCHEMA_PATHS if path)
+    raise FileNotFoundError(
+        f"sales_schema.json introuvable (cherché dans: {searched}) ; "
+        "copier data/sales_schema.json à l'un de ces emplacements ou définir SALES_SCHEMA_PATH")
+
+
+def load_schema(path=None):
+    with open(path or schema_path(), encoding="utf-8") as f:
+        return json.load(f)
+
+
+SCHEMA = load_schema()
+FIELDS = [field["name"] for field in SCHEMA["fields"]]
+TYPES = {field["name"]: field["type"] for field in SCHEMA["fields"]}
+PIG_LOGICAL_TYPES = {field["name"]: field.get("pig_type", field["type"]) for field in SCHEMA["fields"]}
+VERSION = SCHEMA["version"]
+DELIMITER = SCHEMA["delimiter"]
+DATE_FORMAT = SCHEMA["date_format"]
+
+
+def spark_type(logical, dates_as_string=False):
+    from pyspark.sql import types as T
+    return {
+        "string": T.StringType(),
+        "date": T.StringType() if dates_as_string else T.DateType(),
+        "int": T.IntegerType(),
+        "long": T.LongType(),
+        "float": T.FloatType(),
+        "double": T.DoubleType(),
+    }[logical]
+
+
+def spark_schema(dates_as_string=False, exclude=(), extra=()):
+    """StructType des ventes ; `extra` : StructField ajoutés en fin"""
+    from pyspark.sql.types import StructField, StructType
+    fields = [StructField(name, spark_type(TYPES[name], dates_as_string), True)
+              for name in FIELDS if name not in exclude]
+    return StructType(fields + list(extra))
+
+
+def pig_schema():
+    """Clause AS du LOAD Pig : date:chararray,product:chararray,... (sans espace
+    pour rester une seule valeur dans le fichier de paramètres)"""
+    return ",".join(f"{name}:{PIG_TYPES[PIG_LOGICAL_TYPES[name]]}" for name in FIELDS)
+
+
+def pig_params(input_path=PREPARED_SALES):
+    """Fichier de paramètres Pig (pig -param_file)"""
+    return f"SALES_INPUT={input_path}\nSALES_SCHEMA={pig_schema()}\n"
+
+
+def numpy_type(name, pig=False):
+    """dtype NumPy d'un champ numérique ; `pig` : type vu par Pig (local_engine.py)"""
+    return NUMPY_TYPES.get((PIG_LOGICAL_TYPES if pig else TYPES)[name])
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "show"
+    if command == "pig-params":
+        sys.stdout.write(pig_params(*sys.argv[2:3]))
+    elif command == "pig-schema":
+        print(pig_schema())
+    else:
+        print(f"{SCHEMA['name']} v{VERSION} ({schema_path()})")
+        for name in FIELDS:
+            pig = PIG_LOGICAL_TYPES[name]
+            print(f"  {name:<12}{TYPES[name]}" + (f" (Pig: {pig})" if pig != TYPES[name] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# hadoop-scripts/spark_benchmark.py - Suite de benchmarks Spark reproductible
+"""
+Benchmarks paramétrés par volumétrie (10k à 100M lignes). Les données sont
+générées par `spark.range` côté exécuteurs (aucune boucle Python sur le
+driver). Chaque charge est exécutée avec échauffement puis répétitions ;
+on retient la médiane des temps et les métriques de stages de la
+répétition médiane. Les résultats sont écrits en JSON et comparables d'une
+exécution à l'autre (`--baseline`).
+
+Tourne par défaut sur local[*], sans cluster : les régressions se voient
+avant le déploiement sur les trois workers.
+
+Usage:
+    python3 spark_benchmark.py --scales 10k 100k 1m --output bench.json
+    python3 spark_benchmark.py --baseline bench.json --tolerance 0.2
+    python3 spark_benchmark.py --master spark://hadoop-master:7077 --scales 10m 100m
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+from stage_metrics import run_measured
+
+# Incrémenté quand les charges changent : deux fichiers de versions
+# différentes ne sont pas comparables
+SUITE_VERSION = 1
+
+DEFAULT_SCALES = ["10k", "100k", "1m"]
+NUM_CATEGORIES = 10
+# Dimension de jointure : un client pour 100 lignes, au plus 1M
+CUSTOMERS_RATIO = 100
+MAX_CUSTOMERS = 1_000_000
+
+_SUFFIXES = {"k": 1_000, "m": 1_000_000, "g": 1_000_000_000}
+
+
+def parse_scale(text):
+    """'10k' -> 10000, '100M' -> 100000000, '5000' -> 5000"""
+    text = str(text).strip().lower().replace("_", "")
+    if text and text[-1] in _SUFFIXES:
+        return int(float(text[:-1]) * _SUFFIXES[text[-1]])
+    return int(text)
+
+
+def format_scale(rows):
+    for suffix, factor in (("G", 1_000_000_000), ("M", 1_000_000), ("k", 1_000)):
+        if rows >= factor and rows % factor == 0:
+            return f"{rows // factor}{suffix}"
+    return str(rows)
+
+
+def generate_sales(spark, rows, partitions=None):
+    """Ventes synthétiques déterministes : id, category, customer_id, value, date"""
+    partitions = partitions or spark.sparkContext.defaultParallelism
+    customers = max(1, min(MAX_CUSTOMERS, rows // CUSTOMERS_RATIO))
+    return spark.range(rows, numPartitions=partitions).select(
+        F.col("id"),
+        F.concat(F.lit("Category_"), (F.col("id") % NUM_CATEGORIES).cast("string")).alias("category"),
+        # pmod : F.hash est signé, un modulo simple donnerait des clients négatifs
+        F.pmod(F.hash("id"), F.lit(customers)).cast("long").alias("customer_id"),
+        ((F.col("id") * 1.23) % 1000).alias("value"),
+        F.date_add(F.lit("2024-01-01").cast("date"), (F.col("id") % 365).cast("int")).alias("date"),
+    )
+
+
+def generate_customers(spark, rows):
+    customers = max(1, min(MAX_CUSTOMERS, rows // CUSTOMERS_RATIO))
+    return spark.range(customers).select(
+        F.col("id").alias("customer_id"),
+        F.concat(F.lit("Region_"), (F.col("id") % 5).cast("string")).alias("region"),
+    )
+
+
+def _noop(df):
+    """Exécute entièrement le plan sans rapatrier de données sur le driver"""
+    df.write.format("noop").mode("overwrite").save()
+
+
+# Charges : nom -> fonction(spark, ventes, clients) qui déclenche une action
+def workload_scan(spark, sales, customers):
+    _noop(sales)
+
+
+def workload_cache(spark, sales, customers):
+    cached = sales.cache()
+    try:
+        cached.count()
+    finally:
+        cached.unpersist(blocking=True)
+
+
+def workload_aggregation(spark, sales, customers):
+    sales.groupBy("category").agg(
+        F.count("*").alias("count"),
+        F.sum("value").alias("sum_value"),
+        F.avg("value").alias("avg_value"),
+        F.stddev("value").alias("stddev_value"),
+        F.min("value").alias("min_value"),
+        F.max("value").alias("max_value"),
+    ).collect()
+
+
+def workload_join(spark, sales, customers):
+    # Jointure sur clé (taille de sortie = taille des ventes), sans diffusion
+    # pour mesurer le shuffle de la jointure par tri-fusion
+    joined = sales.join(customers.hint("merge"), "customer_id")
+    joined.groupBy("region").agg(F.sum("value").alias("revenue")).collect()
+
+
+def workload_sort(spark, sales, customers):
+    _noop(sales.orderBy(F.col("value").desc(), "id"))
+
+
+WORKLOADS = {
+    "scan": workload_scan,
+    "cache": workload_cache,
+    "aggregation": workload_aggregation,
+    "join": workload_join,
+    "sort": workload_sort,
+}
+
+
+def run_workload(spark, name, rows, warmups=1, repeats=3, partitions=None):
+    """Échauffement puis répétitions ; retourne le résultat d'une charge à une échelle"""
+    action = WORKLOADS[name]
+    sales = generate_sales(spark, rows, partitions)
+    customers = generate_customers(spark, rows)
+
+    for i in range(warmups):
+        run_measured(spark, f"bench_{name}_{rows}_warmup{i}", lambda: action(spark, sales, customers))
+
+    runs = []
+    for i in range(repeats):
+        _, elapsed, metrics = run_measured(
+            spark, f"bench_{name}_{rows}_{i}", lambda: action(spark, sales, customers),
+            f"Benchmark {name} ({format_scale(rows)})")
+        metrics.pop("per_stage", None)
+        runs.append((elapsed, metrics))
+
+    times = [elapsed for elapsed, _ in runs]
+    median = statistics.median(times)
+    # Métriques de la répétition la plus proche de la médiane
+    _, median_metrics = min(runs, key=lambda run: abs(run[0] - median))
+    return {
+        "workload": name,
+        "rows": rows,
+        "scale": format_scale(rows),
+        "wall_times_s": [round(t, 4) for t in times],
+        "median_s": round(median, 4),
+        "min_s": round(min(times), 4),
+        "max_s": round(max(times), 4),
+        "rows_per_s": round(rows / median) if median > 0 else None,
+        "metrics": median_metrics,
+    }
+
+
+def run_suite(spark, scales=DEFAULT_SCALES, workloads=None, warmups=1, repeats=3,
+              partitions=None, log=print):
+    """Exécute toutes les charges à toutes les échelles ; retourne le rapport JSON"""
+    sc = spark.sparkContext
+    report = {
+        "suite_version": SUITE_VERSION,
+        "timestamp": datetime.now().isoformat(),
+        "spark_version": spark.version,
+        "master": sc.master,
+        "default_parallelism": sc.defaultParallelism,
+        # Une seule partition supprime les shuffles : résultats non comparables
+        "partitions": partitions or sc.defaultParallelism,
+        "config": {
+            key: spark.conf.get(key, None)
+            for key in ("spark.sql.adaptive.enabled",
+                        "spark.sql.shuffle.partitions",
+                        "spark.executor.memory",
+                        "spark.serializer")
+        },
+        "warmups": warmups,
+        "repeats": repeats,
+        "results": [],
+    }
+    for rows in (parse_scale(s) for s in scales):
+        for name in workloads or list(WORKLOADS):
+            result = run_workload(spark, name, rows, warmups, repeats, partitions)
+            report["results"].append(result)
+            if log:
+                log(f"{name:<12}{result['scale']:>8}{result['median_s']:>10.3f}s"
+                    f"{result['metrics']['shuffle_write_bytes']:>14}")
+    return report
+
+
+def write_report(report, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def compare(report, baseline, tolerance=0.2):
+    """Compare les médianes à un rapport de référence
+
+    Retourne la liste des comparaisons (charge, échelle, ratio, régression) ;
+    une régression est un ratio médiane/référence au-delà de 1 + tolerance.
+    """
+    if baseline.get("suite_version") != report.get("suite_version"):
+        raise ValueError("Rapports de versions de suite différentes, non comparables")
+    if baseline.get("partitions") != report.get("partitions"):
+        raise ValueError("Rapports avec des partitionnements différents, non comparables")
+    reference = {(r["workload"], r["rows"]): r for r in baseline["results"]}
+    comparisons = []
+    for result in report["results"]:
+        ref = reference.get((result["workload"], result["rows"]))
+        if ref is None or not ref["median_s"]:
+            continue
+        ratio = result["median_s"] / ref["median_s"]
+        comparisons.append({
+            "workload": result["workload"],
+            "scale": result["scale"],
+            "median_s": result["median_s"],
+            "baseline_s": ref["median_s"],
+            "ratio": round(ratio, 3),
+            "regression": ratio > 1 + tolerance,
+        })
+    return comparisons
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks Spark par volumétrie")
+    parser.add_argument("--master", default=os.environ.get("BENCHMARK_MASTER", "local[*]"))
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES,
+                        help="Volumétries, ex: 10k 100k 1m 10m 100m")
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS))
+    parser.add_argument("--warmups", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--partitions", type=int,
+                        help="Partitions des données générées (défaut: parallélisme par défaut)")
+    parser.add_argument("--output", default=f"spark_benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    parser.add_argument("--baseline", help="Rapport JSON de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Ralentissement toléré avant régression (0.2 = +20%%)")
+    args = parser.parse_args()
+
+    spark = SparkSession.builder \
+        .master(args.master) \
+        .appName("Spark-Benchmark-Suite") \
+        .config("spark.sql.adaptive.enabled", "true") \
+        .getOrCreate()
+
+    try:
+        print(f"{'charge':<12}{'échelle':>8}{'médiane':>11}{'shuffle (o)':>14}")
+        report = run_suite(spark, args.scales, args.workloads, args.warmups, args.repeats,
+                           args.partitions)
+    finally:
+        spark.stop()
+
+    print(f"✓ Résultats enregistrés: {write_report(report, args.output)}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparisons = compare(report, baseline, args.tolerance)
+        print(f"=== Comparaison avec {args.baseline} ===")
+        for c in comparisons:
+            flag = "❌ régression" if c["regression"] else "✓"
+            print(f"{c['workload']:<12}{c['scale']:>8}{c['baseline_s']:>10.3f}s"
+                  f"{c['median_s']:>10.3f}s  x{c['ratio']:<6} {flag}")
+        if any(c["regression"] for c in comparisons):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
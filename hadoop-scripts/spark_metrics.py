@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# hadoop-scripts/spark_metrics.py - Export Prometheus des métriques de stages Spark
+"""
+Métriques par stage (durée, temps d'exécution, shuffle lu/écrit, spill,
+enregistrements et octets lus) au format texte de Prometheus.
+
+La source est le magasin d'état du driver, alimenté par l'AppStatusListener
+(un SparkListener) et lu via l'API REST (stage_metrics.py) : pas de
+listener Python à enregistrer par py4j, et les mêmes chiffres que l'UI.
+
+Deux destinations, cumulables :
+- un fichier `<job>[__<phase>].prom` dans SPARK_METRICS_DIR (collecteur
+  textfile de node_exporter, ou simple lecture avec cat) ;
+- une Pushgateway (PUSHGATEWAY_URL), groupée par job et phase.
+
+Usage type :
+    metrics = collect_stage_metrics(spark, "mongodb_reader")
+    export("mongodb_reader", metrics)
+
+    first = last_stage_id(spark)     # début d'une phase dans une session partagée
+    export_app_metrics(spark, "spark_tests", phase="hdfs_operations", after_stage_id=first)
+"""
+import os
+import time
+import urllib.parse
+import urllib.request
+
+from stage_metrics import collect_app_metrics
+
+METRICS_DIR = os.environ.get("SPARK_METRICS_DIR", "/tmp/spark-metrics")
+PUSHGATEWAY_URL = os.environ.get("PUSHGATEWAY_URL")  # ex. http://pushgateway:9091
+
+# Nom de métrique, champ de per_stage, facteur, description
+STAGE_METRICS = (
+    ("spark_stage_duration_seconds", "duration_ms", 0.001, "Durée du stage (soumission -> fin)"),
+    ("spark_stage_executor_run_time_seconds", "executor_run_time_ms", 0.001,
+     "Temps d'exécution cumulé des tâches du stage"),
+    ("spark_stage_tasks", "tasks", 1, "Tâches terminées"),
+    ("spark_stage_input_bytes", "input_bytes", 1, "Octets lus depuis les sources"),
+    ("spark_stage_input_records", "input_records", 1, "Enregistrements lus depuis les sources"),
+    ("spark_stage_shuffle_read_bytes", "shuffle_read_bytes", 1, "Octets de shuffle lus"),
+    ("spark_stage_shuffle_write_bytes", "shuffle_write_bytes", 1, "Octets de shuffle écrits"),
+    ("spark_stage_memory_spill_bytes", "memory_spill_bytes", 1, "Spill mémoire"),
+    ("spark_stage_disk_spill_bytes", "disk_spill_bytes", 1, "Spill disque"),
+)
+
+# Totaux du job (ou de la phase), mêmes unités
+TOTAL_METRICS = (
+    ("spark_job_stages", "stages", 1, "Stages exécutés (hors stages ignorés)"),
+    ("spark_job_executor_run_time_seconds", "executor_run_time_ms", 0.001,
+     "Temps d'exécution cumulé des tâches"),
+    ("spark_job_input_bytes", "input_bytes", 1, "Octets lus depuis les sources"),
+    ("spark_job_input_records", "input_records", 1, "Enregistrements lus depuis les sources"),
+    ("spark_job_shuffle_read_bytes", "shuffle_read_bytes", 1, "Octets de shuffle lus"),
+    ("spark_job_shuffle_write_bytes", "shuffle_write_bytes", 1, "Octets de shuffle écrits"),
+    ("spark_job_memory_spill_bytes", "memory_spill_bytes", 1, "Spill mémoire"),
+    ("spark_job_disk_spill_bytes", "disk_spill_bytes", 1, "Spill disque"),
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", " ").replace('"', '\\"')
+
+
+def _labels(pairs):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _value(raw, factor):
+    # Les octets restent entiers (pas de notation exponentielle tronquée)
+    return str(int(raw)) if factor == 1 else f"{raw * factor:.3f}"
+
+
+def prometheus_text(job, metrics, phase=None, wall_seconds=None):
+    """Document Prometheus pour le résultat de collect_stage_metrics / collect_app_metrics"""
+    base = [("job", job)] + ([("phase", phase)] if phase else [])
+    lines = []
+    for name, field, factor, help_text in STAGE_METRICS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for stage in metrics["per_stage"]:
+            labels = _labels(base + [
+                ("stage_id", stage["stage_id"]),
+                ("attempt", stage["attempt"]),
+                # Nom tronqué : « count at NativeMethodAccessorImpl.java:0 »
+                ("stage_name", stage["name"][:80]),
+            ])
+            lines.append(f"{name}{labels} {_value(stage[field], factor)}")
+    for name, field, factor, help_text in TOTAL_METRICS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge",
+                  f"{name}{_labels(base)} {_value(metrics[field], factor)}"]
+    if wall_seconds is not None:
+        lines += ["# HELP spark_job_wall_time_seconds Durée mesurée côté driver",
+                  "# TYPE spark_job_wall_time_seconds gauge",
+                  f"spark_job_wall_time_seconds{_labels(base)} {wall_seconds:.3f}"]
+    lines += ["# HELP spark_job_last_export_timestamp_seconds Date de l'export",
+              "# TYPE spark_job_last_export_timestamp_seconds gauge",
+              f"spark_job_last_export_timestamp_seconds{_labels(base)} {time.time():.0f}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(job, text, phase=None, directory=METRICS_DIR):
+    """Écriture atomique (le collecteur textfile ne lit jamais un fichier partiel)"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{job}__{phase}.prom" if phase else f"{job}.prom")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return path
+
+
+def push(job, text, phase=None, url=PUSHGATEWAY_URL, timeout=10):
+    """PUT vers la Pushgateway : remplace le groupe (job, phase)"""
+    target = f"{url.rstrip('/')}/metrics/job/{urllib.parse.quote(job, safe='')}"
+    if phase:
+        target += f"/phase/{urllib.parse.quote(phase, safe='')}"
+    request = urllib.request.Request(target, data=text.encode("utf-8"), method="PUT",
+                                     headers={"Content-Type": "text/plain; version=0.0.4"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status
+
+
+def export(job, metrics, phase=None, wall_seconds=None):
+    """Exporte vers le fichier .prom et, si configurée, la Pushgateway ; retourne le fichier"""
+    text = prometheus_text(job, metrics, phase, wall_seconds)
+    path = write_textfile(job, text, phase)
+    if PUSHGATEWAY_URL:
+        try:
+            push(job, text, phase)
+        except OSError as e:
+            print(f"Pushgateway indisponible ({PUSHGATEWAY_URL}): {e}")
+    return path
+
+
+def export_app_metrics(spark, job, phase=None, wall_seconds=None, after_stage_id=-1):
+    """Collecte les stages postérieurs à `after_stage_id` puis les exporte (avant spark.stop())"""
+    return export(job, collect_app_metrics(spark, after_stage_id), phase, wall_seconds)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# hadoop-scripts/spark_session.py - Fabrique de sessions Spark à profils nommés
+"""
+Une seule source pour la configuration des sessions Spark des jobs :
+
+- profils nommés (local-dev, cluster-3-workers, large-batch), choisis par
+  argument ou par la variable SPARK_PROFILE ;
+- Adaptive Query Execution partout : regroupement des petites partitions
+  après shuffle (les GROUP BY par catégorie n'ont qu'une dizaine de clés) et
+  découpage des partitions déséquilibrées des jointures par tri-fusion
+  (clients suivant une loi de Zipf). Les agrégations restent protégées des
+  clés chaudes par l'agrégation partielle côté map ;
+- sérialisation Kryo (shuffle de RDD, cache sérialisé) ;
+- mémoire des exécuteurs déduite de la taille des workers déclarée dans
+  docker-compose.yml (SPARK_WORKER_MEMORY, SPARK_WORKER_CORES,
+  SPARK_WORKER_COUNT, transmises au master) ;
+- connecteur MongoDB lu depuis les jars copiés dans l'image
+  (SPARK_EXTRA_JARS_DIR) : démarrage sans résolution Ivy ni réseau. Sans
+  ces jars, repli sur spark.jars.packages.
+
+Usage type :
+    spark = get_session("MongoDB-Hadoop-Reader", mongo=True)
+    with conf_overrides(spark, {"spark.sql.shuffle.partitions": "4"}):
+        ...
+
+    python3 spark_session.py --profile large-batch   # configuration résolue
+"""
+import argparse
+import json
+import os
+import re
+from contextlib import contextmanager
+
+from pyspark.sql import SparkSession
+
+PROFILES = ("local-dev", "cluster-3-workers", "large-batch")
+DEFAULT_PROFILE = os.environ.get("SPARK_PROFILE", "cluster-3-workers")
+SPARK_MASTER_URL = os.environ.get("SPARK_MASTER_URL", "spark://hadoop-master:7077")
+
+# Taille des workers (docker-compose.yml, bloc x-spark-worker)
+WORKER_MEMORY = os.environ.get("SPARK_WORKER_MEMORY", "2g")
+WORKER_CORES = int(os.environ.get("SPARK_WORKER_CORES", "2"))
+WORKER_COUNT = int(os.environ.get("SPARK_WORKER_COUNT", "3"))
+
+# Part de mémoire hors tas JVM (buffers réseau, Python) : 10 %, au moins 384 Mo
+OVERHEAD_FRACTION = 0.10
+MIN_OVERHEAD_MB = 384
+
+MONGO_CONNECTOR_PACKAGE = "org.mongodb.spark:mongo-spark-connector_2.12:3.0.1"
+# Connecteur et dépendances copiés par hadoop-master/Dockerfile
+MONGO_CONNECTOR_JARS = (
+    "mongo-spark-connector_2.12-3.0.1.jar",
+    "mongodb-driver-sync-4.0.5.jar",
+    "mongodb-driver-core-4.0.5.jar",
+    "bson-4.0.5.jar",
+)
+EXTRA_JARS_DIR = os.environ.get("SPARK_EXTRA_JARS_DIR", "/opt/spark/extra-jars")
+
+_UNITS = {"k": 1 / 1024, "m": 1, "g": 1024, "t": 1024 * 1024}
+
+
+def memory_mb(text):
+    """'2g' -> 2048, '512m' -> 512 (syntaxe des tailles Spark)"""
+    match = re.fullmatch(r"(\d+)([kmgt]?)b?", str(text).strip().lower())
+    if not match:
+        raise ValueError(f"Taille mémoire invalide: {text}")
+    return int(int(match.group(1)) * _UNITS[match.group(2) or "m"])
+
+
+def executor_sizing(worker_memory=WORKER_MEMORY, worker_cores=WORKER_CORES,
+                    worker_count=WORKER_COUNT, cores_per_executor=None):
+    """Exécuteurs, coeurs et mémoire (tas + overhead) pour remplir les workers"""
+    cores = min(cores_per_executor or worker_cores, worker_cores)
+    per_worker = max(1, worker_cores // cores)
+    budget = memory_mb(worker_memory) // per_worker
+    overhead = max(MIN_OVERHEAD_MB, int(budget * OVERHEAD_FRACTION))
+    heap = budget - overhead
+    if heap < 512:
+        raise ValueError(f"Workers trop petits ({worker_memory}) pour {per_worker} exécuteur(s)")
+    return {
+        "executors": per_worker * worker_count,
+        "cores": cores,
+        "total_cores": per_worker * worker_count * cores,
+        "memory": f"{heap}m",
+        "overhead": f"{overhead}m",
+    }
+
+
+def _common(advisory, skew_threshold):
+    return {
+        "spark.serializer": "org.apache.spark.serializer.KryoSerializer",
+        "spark.kryoserializer.buffer.max": "128m",
+        "spark.sql.adaptive.enabled": "true",
+        "spark.sql.adaptive.coalescePartitions.enabled": "true",
+        "spark.sql.adaptive.advisoryPartitionSizeInBytes": advisory,
+        "spark.sql.adaptive.skewJoin.enabled": "true",
+        "spark.sql.adaptive.skewJoin.skewedPartitionFactor": "5",
+        "spark.sql.adaptive.skewJoin.skewedPartitionThresholdInBytes": skew_threshold,
+        "spark.sql.adaptive.localShuffleReader.enabled": "true",
+        # toPandas / createDataFrame(pandas) par lots Arrow (arrow_export.py)
+        "spark.sql.execution.arrow.pyspark.enabled": "true",
+    }
+
+
+def _cluster(sizing):
+    return {
+        "spark.master": SPARK_MASTER_URL,
+        "spark.executor.cores": str(sizing["cores"]),
+        "spark.executor.memory": sizing["memory"],
+        "spark.executor.memoryOverhead": sizing["overhead"],
+        # Plafond plus bas quand scripts/orchestrator.py partage le cluster entre jobs
+        "spark.cores.max": os.environ.get("SPARK_CORES_MAX") or str(sizing["total_cores"]),
+    }
+
+
+def profile_config(profile=None, mongo=False):
+    """Configuration complète d'un profil (dictionnaire clé Spark -> valeur)"""
+    profile = profile or DEFAULT_PROFILE
+    if profile == "local-dev":
+        config = _common("16m", "64m")
+        config.update({
+            "spark.master": "local[*]",
+            "spark.driver.memory": "2g",
+            "spark.sql.shuffle.partitions": "8",
+        })
+    elif profile == "cluster-3-workers":
+        sizing = executor_sizing()
+        config = _common("32m", "128m")
+        config.update(_cluster(sizing))
+        config.update({
+            "spark.driver.memory": "1g",
+            # Deux vagues de tâches par coeur ; AQE regroupe les partitions vides
+            "spark.sql.shuffle.partitions": str(2 * sizing["total_cores"]),
+        })
+    elif profile == "large-batch":
+        sizing = executor_sizing()
+        config = _common("128m", "256m")
+        config.update(_cluster(sizing))
+        config.update({
+            "spark.driver.memory": "2g",
+            "spark.driver.maxResultSize": "1g",
+            # Beaucoup de partitions initiales, ramenées à ~128 Mo chacune par AQE
+            "spark.sql.shuffle.partitions": str(8 * sizing["total_cores"]),
+            "spark.sql.adaptive.coalescePartitions.initialPartitionNum": str(16 * sizing["total_cores"]),
+            "spark.sql.files.maxPartitionBytes": "256m",
+            "spark.network.timeout": "300s",
+        })
+    else:
+        raise ValueError(f"Profil inconnu: {profile} (attendus: {', '.join(PROFILES)})")
+
+    if mongo:
+        config.update(mongo_connector_config())
+    return config
+
+
+def mongo_connector_config(jars_dir=EXTRA_JARS_DIR):
+    """Jars pré-installés si présents, sinon résolution Maven au démarrage"""
+    jars = [os.path.join(jars_dir, name) for name in MONGO_CONNECTOR_JARS]
+    if all(os.path.exists(jar) for jar in jars):
+        return {"spark.jars": ",".join(jars)}
+    print(f"⚠️ Connecteur MongoDB absent de {jars_dir}: téléchargement de {MONGO_CONNECTOR_PACKAGE}")
+    return {"spark.jars.packages": MONGO_CONNECTOR_PACKAGE}
+
+
+def get_session(app_name, profile=None, mongo=False, extra=None):
+    """SparkSession configurée selon le profil ; `extra` complète ou remplace des clés"""
+    config = profile_config(profile, mongo)
+    config.update(extra or {})
+    builder = SparkSession.builder.appName(app_name)
+    for key, value in config.items():
+        builder = builder.config(key, value)
+    return builder.getOrCreate()
+
+
+@contextmanager
+def conf_overrides(spark, overrides):
+    """Options SQL modifiées le temps d'un bloc, puis restaurées (session partagée)"""
+    previous = {key: spark.conf.get(key, None) for key in overrides}
+    for key, value in overrides.items():
+        spark.conf.set(key, value)
+    try:
+        yield spark
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                spark.conf.unset(key)
+            else:
+                spark.conf.set(key, value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Configuration résolue d'un profil Spark")
+    parser.add_argument("--profile", choices=PROFILES, default=DEFAULT_PROFILE)
+    parser.add_argument("--mongo", action="store_true", help="avec le connecteur MongoDB")
+    args = parser.parse_args()
+    print(json.dumps(profile_config(args.profile, args.mongo), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# hadoop-scripts/stage_metrics.py - Métriques de stages via l'API REST de Spark
+"""
+Lecture des métriques d'exécution (octets lus, shuffle, spill, temps) des
+jobs Spark d'un groupe donné, à partir de l'API REST de l'UI du driver
+(`/api/v1/applications/<id>/...`). Aucune dépendance : urllib suffit.
+
+Usage type :
+    sc.setJobGroup("csv_scan", "Lecture CSV")
+    df.count()
+    metrics = collect_stage_metrics(spark, "csv_scan")
+"""
+import json
+import time
+import urllib.request
+from datetime import datetime
+
+
+def _get(spark, path):
+    base = spark.sparkContext.uiWebUrl
+    if base is None:
+        raise RuntimeError("UI Spark désactivée (spark.ui.enabled=false)")
+    url = f"{base}/api/v1/applications/{spark.sparkContext.applicationId}{path}"
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def _group_stage_ids(spark, job_group):
+    jobs = [job for job in _get(spark, "/jobs") if job.get("jobGroup") == job_group]
+    finished = all(job["status"] in ("SUCCEEDED", "FAILED") for job in jobs)
+    stage_ids = sorted({sid for job in jobs for sid in job["stageIds"]})
+    return jobs, stage_ids, finished
+
+
+def _duration_ms(stage):
+    """Durée d'un stage (soumission -> fin), 0 si inconnue"""
+    try:
+        start, end = (datetime.strptime(stage[key], "%Y-%m-%dT%H:%M:%S.%fGMT")
+                      for key in ("submissionTime", "completionTime"))
+    except (KeyError, ValueError):
+        return 0
+    return int((end - start).total_seconds() * 1000)
+
+
+def _summarize(spark, jobs, wanted=None):
+    """Totaux et détail par stage ; `wanted` : identifiants retenus (None : tous)"""
+    totals = {
+        "jobs": len(jobs),
+        "stages": 0,
+        "tasks": 0,
+        "input_bytes": 0,
+        "input_records": 0,
+        "output_bytes": 0,
+        "shuffle_read_bytes": 0,
+        "shuffle_write_bytes": 0,
+        "memory_spill_bytes": 0,
+        "disk_spill_bytes": 0,
+        "executor_run_time_ms": 0,
+    }
+    per_stage = []
+    for stage in _get(spark, "/stages"):
+        # Les stages ignorés (résultats de shuffle réutilisés) n'ont rien exécuté
+        if (wanted is not None and stage["stageId"] not in wanted) or stage["status"] == "SKIPPED":
+            continue
+        totals["stages"] += 1
+        totals["tasks"] += stage.get("numCompleteTasks", 0)
+        totals["input_bytes"] += stage.get("inputBytes", 0)
+        totals["input_records"] += stage.get("inputRecords", 0)
+        totals["output_bytes"] += stage.get("outputBytes", 0)
+        totals["shuffle_read_bytes"] += stage.get("shuffleReadBytes", 0)
+        totals["shuffle_write_bytes"] += stage.get("shuffleWriteBytes", 0)
+        totals["memory_spill_bytes"] += stage.get("memoryBytesSpilled", 0)
+        totals["disk_spill_bytes"] += stage.get("diskBytesSpilled", 0)
+        totals["executor_run_time_ms"] += stage.get("executorRunTime", 0)
+        per_stage.append({
+            "stage_id": stage["stageId"],
+            "attempt": stage.get("attemptId", 0),
+            "name": stage.get("name", ""),
+            "status": stage.get("status", ""),
+            "duration_ms": _duration_ms(stage),
+            "tasks": stage.get("numCompleteTasks", 0),
+            "input_bytes": stage.get("inputBytes", 0),
+            "input_records": stage.get("inputRecords", 0),
+            "shuffle_read_bytes": stage.get("shuffleReadBytes", 0),
+            "shuffle_write_bytes": stage.get("shuffleWriteBytes", 0),
+            "memory_spill_bytes": stage.get("memoryBytesSpilled", 0),
+            "disk_spill_bytes": stage.get("diskBytesSpilled", 0),
+            "executor_run_time_ms": stage.get("executorRunTime", 0),
+        })
+    totals["per_stage"] = sorted(per_stage, key=lambda s: s["stage_id"])
+    return totals
+
+
+def collect_stage_metrics(spark, job_group, wait_seconds=5.0):
+    """Agrège les métriques des stages exécutés par un groupe de jobs
+
+    Le bus d'événements de Spark est asynchrone : on attend (au plus
+    `wait_seconds`) que les jobs du groupe apparaissent comme terminés.
+    """
+    deadline = time.time() + wait_seconds
+    jobs, stage_ids, finished = _group_stage_ids(spark, job_group)
+    while not finished and time.time() < deadline:
+        time.sleep(0.2)
+        jobs, stage_ids, finished = _group_stage_ids(spark, job_group)
+    return _summarize(spark, jobs, set(stage_ids))
+
+
+def last_stage_id(spark):
+    """Plus grand identifiant de stage attribué (-1 avant le premier job)"""
+    return max((stage["stageId"] for stage in _get(spark, "/stages")), default=-1)
+
+
+def collect_app_metrics(spark, after_stage_id=-1, wait_seconds=5.0):
+    """Métriques des stages de l'application postérieurs à `after_stage_id`
+
+    Les identifiants de stage sont croissants : relever `last_stage_id()` au
+    début d'une phase isole ses stages dans une session partagée, y compris
+    ceux des jobs lancés depuis d'autres threads (requêtes de streaming).
+    """
+    deadline = time.time() + wait_seconds
+
+    def phase_jobs():
+        return [job for job in _get(spark, "/jobs")
+                if any(sid > after_stage_id for sid in job["stageIds"])]
+
+    jobs = phase_jobs()
+    while any(job["status"] == "RUNNING" for job in jobs) and time.time() < deadline:
+        time.sleep(0.2)
+        jobs = phase_jobs()
+    wanted = {sid for job in jobs for sid in job["stageIds"] if sid > after_stage_id}
+    return _summarize(spark, jobs, wanted)
+
+
+def run_measured(spark, job_group, action, description=None):
+    """Exécute `action()` dans un groupe de jobs ; retourne (résultat, durée, métriques)"""
+    sc = spark.sparkContext
+    sc.setJobGroup(job_group, description or job_group)
+    try:
+        start = time.perf_counter()
+        result = action()
+        elapsed = time.perf_counter() - start
+    finally:
+        sc.setLocalProperty("spark.jobGroup.id", None)
+        sc.setLocalProperty("spark.job.description", None)
+    return result, elapsed, collect_stage_metrics(spark, job_group)
+
+
+def _metric_value(node, name):
+    for metric in node.get("metrics", []):
+        if metric.get("name") == name:
+            digits = "".join(ch for ch in str(metric.get("value", "")) if ch.isdigit())
+            return int(digits) if digits else 0
+    return 0
+
+
+def count_source_scans(spark, since_execution_id=-1):
+    """Compte les lectures effectives des sources dans les requêtes SQL exécutées
+
+    Une requête servie depuis un cache garde son nœud `Scan ...` dans le plan,
+    mais avec 0 ligne produite : seuls les scans ayant produit des lignes sont
+    comptés. Retourne {"total": n, "par_source": {nom du nœud: n}}.
+    """
+    executions = _get(spark, "/sql?details=true&planDescription=false&length=10000")
+    per_source = {}
+    for execution in executions:
+        if execution["id"] <= since_execution_id:
+            continue
+        for node in execution.get("nodes", []):
+            name = node.get("nodeName", "")
+            if not name.startswith("Scan"):
+                continue
+            if _metric_value(node, "number of output rows") > 0:
+                per_source[name] = per_source.get(name, 0) + 1
+    return {"total": sum(per_source.values()), "par_source": per_source}
+
+
+def last_sql_execution_id(spark):
+    """Identifiant de la dernière requête SQL exécutée (-1 si aucune)"""
+    executions = _get(spark, "/sql?details=false&length=10000")
+    return max((e["id"] for e in executions), default=-1)
@@ -0,0 +1,140 @@
+// mongodb-init/00-provision.js - Provisionnement versionné de la base bigdata
+//
+// Exécuté avant init.js au premier démarrage (ordre alphabétique de
+// /docker-entrypoint-initdb.d), et rejouable à tout moment sur une base
+// existante via scripts/provision-mongodb.sh : chaque migration n'est
+// appliquée qu'une fois (collection schema_migrations) et chaque étape est
+// elle-même idempotente.
+//
+// SALES_COLLECTION_MODE (variable d'environnement du conteneur) :
+//   clustered  (défaut) collection groupée sur _id : les lectures par plage
+//              d'_id (rattrapage de /api/stats, partitionnement Spark) sont
+//              des parcours ordonnés, sans index _id séparé
+//   timeseries collection time-series (timeField "ts", metaField "meta") :
+//              stockage compressé pour l'analytique ; pas de change stream
+//              (/api/stats passe en suivi par filigrane), champ ts requis
+//   standard   collection classique
+// Le mode n'est appliqué qu'à la création : une collection existante n'est
+// jamais convertie.
+
+db = db.getSiblingDB('bigdata');
+
+const SALES_MODE = (typeof process !== 'undefined' && process.env.SALES_COLLECTION_MODE) || 'clustered';
+
+function collectionExists(name) {
+    return db.getCollectionInfos({ name: name }).length > 0;
+}
+
+function ensureCollection(name, options) {
+    if (collectionExists(name)) {
+        print(`  collection ${name} déjà présente`);
+        return false;
+    }
+    db.createCollection(name, options || {});
+    print(`  collection ${name} créée`);
+    return true;
+}
+
+function ensureValidator(name, schema) {
+    db.runCommand({
+        collMod: name,
+        validator: { $jsonSchema: schema },
+        validationLevel: 'moderate',
+        validationAction: 'error'
+    });
+}
+
+const SALES_SCHEMA = {
+    bsonType: 'object',
+    required: ['date', 'product', 'category', 'quantity', 'price', 'customer_id', 'region'],
+    properties: {
+        date: { bsonType: 'string', pattern: '^\\d{4}-\\d{2}-\\d{2}$' },
+        product: { bsonType: 'string' },
+        category: { bsonType: 'string' },
+        quantity: { bsonType: 'number', minimum: 0 },
+        price: { bsonType: 'number', minimum: 0 },
+        customer_id: { bsonType: 'string' },
+        region: { bsonType: 'string' },
+        total_value: { bsonType: 'number' }
+    }
+};
+
+const CUSTOMERS_SCHEMA = {
+    bsonType: 'object',
+    required: ['_id', 'name'],
+    properties: {
+        _id: { bsonType: 'string' },
+        name: { bsonType: 'string' },
+        email: { bsonType: 'string' },
+        age: { bsonType: 'number' },
+        city: { bsonType: 'string' }
+    }
+};
+
+const MIGRATIONS = [
+    {
+        version: 1,
+        description: 'Collections sales (mode ' + SALES_MODE + ') et customers, validation de schéma',
+        up: function () {
+            let salesOptions = {};
+            if (SALES_MODE === 'clustered') {
+                salesOptions = { clusteredIndex: { key: { _id: 1 }, unique: true, name: 'sales_clustered_id' } };
+            } else if (SALES_MODE === 'timeseries') {
+                salesOptions = { timeseries: { timeField: 'ts', metaField: 'meta', granularity: 'hours' } };
+            }
+            ensureCollection('sales', salesOptions);
+            // Les collections time-series n'acceptent pas de validateur
+            if (SALES_MODE !== 'timeseries') {
+                ensureValidator('sales', SALES_SCHEMA);
+            }
+            ensureCollection('customers');
+            ensureValidator('customers', CUSTOMERS_SCHEMA);
+        }
+    },
+    {
+        version: 2,
+        description: 'Index composés des ventes (égalité puis plage de dates)',
+        up: function () {
+            // Filtres poussés par mongodb_reader.py ($match sur date) et par
+            // les lectures par client, catégorie ou région sur une période
+            db.sales.createIndex({ date: 1 }, { name: 'date_1' });
+            db.sales.createIndex({ customer_id: 1, date: 1 }, { name: 'customer_id_1_date_1' });
+            db.sales.createIndex({ category: 1, date: 1 }, { name: 'category_1_date_1' });
+            db.sales.createIndex({ region: 1, date: 1 }, { name: 'region_1_date_1' });
+        }
+    },
+    {
+        version: 3,
+        description: 'Index des résultats (fenêtres streaming) et des exécutions publiées',
+        up: function () {
+            ensureCollection('results');
+            // Clé des upserts de streaming_sales.py
+            db.results.createIndex(
+                { kind: 1, window_start: 1, window_end: 1, product: 1 },
+                { name: 'window_key', unique: true }
+            );
+            db.results.createIndex({ kind: 1, window_end: -1 }, { name: 'kind_1_window_end_-1' });
+            ensureCollection('runs');
+            // Dernière exécution publiée d'un job (mongo_sink.latest_run)
+            db.runs.createIndex({ job: 1, status: 1, finished_at: -1 }, { name: 'job_status_finished' });
+        }
+    }
+];
+
+print(`=== Provisionnement bigdata (ventes: ${SALES_MODE}) ===`);
+ensureCollection('schema_migrations');
+const applied = new Set(db.schema_migrations.find({}, { _id: 1 }).toArray().map(m => m._id));
+for (const migration of MIGRATIONS) {
+    if (applied.has(migration.version)) {
+        continue;
+    }
+    print(`Migration ${migration.version}: ${migration.description}`);
+    migration.up();
+    db.schema_migrations.insertOne({
+        _id: migration.version,
+        description: migration.description,
+        applied_at: new Date()
+    });
+}
+const current = db.schema_migrations.find().sort({ _id: -1 }).limit(1).toArray();
+print(`Schéma bigdata en version ${current.length ? current[0]._id : 0}`);
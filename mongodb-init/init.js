@@ -4,6 +4,7 @@ db.sales.insertMany([
     {
         "_id": ObjectId(),
         "date": "2024-01-15",
+        "ts": ISODate("2024-01-15T00:00:00Z"),
         "product": "Laptop",
         "category": "Electronics",
         "quantity": 2,
@@ -15,6 +16,7 @@ db.sales.insertMany([
     {
         "_id": ObjectId(),
         "date": "2024-01-16",
+        "ts": ISODate("2024-01-16T00:00:00Z"),
         "product": "Phone",
         "category": "Electronics",
         "quantity": 1,
@@ -26,6 +28,7 @@ db.sales.insertMany([
     {
         "_id": ObjectId(),
         "date": "2024-01-17",
+        "ts": ISODate("2024-01-17T00:00:00Z"),
         "product": "Tablet",
         "category": "Electronics",
         "quantity": 3,
@@ -60,6 +63,4 @@ db.customers.insertMany([
     }
 ]);
 
-db.sales.createIndex({"customer_id": 1});
-db.sales.createIndex({"date": 1});
-db.sales.createIndex({"category": 1});
+// Index et validation : voir 00-provision.js (exécuté avant ce script)
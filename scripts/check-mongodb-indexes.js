@@ -0,0 +1,90 @@
+// scripts/check-mongodb-indexes.js - Vérifie que les requêtes critiques utilisent un index
+//
+// Usage (voir scripts/provision-mongodb.sh) :
+//   mongosh -u admin -p admin123 --quiet /tmp/check-mongodb-indexes.js
+// Code de sortie 1 si une requête fait un COLLSCAN non borné.
+
+db = db.getSiblingDB('bigdata');
+
+// Requêtes poussées par mongodb_reader.py, /api/stats et les jobs de résultats
+const sinceOneHour = ObjectId.createFromTime(Math.floor(Date.now() / 1000) - 3600);
+const HOT_QUERIES = [
+    {
+        name: 'ventes par plage de dates (mongodb_reader --date-from/--date-to)',
+        run: () => db.sales.find({ date: { $gte: '2024-01-01', $lte: '2024-03-31' } })
+    },
+    {
+        name: 'ventes d\'un client sur une période',
+        run: () => db.sales.find({ customer_id: 'C001', date: { $gte: '2024-01-01' } }).sort({ date: 1 })
+    },
+    {
+        name: 'ventes d\'une catégorie sur une période',
+        run: () => db.sales.find({ category: 'Electronics', date: { $gte: '2024-01-01', $lte: '2024-12-31' } })
+    },
+    {
+        name: 'ventes d\'une région sur une période',
+        run: () => db.sales.find({ region: 'North', date: { $gte: '2024-01-01', $lte: '2024-12-31' } })
+    },
+    {
+        name: 'rattrapage /api/stats (plage d\'_id triée)',
+        run: () => db.sales.find({ _id: { $gte: sinceOneHour } }).sort({ _id: 1 })
+    },
+    {
+        name: 'client par identifiant (jointure)',
+        run: () => db.customers.find({ _id: 'C001' })
+    },
+    {
+        name: 'fenêtre streaming (clé d\'upsert)',
+        run: () => db.results.find({
+            kind: 'tumbling_1m', window_start: new Date(0), window_end: new Date(60000), product: 'Laptop'
+        })
+    },
+    {
+        name: 'dernière exécution publiée',
+        run: () => db.runs.find({ job: 'mongodb_reader', status: 'published' }).sort({ finished_at: -1 }).limit(1)
+    }
+];
+
+// Étapes d'un plan : parcours récursif (plans classiques et SBE)
+function planStages(node, stages) {
+    if (node === null || typeof node !== 'object') {
+        return stages;
+    }
+    if (typeof node.stage === 'string') {
+        stages.push(node);
+    }
+    for (const key of Object.keys(node)) {
+        if (key !== 'stage') {
+            planStages(node[key], stages);
+        }
+    }
+    return stages;
+}
+
+function usesIndex(stages) {
+    const names = stages.map(s => s.stage);
+    // Parcours de collection groupée borné par _id : équivalent d'un parcours d'index
+    const boundedScan = stages.some(s => s.stage === 'COLLSCAN' && (s.minRecord !== undefined || s.maxRecord !== undefined));
+    const unboundedScan = stages.some(s => s.stage === 'COLLSCAN' && s.minRecord === undefined && s.maxRecord === undefined);
+    const indexed = names.some(n => ['IXSCAN', 'CLUSTERED_IXSCAN', 'IDHACK', 'EXPRESS_IXSCAN'].includes(n));
+    return !unboundedScan && (indexed || boundedScan);
+}
+
+let failures = 0;
+for (const query of HOT_QUERIES) {
+    const plan = query.run().explain('queryPlanner').queryPlanner.winningPlan;
+    const stages = planStages(plan, []);
+    const indexes = stages.filter(s => s.indexName).map(s => s.indexName);
+    const ok = usesIndex(stages);
+    if (!ok) {
+        failures += 1;
+    }
+    print(`${ok ? '✓' : '✗'} ${query.name}: ${stages.map(s => s.stage).join(' <- ')}` +
+          (indexes.length ? ` [${indexes.join(', ')}]` : ''));
+}
+
+if (failures > 0) {
+    print(`${failures} requête(s) sans index`);
+    quit(1);
+}
+print('Toutes les requêtes critiques utilisent un index');
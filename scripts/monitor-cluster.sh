@@ -88,5 +88,29 @@ except:
     print('❌ Impossible de récupérer les informations Spark')
 " 2>/dev/null
 
+echo ""
+echo "--- Latences de l'application web (/metrics) ---"
+curl -s --max-time 5 http://localhost:5000/metrics | python3 -c "
+import sys, re
+counts, sums = {}, {}
+for line in sys.stdin:
+    m = re.match(r'webapp_request_duration_seconds_(sum|count)\{route=\"([^\"]*)\".*\} (\S+)', line)
+    if m:
+        target = sums if m.group(1) == 'sum' else counts
+        target[m.group(2)] = target.get(m.group(2), 0) + float(m.group(3))
+    elif line.startswith(('webapp_probe_latency_seconds', 'webapp_mongo_pool_in_use')):
+        print('  ' + line.strip())
+for route in sorted(counts, key=lambda r: -sums.get(r, 0)):
+    print(f'  {route}: {int(counts[route])} requêtes, {1000 * sums[route] / counts[route]:.1f} ms en moyenne')
+" 2>/dev/null || echo "❌ /metrics indisponible"
+
+echo ""
+echo "--- Derniers exports Prometheus des jobs Spark ---"
+docker exec hadoop-master sh -c 'ls -t /tmp/spark-metrics/*.prom 2>/dev/null | head -5' | while read -r file; do
+    echo "  $file"
+    docker exec hadoop-master grep -E '^spark_(stage_duration|job_wall_time)_seconds' "$file" \
+        | sort -t' ' -k2 -rn | head -3 | sed 's/^/    /'
+done
+
 echo ""
 echo "=== Fin du monitoring ==="
\ No newline at end of file
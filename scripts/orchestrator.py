@@ -0,0 +1,687 @@
+#!/usr/bin/env python3
+# scripts/orchestrator.py - Exécution des analyses en graphe de dépendances
+"""
+Enchaîne les scripts run-*.sh selon leurs dépendances au lieu de les lancer
+l'un après l'autre :
+
+    setup ─┬─ ingestion ───── spark_tests ──────┐
+           ├─ prepare_sales ─ pig_analysis ─────┼─ webapp_cache
+           └─ mongodb_analysis (publication) ───┘
+
+- les tâches indépendantes tournent en parallèle, dans la limite de
+  `--max-parallel` et de la capacité de leur pool : vcores libres de YARN
+  (Pig), coeurs libres du master Spark (jobs sur le cluster, chacun plafonné
+  à `--spark-cores` via SPARK_CORES_MAX), un seul job Spark local[*] à la
+  fois sur hadoop-master ;
+- une tâche en échec est relancée (`retries`, délai doublé à chaque essai) ;
+  ses dépendantes sont marquées upstream_failed ;
+- une tâche est ignorée si l'empreinte de ses entrées (fichiers locaux,
+  chemins HDFS, collections MongoDB, date de démarrage d'un conteneur) n'a
+  pas changé depuis son dernier succès. Les entrées d'une tâche incluent
+  les sorties de ses dépendances : modifier un script Pig relance Pig et la
+  webapp, pas les jobs Spark. Une entrée illisible (ou aucune entrée)
+  force l'exécution. Les sorties de la tâche font partie de l'empreinte,
+  relevée après son succès : une sortie supprimée ou modifiée (ex.
+  /output effacé sur HDFS) la relance ;
+- rapport de durée par tâche (attente, début, durée, essais), affiché et
+  écrit dans `.orchestrator/reports/`.
+
+La copie des scripts et l'installation des dépendances Python sont faites
+une seule fois par la tâche setup : les run-*.sh sont lancés avec
+SKIP_SETUP=1. Journaux par tâche dans `.orchestrator/logs/`.
+
+Le mode `--stub` remplace les scripts par des pauses (mêmes dépendances,
+mêmes pools, capacités fixes) : tout se teste sans cluster.
+
+Usage type :
+    python3 scripts/orchestrator.py                        # graphe complet
+    python3 scripts/orchestrator.py --targets pig_analysis # avec ses dépendances
+    python3 scripts/orchestrator.py --dry-run              # plan, sans rien lancer
+    python3 scripts/orchestrator.py --stub --stub-fail pig_analysis
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_DIR = os.environ.get("ORCHESTRATOR_STATE_DIR", os.path.join(ROOT, ".orchestrator"))
+
+RESOURCEMANAGER_URL = os.environ.get("RESOURCEMANAGER_URL", "http://localhost:8088/ws/v1/cluster/metrics")
+SPARK_MASTER_URL = os.environ.get("SPARK_MASTER_UI_URL", "http://localhost:8080/json/")
+WEBHDFS_URL = os.environ.get("WEBHDFS_URL", "http://localhost:9870/webhdfs/v1")
+WEBAPP_URL = os.environ.get("WEBAPP_URL", "http://localhost:5000")
+# Intervalle de VersionProbe dans la webapp : délai avant que les nouvelles versions soient vues
+VERSION_CHECK_SECONDS = float(os.environ.get("VERSION_CHECK_SECONDS", "5"))
+
+# Capacités (coeurs) si YARN ou le master Spark ne répondent pas
+FALLBACK_CAPACITY = {"yarn": 6, "spark": 6}
+# Une seule session local[*] à la fois sur hadoop-master (prepare_sales, ingestion)
+MASTER_CAPACITY = 1
+
+# Statuts finaux
+OK, SKIPPED, FAILED, UPSTREAM_FAILED = "ok", "skipped", "failed", "upstream_failed"
+
+WORKERS = ("hadoop-worker1", "hadoop-worker2", "hadoop-worker3")
+PYTHON_PACKAGES = ("pyspark", "pymongo", "pandas", "pyarrow")
+PIG_OUTPUTS = ("category_analysis", "top_products", "regional_analysis",
+               "monthly_analysis", "valuable_customers")
+SPARK_RESULTS = ("category_analysis", "regional_analysis", "city_analysis",
+                 "monthly_analysis", "sales_cube")
+
+
+class TaskError(Exception):
+    """Échec d'une tentative (code de sortie non nul, réponse HTTP en erreur...)"""
+
+
+class Task:
+    """Noeud du graphe : action, dépendances, entrées à surveiller et besoin en coeurs"""
+
+    def __init__(self, name, action, deps=(), inputs=(), outputs=(), pool="local", cores=1,
+                 retries=1, retry_delay=10.0, description=""):
+        self.name = name
+        self.action = action        # action(task, log, attempt) ; lève une exception en cas d'échec
+        self.deps = tuple(deps)
+        self.inputs = tuple(inputs)  # "file:chemin", "hdfs:/chemin", "mongo:collection", "container:nom"
+        self.outputs = tuple(outputs)  # mêmes formes que les entrées
+        self.pool = pool
+        self.cores = cores
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.description = description
+
+
+class TaskResult:
+    def __init__(self, name):
+        self.name = name
+        self.status = None
+        self.attempts = 0
+        self.ready_at = None      # dépendances satisfaites
+        self.started_at = None    # début du premier essai
+        self.finished_at = None
+        self.run_seconds = 0.0    # somme des essais
+        self.inputs = None        # empreinte des entrées au lancement
+        self.fingerprint = None   # entrées + sorties
+        self.error = None
+        self.not_before = 0.0     # prochain essai (délai de relance)
+
+    def as_dict(self, origin):
+        def offset(value):
+            return None if value is None else round(value - origin, 3)
+        return {
+            "task": self.name,
+            "status": self.status,
+            "attempts": self.attempts,
+            "ready_s": offset(self.ready_at),
+            "start_s": offset(self.started_at),
+            "end_s": offset(self.finished_at),
+            "queued_s": (round(self.started_at - self.ready_at, 3)
+                         if self.started_at is not None and self.ready_at is not None else None),
+            "run_s": round(self.run_seconds, 3),
+            "error": self.error,
+        }
+
+
+# --- Actions ---------------------------------------------------------------
+
+def _tail(path, lines=20):
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return "".join(f.readlines()[-lines:])
+    except OSError:
+        return ""
+
+
+def command(*argv_list, env=None, spark_cores=False):
+    """Action qui exécute une ou plusieurs commandes depuis la racine du dépôt.
+
+    Avec `spark_cores`, SPARK_CORES_MAX reçoit le besoin en coeurs de la tâche.
+    """
+    def run(task, log, attempt):
+        full_env = dict(os.environ, SKIP_SETUP="1", **(env or {}))
+        if spark_cores:
+            full_env["SPARK_CORES_MAX"] = str(task.cores)
+        for argv in argv_list:
+            log.write(f"$ {' '.join(argv)}\n")
+            log.flush()
+            code = subprocess.call(argv, cwd=ROOT, env=full_env, stdout=log,
+                                   stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+            if code != 0:
+                raise TaskError(f"{' '.join(argv)}: code de sortie {code}")
+    return run
+
+
+def warm_webapp(wait_seconds=VERSION_CHECK_SECONDS, base_url=WEBAPP_URL):
+    """Action de fin : la webapp détecte les nouvelles versions puis recalcule ses réponses.
+
+    Le cache est indexé par version (run_id publié, date de modification HDFS,
+    inode des fichiers Arrow) : rien à purger, il suffit de laisser passer
+    l'intervalle de vérification puis de demander chaque réponse une fois.
+    """
+    paths = ([f"/api/results/{name}" for name in SPARK_RESULTS]
+             + [f"/api/pig/{name}" for name in PIG_OUTPUTS]
+             + ["/api/arrow"])
+
+    def run(task, log, attempt):
+        time.sleep(wait_seconds)
+        errors = []
+        for path in paths:
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(base_url + path, timeout=60) as response:
+                    status = response.status
+                    response.read()
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except OSError as e:
+                raise TaskError(f"webapp injoignable ({base_url}): {e}")
+            log.write(f"{path} -> {status} ({(time.perf_counter() - started) * 1000:.0f} ms)\n")
+            if status >= 500:
+                errors.append(f"{path}: {status}")
+        if errors:
+            raise TaskError(", ".join(errors))
+    return run
+
+
+def stub(seconds, fail_attempts=0):
+    """Action factice : pause de `seconds`, échec des `fail_attempts` premiers essais"""
+    def run(task, log, attempt):
+        log.write(f"stub {task.name}: essai {attempt}, {seconds:.2f} s\n")
+        time.sleep(seconds)
+        if attempt <= fail_attempts:
+            raise TaskError(f"échec simulé (essai {attempt})")
+    return run
+
+
+# --- Empreintes des entrées ------------------------------------------------
+
+def _get_json(url, timeout=5):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def file_fingerprint(path):
+    """Taille et date de modification de chaque fichier (récursif)"""
+    path = os.path.join(ROOT, path)
+    if not os.path.exists(path):
+        return None
+    entries = []
+    if os.path.isdir(path):
+        for directory, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+            for filename in sorted(filenames):
+                full = os.path.join(directory, filename)
+                stat = os.stat(full)
+                entries.append(f"{os.path.relpath(full, path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    else:
+        stat = os.stat(path)
+        entries.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha1("\n".join(entries).encode("utf-8")).hexdigest()
+
+
+def hdfs_fingerprint(path):
+    """Date de modification, taille et nombre de fichiers (WebHDFS)"""
+    url = f"{WEBHDFS_URL}{urllib.parse.quote(path)}"
+    try:
+        status = _get_json(f"{url}?op=GETFILESTATUS")["FileStatus"]
+        summary = _get_json(f"{url}?op=GETCONTENTSUMMARY")["ContentSummary"]
+    except (OSError, ValueError, KeyError):
+        return None
+    return f"{status['modificationTime']}:{summary['length']}:{summary['fileCount']}"
+
+
+def mongo_fingerprint(collection):
+    """Nombre de documents et dernier _id d'une collection bigdata.*"""
+    script = (f"const c = db.getSiblingDB('bigdata').getCollection('{collection}');"
+              "const last = c.find({}, {_id: 1}).sort({_id: -1}).limit(1).toArray()[0];"
+              "print(c.estimatedDocumentCount() + ':' + (last ? String(last._id) : ''));")
+    try:
+        output = subprocess.run(
+            ["docker", "exec", "mongodb", "mongosh", "-u", "admin", "-p", "admin123",
+             "--quiet", "--eval", script],
+            capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    lines = output.stdout.strip().splitlines()
+    return lines[-1] if output.returncode == 0 and lines else None
+
+
+def container_fingerprint(name):
+    """Date de démarrage : un conteneur redémarré a perdu /tmp et les paquets installés"""
+    try:
+        output = subprocess.run(["docker", "inspect", "-f", "{{.State.StartedAt}}", name],
+                                capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return output.stdout.strip() if output.returncode == 0 else None
+
+
+RESOLVERS = {
+    "file": file_fingerprint,
+    "hdfs": hdfs_fingerprint,
+    "mongo": mongo_fingerprint,
+    "container": container_fingerprint,
+}
+
+
+def task_fingerprint(task, resolvers=RESOLVERS):
+    """Empreinte des entrées et des sorties d'une tâche (None : exécution forcée)"""
+    values = fingerprint(task.inputs, resolvers)
+    outputs = fingerprint(task.outputs, resolvers)
+    if values is None or outputs is None:
+        return None
+    return dict(values, **outputs)
+
+
+def fingerprint(inputs, resolvers=RESOLVERS):
+    """{entrée: empreinte}, ou None si une entrée est illisible (exécution forcée)"""
+    values = {}
+    for spec in inputs:
+        kind, _, target = spec.partition(":")
+        resolver = resolvers.get(kind)
+        value = resolver(target) if resolver else None
+        if value is None:
+            return None
+        values[spec] = value
+    return values
+
+
+class StateStore:
+    """Empreintes du dernier succès de chaque tâche (fichier JSON, écriture atomique)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self._state = json.load(f)
+        except (OSError, ValueError):
+            self._state = {}
+
+    def fingerprint(self, name):
+        return self._state.get(name, {}).get("fingerprint")
+
+    def record(self, name, values):
+        with self._lock:
+            self._state[name] = {"fingerprint": values, "succeeded_at": datetime.now().isoformat()}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._state, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+# --- Ordonnancement --------------------------------------------------------
+
+def discover_capacities(max_parallel):
+    """Coeurs disponibles par pool : YARN (vcores libres), Spark (coeurs libres)"""
+    capacities = {"master": MASTER_CAPACITY, "local": max_parallel}
+    try:
+        metrics = _get_json(RESOURCEMANAGER_URL)["clusterMetrics"]
+        capacities["yarn"] = max(1, metrics["availableVirtualCores"])
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ ResourceManager injoignable ({e}): {FALLBACK_CAPACITY['yarn']} vcores supposés")
+        capacities["yarn"] = FALLBACK_CAPACITY["yarn"]
+    try:
+        master = _get_json(SPARK_MASTER_URL)
+        capacities["spark"] = max(1, master["cores"] - master.get("coresused", 0))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Master Spark injoignable ({e}): {FALLBACK_CAPACITY['spark']} coeurs supposés")
+        capacities["spark"] = FALLBACK_CAPACITY["spark"]
+    return capacities
+
+
+def select(tasks, targets):
+    """Tâches demandées et leurs dépendances, dans l'ordre de déclaration ; vérifie le graphe"""
+    by_name = {task.name: task for task in tasks}
+    for task in tasks:
+        for dep in task.deps:
+            if dep not in by_name:
+                raise ValueError(f"{task.name}: dépendance inconnue {dep}")
+
+    wanted = set()
+    stack = list(targets or by_name)
+    while stack:
+        name = stack.pop()
+        if name not in by_name:
+            raise ValueError(f"tâche inconnue: {name}")
+        if name not in wanted:
+            wanted.add(name)
+            stack.extend(by_name[name].deps)
+
+    # Tri topologique (Kahn) en conservant l'ordre de déclaration
+    ordered, done = [], set()
+    remaining = [task for task in tasks if task.name in wanted]
+    while remaining:
+        ready = [task for task in remaining if all(dep in done for dep in task.deps)]
+        if not ready:
+            raise ValueError(f"cycle entre: {', '.join(task.name for task in remaining)}")
+        for task in ready:
+            ordered.append(task)
+            done.add(task.name)
+        remaining = [task for task in remaining if task.name not in done]
+    return ordered
+
+
+class Scheduler:
+    """Lance les tâches prêtes en parallèle sous les limites de pool et de concurrence"""
+
+    def __init__(self, tasks, capacities, max_parallel, state, log_dir,
+                 resolvers=RESOLVERS, force=False, clock=time.monotonic):
+        self.tasks = {task.name: task for task in tasks}
+        self.order = [task.name for task in tasks]
+        self.capacities = capacities
+        self.max_parallel = max_parallel
+        self.state = state
+        self.log_dir = log_dir
+        self.resolvers = resolvers
+        self.force = force
+        self.clock = clock
+        self.results = {name: TaskResult(name) for name in self.order}
+        self.usage = {pool: 0 for pool in capacities}
+        self.origin = None
+
+    def demand(self, task):
+        # Une tâche plus gourmande que le pool entier l'occupe seule
+        return min(task.cores, self.capacities[task.pool])
+
+    def should_skip(self, task, result):
+        # Empreinte prise quand les dépendances sont terminées : leurs sorties y sont.
+        # Sorties de la tâche comprises : une sortie absente force l'exécution
+        if self.force or not result.fingerprint:
+            return False
+        return self.state.fingerprint(task.name) == result.fingerprint
+
+    def _attempt(self, task, attempt):
+        """Exécute un essai dans un thread du pool ; retourne (durée, erreur)"""
+        path = os.path.join(self.log_dir, f"{task.name}.log")
+        started = self.clock()
+        with open(path, "a" if attempt > 1 else "w", encoding="utf-8") as log:
+            log.write(f"=== {task.name} : essai {attempt} ({datetime.now().isoformat()}) ===\n")
+            log.flush()
+            try:
+                task.action(task, log, attempt)
+                error = None
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+                log.write(f"ÉCHEC: {error}\n")
+        return self.clock() - started, error
+
+    def _finish(self, name, status, error=None):
+        result = self.results[name]
+        result.status = status
+        result.error = error
+        result.finished_at = self.clock()
+
+    def _dispatch(self, executor, pending, running):
+        """Démarre ce qui peut l'être ; retourne True si l'état a changé"""
+        changed = False
+        for name in list(pending):
+            task, result = self.tasks[name], self.results[name]
+            statuses = [self.results[dep].status for dep in task.deps]
+            if None in statuses:
+                continue
+            if any(status in (FAILED, UPSTREAM_FAILED) for status in statuses):
+                failed = [dep for dep, status in zip(task.deps, statuses) if status in (FAILED, UPSTREAM_FAILED)]
+                pending.remove(name)
+                self._finish(name, UPSTREAM_FAILED, f"dépendance en échec: {', '.join(failed)}")
+                print(f"⏭  {name}: non lancée ({result.error})")
+                changed = True
+                continue
+
+            if result.ready_at is None:
+                result.ready_at = self.clock()
+                result.inputs = fingerprint(task.inputs, self.resolvers)
+                outputs = fingerprint(task.outputs, self.resolvers)
+                if result.inputs is not None and outputs is not None:
+                    result.fingerprint = dict(result.inputs, **outputs)
+                if self.should_skip(task, result):
+                    pending.remove(name)
+                    self._finish(name, SKIPPED)
+                    print(f"⏭  {name}: entrées inchangées, ignorée")
+                    changed = True
+                    continue
+
+            if result.not_before > self.clock():
+                continue
+            demand = self.demand(task)
+            if len(running) >= self.max_parallel or self.usage[task.pool] + demand > self.capacities[task.pool]:
+                continue
+
+            pending.remove(name)
+            self.usage[task.pool] += demand
+            result.attempts += 1
+            if result.started_at is None:
+                result.started_at = self.clock()
+            print(f"▶  {name}: essai {result.attempts} ({task.pool}, {demand} coeur(s))")
+            running[executor.submit(self._attempt, task, result.attempts)] = name
+            changed = True
+        return changed
+
+    def run(self):
+        self.origin = self.clock()
+        os.makedirs(self.log_dir, exist_ok=True)
+        pending = list(self.order)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as executor:
+            while pending or running:
+                while self._dispatch(executor, pending, running):
+                    pass
+                if not running:
+                    if not pending:
+                        break
+                    # Seulement des relances en attente de leur délai
+                    delay = min(self.results[name].not_before for name in pending) - self.clock()
+                    time.sleep(max(0.0, delay))
+                    continue
+
+                # Réveil au plus tard à l'échéance de la prochaine relance
+                now = self.clock()
+                waiting = [self.results[name].not_before - now for name in pending
+                           if self.results[name].not_before > now]
+                timeout = min(waiting) if waiting else None
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._complete(running.pop(future), future.result(), pending)
+        return [self.results[name] for name in self.order]
+
+    def _complete(self, name, outcome, pending):
+        task, result = self.tasks[name], self.results[name]
+        seconds, error = outcome
+        self.usage[task.pool] -= self.demand(task)
+        result.run_seconds += seconds
+        if error is None:
+            self._finish(name, OK)
+            # Entrées relevées au lancement, sorties relevées après le succès
+            outputs = fingerprint(task.outputs, self.resolvers)
+            if result.inputs and outputs is not None:
+                self.state.record(name, dict(result.inputs, **outputs))
+            print(f"✓  {name}: {seconds:.1f} s")
+        elif result.attempts <= task.retries:
+            delay = task.retry_delay * 2 ** (result.attempts - 1)
+            result.not_before = self.clock() + delay
+            pending.append(name)
+            print(f"↻  {name}: {error} ; nouvel essai dans {delay:.0f} s")
+        else:
+            self._finish(name, FAILED, error)
+            print(f"✗  {name}: {error}")
+            tail = _tail(os.path.join(self.log_dir, f"{name}.log"))
+            if tail:
+                print("   " + tail.rstrip().replace("\n", "\n   "))
+
+
+# --- Rapport ---------------------------------------------------------------
+
+def report(results, origin, finished, capacities, path):
+    """Tableau des durées par tâche + rapport JSON ; retourne le document"""
+    rows = [result.as_dict(origin) for result in results]
+    wall = finished - origin
+    busy = sum(row["run_s"] for row in rows)
+    document = {
+        "generated_at": datetime.now().isoformat(),
+        "wall_seconds": round(wall, 3),
+        "task_seconds": round(busy, 3),
+        "capacities": capacities,
+        "tasks": rows,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+
+    def fmt(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    print("")
+    print(f"{'tâche':<18} {'statut':<16} {'essais':>6} {'attente':>8} {'début':>8} {'durée':>8}")
+    for row in rows:
+        print(f"{row['task']:<18} {row['status'] or '-':<16} {row['attempts']:>6} "
+              f"{fmt(row['queued_s']):>8} {fmt(row['start_s']):>8} {fmt(row['run_s']):>8}")
+    print(f"Durée totale {wall:.1f} s pour {busy:.1f} s de tâches "
+          f"(x{busy / wall if wall else 0:.1f} de parallélisme)")
+    print(f"Rapport: {path}")
+    return document
+
+
+# --- Graphes ---------------------------------------------------------------
+
+def analysis_tasks(spark_cores=2, yarn_cores=2, retries=1):
+    """Graphe des analyses réelles (cluster docker-compose démarré)"""
+    pip = [["docker", "exec", "hadoop-master", "pip3", "install", "-q", *PYTHON_PACKAGES]]
+    pip += [["docker", "exec", worker, "pip3", "install", "-q", "pymongo"] for worker in WORKERS]
+    setup = command(
+        ["docker", "cp", "hadoop-scripts/.", "hadoop-master:/tmp/hadoop-scripts/"],
+        *[["docker", "cp", f"pig-scripts/{script}", "hadoop-master:/tmp/"]
+          for script in sorted(os.listdir(os.path.join(ROOT, "pig-scripts"))) if script.endswith(".pig")],
+        *pip,
+    )
+    return [
+        Task("setup", setup, pool="local", retries=retries,
+             inputs=("file:hadoop-scripts", "file:pig-scripts", "container:hadoop-master",
+                     *[f"container:{worker}" for worker in WORKERS]),
+             description="copie des scripts et dépendances Python"),
+        Task("ingestion", command(["bash", "scripts/run-ingestion.sh"]),
+             deps=("setup",), pool="master", retries=retries,
+             inputs=("hdfs:/data/sales_data.csv", "file:hadoop-scripts"),
+             outputs=("hdfs:/data/sales_parquet",),
+             description="CSV -> Parquet partitionné"),
+        Task("prepare_sales",
+             command(["docker", "exec", "hadoop-master", "python3", "/tmp/hadoop-scripts/prepare_sales.py"]),
+             deps=("setup",), pool="master", retries=retries,
+             inputs=("hdfs:/data/sales_data.csv", "file:data/sales_schema.json", "file:hadoop-scripts"),
+             outputs=("hdfs:/data/sales_prepared",),
+             description="CSV brut -> /data/sales_prepared"),
+        Task("pig_analysis", command(["bash", "scripts/run-pig-analysis.sh"]),
+             deps=("setup", "prepare_sales"), pool="yarn", cores=yarn_cores, retries=retries,
+             inputs=("hdfs:/data/sales_prepared", "file:pig-scripts", "file:data/sales_schema.json"),
+             outputs=tuple(f"hdfs:/output/{name}" for name in PIG_OUTPUTS),
+             description="analyses Pig sur YARN"),
+        Task("mongodb_analysis", command(["bash", "scripts/run-mongodb-analysis.sh"], spark_cores=True),
+             deps=("setup",), pool="spark", cores=spark_cores, retries=retries,
+             inputs=("mongo:sales", "mongo:customers", "file:hadoop-scripts"),
+             outputs=("hdfs:/mongodb_analysis", *[f"mongo:results_{name}" for name in SPARK_RESULTS]),
+             description="analyses Spark et publication dans MongoDB"),
+        Task("spark_tests", command(["bash", "scripts/run-spark-tests.sh"], spark_cores=True),
+             deps=("setup", "ingestion"), pool="spark", cores=spark_cores, retries=retries,
+             inputs=("hdfs:/data/sales_parquet", "file:hadoop-scripts"),
+             outputs=("hdfs:/spark_tests/sales_summary",),
+             description="tests Spark"),
+        Task("webapp_cache", warm_webapp(),
+             deps=("pig_analysis", "mongodb_analysis", "spark_tests"), pool="local", retries=retries,
+             inputs=("container:webapp", "hdfs:/output", "mongo:runs", "file:data/arrow"),
+             description="nouvelles versions vues et réponses recalculées par la webapp"),
+    ]
+
+
+# Durées relatives des tâches factices (secondes avant --stub-scale)
+STUB_SECONDS = {
+    "setup": 1.0, "ingestion": 3.0, "prepare_sales": 2.5, "pig_analysis": 6.0,
+    "mongodb_analysis": 5.0, "spark_tests": 7.0, "webapp_cache": 0.5,
+}
+STUB_CAPACITY = {"yarn": 6, "spark": 6}
+
+
+def stub_tasks(scale=0.1, fail=(), retries=1, spark_cores=2, yarn_cores=2):
+    """Même graphe avec des pauses ; les tâches de `fail` échouent à leur premier essai"""
+    tasks = analysis_tasks(spark_cores, yarn_cores, retries)
+    for task in tasks:
+        task.action = stub(STUB_SECONDS[task.name] * scale, fail_attempts=1 if task.name in fail else 0)
+        task.retry_delay = scale
+    return tasks
+
+
+def stub_resolvers():
+    """Fichiers locaux réels ; HDFS, MongoDB et conteneurs réputés inchangés"""
+    constant = lambda target: "stub"
+    return dict(RESOLVERS, hdfs=constant, mongo=constant, container=constant)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyses en graphe de dépendances, en parallèle")
+    parser.add_argument("--targets", nargs="+", help="tâches à atteindre (défaut: toutes)")
+    parser.add_argument("--force", action="store_true", help="ignore les empreintes, relance tout")
+    parser.add_argument("--dry-run", action="store_true", help="affiche le plan sans rien lancer")
+    parser.add_argument("--max-parallel", type=int, default=4)
+    parser.add_argument("--spark-cores", type=int, default=2,
+                        help="coeurs par job Spark sur le cluster (SPARK_CORES_MAX)")
+    parser.add_argument("--yarn-cores", type=int, default=2,
+                        help="vcores réservés par job Pig (AM + tâches)")
+    parser.add_argument("--retries", type=int, default=1)
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    parser.add_argument("--stub", action="store_true", help="tâches factices, sans cluster")
+    parser.add_argument("--stub-scale", type=float, default=0.1)
+    parser.add_argument("--stub-fail", nargs="*", default=[], help="tâches factices en échec au 1er essai")
+    args = parser.parse_args()
+
+    if args.stub:
+        tasks = stub_tasks(args.stub_scale, set(args.stub_fail), args.retries, args.spark_cores, args.yarn_cores)
+        capacities = dict(STUB_CAPACITY, master=MASTER_CAPACITY, local=args.max_parallel)
+        resolvers = stub_resolvers()
+        state_file = "state-stub.json"
+    else:
+        tasks = analysis_tasks(args.spark_cores, args.yarn_cores, args.retries)
+        capacities = discover_capacities(args.max_parallel)
+        resolvers = RESOLVERS
+        state_file = "state.json"
+
+    try:
+        tasks = select(tasks, args.targets)
+    except ValueError as e:
+        parser.error(str(e))
+    state = StateStore(os.path.join(args.state_dir, state_file))
+
+    print("=== Orchestration des analyses ===")
+    print("Capacités: " + ", ".join(f"{pool}={cores}" for pool, cores in sorted(capacities.items())))
+    if args.dry_run:
+        for task in tasks:
+            values = task_fingerprint(task, resolvers)
+            if args.force or not values:
+                decision = "exécutée"
+            elif state.fingerprint(task.name) == values:
+                decision = "ignorée si les sorties des dépendances ne changent pas"
+            else:
+                decision = "exécutée (entrées modifiées)"
+            deps = ", ".join(task.deps) or "-"
+            print(f"{task.name:<18} pool={task.pool:<7} coeurs={task.cores} après: {deps:<40} {decision}")
+        return 0
+
+    scheduler = Scheduler(tasks, capacities, args.max_parallel, state,
+                          os.path.join(args.state_dir, "logs"), resolvers, args.force)
+    results = scheduler.run()
+    # Millisecondes et pid : deux exécutions dans la même seconde ont chacune leur rapport
+    stamp = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3]}-{os.getpid()}"
+    report(results, scheduler.origin, time.monotonic(), capacities,
+           os.path.join(args.state_dir, "reports", f"report-{stamp}{'-stub' if args.stub else ''}.json"))
+    return 1 if any(result.status in (FAILED, UPSTREAM_FAILED) for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
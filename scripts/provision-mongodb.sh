@@ -0,0 +1,27 @@
+#!/bin/bash
+
+echo "=== Provisionnement MongoDB (collections, validation, index) ==="
+
+# Vérification que MongoDB répond
+if ! docker exec mongodb mongosh --eval "db.runCommand('ping').ok" --quiet > /dev/null 2>&1; then
+    echo "Erreur: MongoDB n'est pas démarré"
+    exit 1
+fi
+
+# Le provisionnement s'exécute au premier démarrage (docker-entrypoint-initdb.d) ;
+# ce script le rejoue sur une base existante : seules les migrations manquantes
+# sont appliquées
+docker cp mongodb-init/00-provision.js mongodb:/tmp/00-provision.js
+docker cp scripts/check-mongodb-indexes.js mongodb:/tmp/check-mongodb-indexes.js
+
+docker exec -e SALES_COLLECTION_MODE="${SALES_COLLECTION_MODE:-clustered}" mongodb \
+    mongosh -u admin -p admin123 --quiet /tmp/00-provision.js || exit 1
+
+# Vérification par explain() des requêtes critiques
+echo ""
+echo "=== Plans d'exécution des requêtes critiques ==="
+docker exec mongodb mongosh -u admin -p admin123 --quiet /tmp/check-mongodb-indexes.js
+status=$?
+
+echo "=== Provisionnement terminé ==="
+exit $status
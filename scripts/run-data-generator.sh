@@ -0,0 +1,31 @@
+#!/bin/bash
+
+echo "=== Génération de ventes synthétiques ==="
+
+# Vérification que Spark est démarré
+if ! curl -s http://localhost:8080 > /dev/null; then
+    echo "Erreur: Spark n'est pas démarré"
+    exit 1
+fi
+
+# Copie des scripts (le générateur importe des modules communs)
+echo "Copie des scripts Spark..."
+docker cp hadoop-scripts/. hadoop-master:/tmp/hadoop-scripts/
+
+# Installation des dépendances Python (pymongo pour --mongo)
+echo "Installation des dépendances..."
+docker exec hadoop-master pip3 install pyspark pymongo
+if [[ " $* " == *" --mongo "* ]]; then
+    # Le chargement MongoDB s'exécute sur les workers
+    for worker in hadoop-worker1 hadoop-worker2 hadoop-worker3; do
+        docker exec "$worker" pip3 install pymongo
+    done
+fi
+
+# Exemples :
+#   ./scripts/run-data-generator.sh --rows 10m --csv hdfs://hadoop-master:8020/data/generated/sales_csv
+#   ./scripts/run-data-generator.sh --rows 50m --parquet hdfs://hadoop-master:8020/data/sales_parquet
+#   ./scripts/run-data-generator.sh --rows 1m --mongo --mongo-drop
+docker exec hadoop-master python3 /tmp/hadoop-scripts/generate_sales_data.py "$@"
+
+echo "=== Génération terminée ==="
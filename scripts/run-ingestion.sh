@@ -0,0 +1,29 @@
+#!/bin/bash
+
+echo "=== Ingestion des ventes en Parquet ==="
+
+# Vérification que Spark est démarré
+if ! curl -s http://localhost:8080 > /dev/null; then
+    echo "Erreur: Spark n'est pas démarré"
+    exit 1
+fi
+
+# Copie des scripts et dépendances (SKIP_SETUP=1 : déjà faits par scripts/orchestrator.py)
+if [ "$SKIP_SETUP" != "1" ]; then
+    echo "Copie des scripts Spark..."
+    docker cp hadoop-scripts/. hadoop-master:/tmp/hadoop-scripts/
+
+    echo "Installation des dépendances..."
+    docker exec hadoop-master pip3 install pyspark
+fi
+
+# Conversion CSV -> Parquet partitionné (year/month/region)
+# Ajouter --benchmark pour comparer octets lus et temps CSV vs Parquet
+echo "Conversion CSV -> Parquet..."
+docker exec hadoop-master python3 /tmp/hadoop-scripts/ingest_parquet.py "$@" || exit 1
+
+echo ""
+echo "=== Partitions écrites sur HDFS ==="
+docker exec hadoop-master hdfs dfs -ls -R /data/sales_parquet | grep "^d" | head -20
+
+echo "=== Ingestion terminée ==="
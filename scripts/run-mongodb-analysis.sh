@@ -8,26 +8,38 @@ if ! curl -s http://localhost:8080 > /dev/null; then
     exit 1
 fi
 
-# Copie du script Python
-echo "Copie du script d'analyse MongoDB..."
-docker cp hadoop-scripts/mongodb_reader.py hadoop-master:/tmp/
-
-# Installation des dépendances Python si nécessaire
-echo "Installation des dépendances..."
-docker exec hadoop-master pip3 install pyspark pymongo
+# Copie du script et dépendances (SKIP_SETUP=1 : déjà faits par scripts/orchestrator.py)
+if [ "$SKIP_SETUP" != "1" ]; then
+    echo "Copie du script d'analyse MongoDB..."
+    docker cp hadoop-scripts/. hadoop-master:/tmp/hadoop-scripts/
+
+    echo "Installation des dépendances..."
+    docker exec hadoop-master pip3 install pyspark pymongo pandas pyarrow
+    # Les résultats sont publiés dans MongoDB depuis les workers
+    for worker in hadoop-worker1 hadoop-worker2 hadoop-worker3; do
+        docker exec "$worker" pip3 install pymongo
+    done
+fi
 
 # Exécution de l'analyse
 echo "Exécution de l'analyse MongoDB..."
-docker exec hadoop-master python3 /tmp/mongodb_reader.py
+# SPARK_CORES_MAX (optionnel) : part du cluster accordée par scripts/orchestrator.py
+docker exec ${SPARK_CORES_MAX:+-e SPARK_CORES_MAX=$SPARK_CORES_MAX} hadoop-master \
+    python3 /tmp/hadoop-scripts/mongodb_reader.py "$@" || exit 1
 
-# Affichage des résultats depuis HDFS
+# Affichage des résultats depuis HDFS (Parquet : contenu affiché par le job)
 echo "=== Résultats sauvegardés sur HDFS ==="
 echo ""
 echo "Analyse par catégorie:"
-docker exec hadoop-master hdfs dfs -cat /mongodb_analysis/category_analysis/*.csv
+docker exec hadoop-master hdfs dfs -ls /mongodb_analysis/category_analysis
 
 echo ""
 echo "Analyse régionale:"
-docker exec hadoop-master hdfs dfs -cat /mongodb_analysis/regional_analysis/*.csv
+docker exec hadoop-master hdfs dfs -ls /mongodb_analysis/regional_analysis
+
+echo ""
+echo "Dernière exécution publiée dans MongoDB:"
+docker exec mongodb mongosh -u admin -p admin123 --quiet --eval \
+    'db.getSiblingDB("bigdata").runs.find({status: "published"}).sort({finished_at: -1}).limit(1).forEach(printjson)'
 
 echo "=== Analyse MongoDB terminée ==="
\ No newline at end of file
@@ -2,33 +2,101 @@
 
 echo "=== Exécution des analyses Pig ==="
 
+# Mode local : mêmes analyses et mêmes fichiers de sortie, sans Hadoop
+# (pandas requis sur l'hôte). Usage : ./scripts/run-pig-analysis.sh --local [CSV...]
+if [ "$1" == "--local" ]; then
+    shift
+    inputs=("$@")
+    if [ ${#inputs[@]} -eq 0 ]; then
+        inputs=(data/sales_data.csv)
+    fi
+    python3 hadoop-scripts/local_engine.py "${inputs[@]}" --output-root pig_local || exit 1
+    echo ""
+    echo "Analyse par catégorie:"
+    cat pig_local/output/category_analysis/part-r-00000
+    echo ""
+    echo "Top produits:"
+    cat pig_local/output/top_products/part-r-00000
+    echo "=== Analyse Pig (locale) terminée ==="
+    exit 0
+fi
+
+# Options : --prepare (reconstruit les ventes préparées), --compare (exécute
+# aussi les deux scripts séparés d'origine et compare jobs et durée)
+PREPARE=0
+COMPARE=0
+for arg in "$@"; do
+    case "$arg" in
+        --prepare) PREPARE=1 ;;
+        --compare) COMPARE=1 ;;
+    esac
+done
+
 # Vérification que le cluster est démarré
 if ! curl -s http://localhost:9870/jmx > /dev/null; then
     echo "Erreur: Le cluster Hadoop n'est pas démarré"
     exit 1
 fi
 
-# Copie des scripts Pig
-echo "Copie des scripts Pig..."
-docker cp pig-scripts/load_and_explore.pig hadoop-master:/tmp/
-docker cp pig-scripts/advanced_analysis.pig hadoop-master:/tmp/
+# Copie des scripts Pig et du module de schéma (SKIP_SETUP=1 : déjà faite par scripts/orchestrator.py)
+if [ "$SKIP_SETUP" != "1" ]; then
+    echo "Copie des scripts Pig..."
+    docker cp pig-scripts/sales_analysis.pig hadoop-master:/tmp/
+    docker cp pig-scripts/load_and_explore.pig hadoop-master:/tmp/
+    docker cp pig-scripts/advanced_analysis.pig hadoop-master:/tmp/
+    docker cp hadoop-scripts/. hadoop-master:/tmp/hadoop-scripts/
+fi
+
+# Ventes préparées (sans en-tête, bzip2) : construites au premier passage,
+# ou reconstruites avec --prepare après modification du CSV brut
+if [ "$PREPARE" == "1" ] || ! docker exec hadoop-master hdfs dfs -test -d /data/sales_prepared; then
+    echo "Préparation des ventes (CSV brut -> /data/sales_prepared)..."
+    docker exec hadoop-master pip3 install pyspark
+    docker exec hadoop-master python3 /tmp/hadoop-scripts/prepare_sales.py || exit 1
+fi
+
+# Clause AS du LOAD générée depuis data/sales_schema.json
+docker exec hadoop-master sh -c "python3 /tmp/hadoop-scripts/sales_schema.py pig-params > /tmp/sales.params"
+
+clean_outputs() {
+    echo "Nettoyage des répertoires de sortie..."
+    docker exec hadoop-master hdfs dfs -rm -r -f /output/category_analysis /output/top_products \
+        /output/regional_analysis /output/high_value_sales /output/monthly_analysis \
+        /output/valuable_customers > /dev/null
+}
+
+# Exécute des scripts Pig ; jobs MapReduce comptés dans les "Job Stats" du log
+# Usage : run_pig <libellé> <script.pig>...
+run_pig() {
+    local label=$1
+    shift
+    local log="/tmp/pig_${label}.log"
+    : > "$log"
+    local start=$(date +%s)
+    for script in "$@"; do
+        # PIPESTATUS : code de sortie de pig, pas celui de tee
+        docker exec hadoop-master pig -param_file /tmp/sales.params -f "/tmp/$script" 2>&1 | tee -a "$log"
+        [ "${PIPESTATUS[0]}" -eq 0 ] || PIG_STATUS=1
+    done
+    local elapsed=$(( $(date +%s) - start ))
+    local jobs=$(grep -c "^job_" "$log")
+    echo "$label: $jobs job(s) MapReduce, ${elapsed}s" >> /tmp/pig_report.txt
+}
 
-# Nettoyage des répertoires de sortie
-echo "Nettoyage des répertoires de sortie..."
-docker exec hadoop-master hdfs dfs -rm -r -f /output/category_analysis
-docker exec hadoop-master hdfs dfs -rm -r -f /output/top_products
-docker exec hadoop-master hdfs dfs -rm -r -f /output/regional_analysis
-docker exec hadoop-master hdfs dfs -rm -r -f /output/high_value_sales
-docker exec hadoop-master hdfs dfs -rm -r -f /output/monthly_analysis
-docker exec hadoop-master hdfs dfs -rm -r -f /output/valuable_customers
+: > /tmp/pig_report.txt
+PIG_STATUS=0
 
-# Exécution du premier script Pig
-echo "Exécution de l'analyse exploratoire..."
-docker exec hadoop-master pig -f /tmp/load_and_explore.pig
+if [ "$COMPARE" == "1" ]; then
+    # Avant : deux scripts, deux LOAD, DUMP et ORDER global
+    clean_outputs
+    echo "Exécution des scripts séparés (avant)..."
+    run_pig "scripts_separes" load_and_explore.pig advanced_analysis.pig
+fi
 
-# Exécution du second script Pig
-echo "Exécution de l'analyse avancée..."
-docker exec hadoop-master pig -f /tmp/advanced_analysis.pig
+# Analyse consolidée : un LOAD, un job pour tous les GROUP, un pour le top 5
+clean_outputs
+echo "Exécution de l'analyse consolidée..."
+run_pig "script_consolide" sales_analysis.pig
 
 # Affichage des résultats
 echo "=== Résultats de l'analyse ==="
@@ -46,6 +114,11 @@ docker exec hadoop-master hdfs dfs -cat /output/regional_analysis/part-r-00000
 
 echo ""
 echo "Ventes importantes:"
-docker exec hadoop-master hdfs dfs -cat /output/high_value_sales/part-r-00000
+docker exec hadoop-master hdfs dfs -cat "/output/high_value_sales/part-*"
+
+echo ""
+echo "=== Jobs et durée ==="
+cat /tmp/pig_report.txt
 
-echo "=== Analyse Pig terminée ==="
\ No newline at end of file
+echo "=== Analyse Pig terminée ==="
+exit $PIG_STATUS
@@ -10,17 +10,26 @@ if ! curl -s http://localhost:8080 > /dev/null; then
     exit 1
 fi
 
-# Copie du script de test
-echo "Copie du script de tests Spark..."
-docker cp hadoop-scripts/spark_tests.py hadoop-master:/tmp/
+# Les tests lisent le jeu Parquet : ingestion préalable si absent
+if ! docker exec hadoop-master hdfs dfs -test -d /data/sales_parquet; then
+    echo "Jeu Parquet absent, ingestion préalable..."
+    ./scripts/run-ingestion.sh || exit 1
+fi
+
+# Copie des scripts de test et dépendances (SKIP_SETUP=1 : déjà faits par scripts/orchestrator.py)
+if [ "$SKIP_SETUP" != "1" ]; then
+    echo "Copie du script de tests Spark..."
+    docker cp hadoop-scripts/. hadoop-master:/tmp/hadoop-scripts/
 
-# Installation des dépendances Python
-echo "Installation des dépendances..."
-docker exec hadoop-master pip3 install pyspark
+    echo "Installation des dépendances..."
+    docker exec hadoop-master pip3 install pyspark pandas pyarrow
+fi
 
 # Exécution des tests
 echo "Lancement des tests Spark..."
-docker exec hadoop-master python3 /tmp/spark_tests.py
+# SPARK_CORES_MAX (optionnel) : part du cluster accordée par scripts/orchestrator.py
+docker exec ${SPARK_CORES_MAX:+-e SPARK_CORES_MAX=$SPARK_CORES_MAX} hadoop-master \
+    python3 /tmp/hadoop-scripts/spark_tests.py || exit 1
 
 # Vérification des résultats sur HDFS
 echo ""
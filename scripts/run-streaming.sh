@@ -0,0 +1,25 @@
+#!/bin/bash
+
+echo "=== Streaming des ventes (Structured Streaming) ==="
+
+# Vérification que Spark est démarré
+if ! curl -s http://localhost:8080 > /dev/null; then
+    echo "Erreur: Spark n'est pas démarré"
+    exit 1
+fi
+
+# Copie des scripts (le job importe des modules communs)
+echo "Copie des scripts Spark..."
+docker cp hadoop-scripts/. hadoop-master:/tmp/hadoop-scripts/
+
+# Installation des dépendances Python (pymongo pour bigdata.results et --source mongo)
+echo "Installation des dépendances..."
+docker exec hadoop-master pip3 install pyspark pymongo
+
+# Exemples :
+#   ./scripts/run-streaming.sh --source file --duration 600
+#   ./scripts/run-streaming.sh --source mongo --duration 600
+#   ./scripts/run-streaming.sh --generate-events 100000 --available-now
+docker exec hadoop-master python3 /tmp/hadoop-scripts/streaming_sales.py "$@"
+
+echo "=== Streaming terminé ==="
@@ -1,33 +1,140 @@
 # webapp/app.py - Version simplifiée et robuste
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, g, render_template, jsonify, request, stream_with_context
+import importlib.util
+import json
 import os
 import time
 from datetime import datetime
 import threading
 
-# Import conditionnel pour éviter les erreurs
-try:
-    import dash
-    from dash import dcc, html, Input, Output
-    import plotly.express as px
-    import plotly.graph_objects as go
-    import pandas as pd
-    DASH_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: Dash/Plotly not available: {e}")
-    DASH_AVAILABLE = False
-
-try:
-    import pymongo
-    MONGODB_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: MongoDB not available: {e}")
-    MONGODB_AVAILABLE = False
+import arrow_store
+import connections
+import metrics
+from cache import VersionedCache, VersionProbe
+from health_prober import HealthProber
+from stats_engine import SalesStatsEngine
+from stream import Broadcaster
+
+# Dash/Plotly/pandas ne sont chargés qu'au premier accès à /dashboard/ :
+# on vérifie seulement leur présence pour garder un démarrage rapide
+DASH_AVAILABLE = all(
+    importlib.util.find_spec(module) is not None
+    for module in ("dash", "plotly", "pandas")
+)
+if not DASH_AVAILABLE:
+    print("Warning: Dash/Plotly not available")
+
+MONGODB_AVAILABLE = connections.MONGODB_AVAILABLE
+if not MONGODB_AVAILABLE:
+    print("Warning: MongoDB not available: pymongo is not installed")
 
 # Configuration Flask
 flask_app = Flask(__name__)
 
-# Données simulées pour éviter les dépendances
+STATS_WINDOW_SECONDS = int(os.environ.get("STATS_WINDOW_SECONDS", "3600"))
+STATS_DISTINCT_MODE = os.environ.get("STATS_DISTINCT_MODE", "exact")  # exact | hll
+
+PROBE_INTERVAL_SECONDS = float(os.environ.get("PROBE_INTERVAL_SECONDS", "10"))
+PROBE_MAX_INTERVAL_SECONDS = float(os.environ.get("PROBE_MAX_INTERVAL_SECONDS", "120"))
+STREAM_INTERVAL_SECONDS = float(os.environ.get("STREAM_INTERVAL_SECONDS", "2"))
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", "16"))
+
+# Cache des résultats d'analyse, invalidé à chaque nouvelle version des données
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR")  # ex. /dev/shm/webapp-cache (partagé)
+# Budget du niveau disque : /dev/shm fait 64 Mo par défaut dans Docker
+RESULT_CACHE_DISK_MB = int(os.environ.get("RESULT_CACHE_DISK_MB", "32"))
+VERSION_CHECK_SECONDS = float(os.environ.get("VERSION_CHECK_SECONDS", "5"))
+RESULTS_LIMIT = int(os.environ.get("RESULTS_LIMIT", "1000"))
+
+# Sorties Pig (sales_analysis.pig) : colonnes des fichiers PigStorage(',')
+PIG_OUTPUTS = {
+    "category_analysis": ["category", "total_orders", "total_quantity", "avg_price"],
+    "top_products": ["product", "total_sold"],
+    "regional_analysis": ["region", "orders_count", "total_revenue"],
+    "monthly_analysis": ["month", "total_transactions", "monthly_revenue", "avg_transaction_value"],
+    "valuable_customers": ["customer_id", "purchase_frequency", "customer_lifetime_value"],
+}
+
+# Métriques Prometheus (/metrics) ; répertoire partagé pour agréger les workers
+METRICS_DIR = os.environ.get("METRICS_DIR")  # ex. /dev/shm/webapp-metrics
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "5"))
+
+# Tables Arrow exportées par les jobs Spark (./data/arrow monté sur /app/data/arrow)
+ARROW_DIR = os.environ.get("ARROW_DIR", "/app/data/arrow")
+ARROW_AVAILABLE = arrow_store.PYARROW_AVAILABLE
+if not ARROW_AVAILABLE:
+    print("Warning: pyarrow not available: /api/arrow disabled")
+
+# Schéma des ventes partagé avec Pig et Spark (./data monté sur /app/data)
+SALES_SCHEMA_PATH = os.environ.get("SALES_SCHEMA_PATH", "/app/data/sales_schema.json")
+
+# Moteur de statistiques, créé au premier appel (après le fork des workers)
+_stats_engine = None
+_stats_engine_lock = threading.Lock()
+
+def _build_probes():
+    probes = connections.cluster_probes()
+    if not MONGODB_AVAILABLE:
+        probes["mongodb"] = lambda: "NOT_CONFIGURED"
+    return probes
+
+# Sondes de santé en arrière-plan : les endpoints servent le dernier instantané
+health_prober = HealthProber(
+    _build_probes(),
+    interval=PROBE_INTERVAL_SECONDS,
+    max_interval=PROBE_MAX_INTERVAL_SECONDS,
+)
+
+@flask_app.before_request
+def start_background_tasks():
+    """Démarre les tâches de fond du worker (idempotent, après le fork)"""
+    health_prober.start()
+
+request_metrics = metrics.RequestMetrics(disk_dir=METRICS_DIR, flush_interval=METRICS_FLUSH_SECONDS)
+
+@flask_app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+@flask_app.after_request
+def _record_latency(response):
+    """Latence par route (gabarit de la route : /api/results/<name>, pas l'URL)"""
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        request_metrics.observe(route, request.method, response.status_code,
+                                time.perf_counter() - started)
+    return response
+
+def _latest_run(job):
+    """(run_id, analyses publiées) de la dernière exécution publiée (mongo_sink.latest_run)"""
+    client = connections.get_mongo_client()
+    if client is None:
+        return None
+    run = client.bigdata.runs.find_one({"job": job, "status": "published"},
+                                       sort=[("finished_at", -1)],
+                                       projection={"_id": 1, "analyses": 1})
+    return (run["_id"], frozenset(run.get("analyses") or {})) if run else None
+
+def _hdfs_modification_time(path):
+    """Date de modification d'une sortie HDFS (WebHDFS GETFILESTATUS)"""
+    session = connections.get_http_session()
+    if session is None:
+        return None
+    response = session.get(f"{connections.WEBHDFS_URL}{path}", params={"op": "GETFILESTATUS"},
+                           timeout=connections.PROBE_DEADLINE_SECONDS)
+    if response.status_code != 200:
+        return None
+    return response.json()["FileStatus"]["modificationTime"]
+
+result_cache = VersionedCache(maxsize=RESULT_CACHE_SIZE, disk_dir=RESULT_CACHE_DIR,
+                              disk_max_bytes=RESULT_CACHE_DISK_MB * 1024 * 1024)
+latest_run = VersionProbe(_latest_run, interval=VERSION_CHECK_SECONDS)
+hdfs_version = VersionProbe(_hdfs_modification_time, interval=VERSION_CHECK_SECONDS)
+arrow_tables = arrow_store.ArrowTableStore(ARROW_DIR)
+
+# Données simulées, servies uniquement si pymongo est absent
 SAMPLE_DATA = {
     "total_sales": 150,
     "total_revenue": 45230.50,
@@ -99,77 +206,182 @@ def home():
         </div>
         
         <script>
+            // État courant reçu du serveur : {{stats: {{...}}, status: {{...}}}}
+            let state = {{stats: null, status: null}};
+            let pollTimer = null;
+
+            function merge(target, delta) {{
+                for (const key in delta) {{
+                    if (delta[key] !== null && typeof delta[key] === 'object' && !Array.isArray(delta[key])
+                            && target[key] && typeof target[key] === 'object') {{
+                        merge(target[key], delta[key]);
+                    }} else {{
+                        target[key] = delta[key];
+                    }}
+                }}
+                return target;
+            }}
+
+            function renderMetrics(data) {{
+                document.getElementById('metrics').innerHTML = `
+                    <div class="col-md-3">
+                        <div class="metric-card text-center">
+                            <h3>${{data.total_sales}}</h3>
+                            <p>Total Ventes</p>
+                        </div>
+                    </div>
+                    <div class="col-md-3">
+                        <div class="metric-card text-center">
+                            <h3>${'${data.total_revenue.toFixed(2)}'}</h3>
+                            <p>Chiffre d'Affaires</p>
+                        </div>
+                    </div>
+                    <div class="col-md-3">
+                        <div class="metric-card text-center">
+                            <h3>${{data.realtime_sales}}</h3>
+                            <p>Ventes Temps Réel</p>
+                        </div>
+                    </div>
+                    <div class="col-md-3">
+                        <div class="metric-card text-center">
+                            <h3>${{data.unique_customers}}</h3>
+                            <p>Clients Uniques</p>
+                        </div>
+                    </div>
+                `;
+            }}
+
+            function renderStatus(data) {{
+                document.getElementById('services-status').innerHTML = `
+                    <p><strong>Hadoop NameNode:</strong> <span class="${{data.namenode === 'UP' ? 'status-up' : 'status-down'}}">${{data.namenode}}</span></p>
+                    <p><strong>YARN ResourceManager:</strong> <span class="${{data.resourcemanager === 'UP' ? 'status-up' : 'status-down'}}">${{data.resourcemanager}}</span></p>
+                    <p><strong>Spark Master:</strong> <span class="${{data.sparkmaster === 'UP' ? 'status-up' : 'status-down'}}">${{data.sparkmaster}}</span></p>
+                    <p><strong>MongoDB:</strong> <span class="${{data.mongodb === 'UP' ? 'status-up' : 'status-down'}}">${{data.mongodb || 'DOWN'}}</span></p>
+                    <small class="text-muted">Dernière mise à jour: ${{new Date().toLocaleTimeString()}}</small>
+                `;
+            }}
+
+            function render() {{
+                if (state.stats) renderMetrics(state.stats);
+                if (state.status) renderStatus(state.status);
+            }}
+
+            // Repli : interrogation périodique si le flux SSE est indisponible
             function updateDashboard() {{
-                // Mise à jour des métriques
                 fetch('/api/stats')
                     .then(response => response.json())
-                    .then(data => {{
-                        document.getElementById('metrics').innerHTML = `
-                            <div class="col-md-3">
-                                <div class="metric-card text-center">
-                                    <h3>${{data.total_sales}}</h3>
-                                    <p>Total Ventes</p>
-                                </div>
-                            </div>
-                            <div class="col-md-3">
-                                <div class="metric-card text-center">
-                                    <h3>${'${data.total_revenue.toFixed(2)}'}</h3>
-                                    <p>Chiffre d'Affaires</p>
-                                </div>
-                            </div>
-                            <div class="col-md-3">
-                                <div class="metric-card text-center">
-                                    <h3>${{data.realtime_sales}}</h3>
-                                    <p>Ventes Temps Réel</p>
-                                </div>
-                            </div>
-                            <div class="col-md-3">
-                                <div class="metric-card text-center">
-                                    <h3>${{data.unique_customers}}</h3>
-                                    <p>Clients Uniques</p>
-                                </div>
-                            </div>
-                        `;
-                    }})
+                    .then(data => renderMetrics(data))
                     .catch(error => {{
                         document.getElementById('metrics').innerHTML = 
                             '<div class="col-12"><div class="alert alert-warning">Impossible de charger les métriques</div></div>';
                     }});
                 
-                // Vérification des services
                 fetch('/api/hadoop_status')
                     .then(response => response.json())
-                    .then(data => {{
-                        document.getElementById('services-status').innerHTML = `
-                            <p><strong>Hadoop NameNode:</strong> <span class="${{data.namenode === 'UP' ? 'status-up' : 'status-down'}}">${{data.namenode}}</span></p>
-                            <p><strong>YARN ResourceManager:</strong> <span class="${{data.resourcemanager === 'UP' ? 'status-up' : 'status-down'}}">${{data.resourcemanager}}</span></p>
-                            <p><strong>MongoDB:</strong> <span class="${{data.mongodb === 'UP' ? 'status-up' : 'status-down'}}">${{data.mongodb || 'DOWN'}}</span></p>
-                            <small class="text-muted">Dernière mise à jour: ${{new Date().toLocaleTimeString()}}</small>
-                        `;
-                    }})
+                    .then(data => renderStatus(data))
                     .catch(error => {{
                         document.getElementById('services-status').innerHTML = 
                             '<p class="text-danger">Erreur de connexion aux services</p>';
                     }});
             }}
-            
-            // Mise à jour initiale et périodique
-            updateDashboard();
-            setInterval(updateDashboard, 10000);
+
+            function startPolling() {{
+                if (pollTimer) return;
+                updateDashboard();
+                pollTimer = setInterval(updateDashboard, 10000);
+            }}
+
+            function startStream() {{
+                if (!window.EventSource) {{
+                    startPolling();
+                    return;
+                }}
+                const source = new EventSource('/api/stream');
+                let failures = 0;
+                source.addEventListener('snapshot', event => {{
+                    failures = 0;
+                    state = JSON.parse(event.data);
+                    render();
+                }});
+                source.addEventListener('delta', event => {{
+                    failures = 0;
+                    merge(state, JSON.parse(event.data));
+                    render();
+                }});
+                source.onerror = () => {{
+                    // EventSource se reconnecte seul ; après 3 échecs on passe au polling
+                    failures += 1;
+                    if (failures >= 3) {{
+                        source.close();
+                        startPolling();
+                    }}
+                }};
+            }}
+
+            startStream();
         </script>
     </body>
     </html>
     """
 
+def get_stats_engine():
+    """Retourne le moteur de statistiques partagé, démarré à la demande"""
+    global _stats_engine
+    if not MONGODB_AVAILABLE:
+        return None
+    with _stats_engine_lock:
+        if _stats_engine is None:
+            client = connections.get_mongo_client()
+            _stats_engine = SalesStatsEngine(
+                client.bigdata.sales,
+                window_seconds=STATS_WINDOW_SECONDS,
+                distinct=STATS_DISTINCT_MODE,
+            )
+            _stats_engine.start()
+    return _stats_engine
+
+def current_stats():
+    """Statistiques courantes (moteur MongoDB ou données simulées)"""
+    engine = get_stats_engine()
+    if engine is None:
+        data = SAMPLE_DATA.copy()
+        data["source"] = "sample"
+    else:
+        data = engine.snapshot()
+        data["source"] = "mongodb"
+    return data
+
+def current_status():
+    """Statut des services d'après le dernier instantané des sondes"""
+    snapshot = health_prober.snapshot()
+    status = {name: dep["status"] for name, dep in snapshot["dependencies"].items()}
+    status["latency_ms"] = {
+        name: dep["latency_ms"] for name, dep in snapshot["dependencies"].items()
+    }
+    status["snapshot_age_seconds"] = snapshot["snapshot_age_seconds"]
+    return status
+
+def _stream_state():
+    """État diffusé sur /api/stream, sans les champs qui changent à chaque tick"""
+    stats = current_stats()
+    stats.pop("last_update_age", None)
+    status = current_status()
+    status.pop("latency_ms", None)
+    status.pop("snapshot_age_seconds", None)
+    return {"stats": stats, "status": status}
+
+# Un seul calcul par worker, diffusé à tous les navigateurs abonnés
+broadcaster = Broadcaster(
+    _stream_state,
+    interval=STREAM_INTERVAL_SECONDS,
+    queue_size=STREAM_QUEUE_SIZE,
+)
+
 @flask_app.route('/api/stats')
 def get_stats():
     """API pour récupérer les statistiques"""
     try:
-        # Simuler des données avec variation
-        import random
-        data = SAMPLE_DATA.copy()
-        data["total_sales"] += random.randint(-5, 10)
-        data["realtime_sales"] = random.randint(15, 35)
+        data = current_stats()
         data["timestamp"] = datetime.now().isoformat()
         return jsonify(data)
     except Exception as e:
@@ -177,67 +389,248 @@ def get_stats():
 
 @flask_app.route('/api/hadoop_status')
 def hadoop_status():
-    """Vérification du statut Hadoop"""
-    import requests
-    status = {"timestamp": datetime.now().isoformat()}
-    
-    # Test NameNode
+    """Vérification du statut Hadoop (dernier instantané des sondes)"""
+    status = current_status()
+    status["timestamp"] = datetime.now().isoformat()
+    return jsonify(status)
+
+@flask_app.route('/api/stream')
+def stream():
+    """Flux Server-Sent Events : état complet puis deltas"""
+    broadcaster.start()
+    return Response(
+        stream_with_context(broadcaster.events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _parse_pig_value(text):
+    if text == "":
+        return None
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+def _load_analysis(name, run_id):
+    """Documents publiés d'une analyse Spark (collection results_<name>)"""
+    client = connections.get_mongo_client()
+    # Filtre sur run_id : une réponse en cache ne mélange jamais deux exécutions
+    cursor = client.bigdata[f"results_{name}"].find({"run_id": run_id}, {"_id": 0, "run_id": 0}) \
+        .limit(RESULTS_LIMIT)
+    return {"analysis": name, "run_id": run_id, "rows": list(cursor)}
+
+def _load_pig_output(name, version):
+    """Lignes d'une sortie Pig lues sur HDFS (WebHDFS OPEN de chaque part-*)"""
+    session = connections.get_http_session()
+    directory = f"/output/{name}"
+    listing = session.get(f"{connections.WEBHDFS_URL}{directory}", params={"op": "LISTSTATUS"},
+                          timeout=connections.PROBE_DEADLINE_SECONDS)
+    listing.raise_for_status()
+    columns = PIG_OUTPUTS[name]
+    rows = []
+    for status in sorted(listing.json()["FileStatuses"]["FileStatus"], key=lambda f: f["pathSuffix"]):
+        if not status["pathSuffix"].startswith("part-"):
+            continue
+        content = session.get(f"{connections.WEBHDFS_URL}{directory}/{status['pathSuffix']}",
+                              params={"op": "OPEN"}, timeout=connections.PROBE_DEADLINE_SECONDS)
+        content.raise_for_status()
+        for line in content.text.splitlines():
+            rows.append(dict(zip(columns, (_parse_pig_value(v) for v in line.split(",")))))
+    return {"analysis": name, "hdfs_modification_time": version, "rows": rows[:RESULTS_LIMIT]}
+
+@flask_app.route('/api/results/<name>')
+def analysis_results(name):
+    """Résultats publiés d'une analyse Spark, en cache jusqu'à la prochaine exécution"""
+    if not MONGODB_AVAILABLE:
+        return jsonify({"error": "MongoDB non configuré"}), 503
+    run = latest_run("mongodb_reader")
+    if run is None:
+        return jsonify({"error": "aucune exécution publiée"}), 404
+    run_id, analyses = run
+    # Seules les analyses publiées atteignent MongoDB et le cache
+    if name not in analyses:
+        return jsonify({"error": f"analyse inconnue: {name}"}), 404
     try:
-        response = requests.get("http://hadoop-master:9870/jmx", timeout=3)
-        status["namenode"] = "UP" if response.status_code == 200 else "DOWN"
-    except:
-        status["namenode"] = "DOWN"
-    
-    # Test ResourceManager
+        return jsonify(result_cache.get_or_compute(
+            "results", run_id, name, lambda: _load_analysis(name, run_id)))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@flask_app.route('/api/pig/<name>')
+def pig_results(name):
+    """Sortie d'une analyse Pig sur HDFS, en cache jusqu'à sa réécriture"""
+    if name not in PIG_OUTPUTS:
+        return jsonify({"error": f"sortie inconnue: {name}"}), 404
+    version = hdfs_version(f"/output/{name}")
+    if version is None:
+        return jsonify({"error": f"/output/{name} indisponible"}), 404
     try:
-        response = requests.get("http://hadoop-master:8088/ws/v1/cluster/info", timeout=3)
-        status["resourcemanager"] = "UP" if response.status_code == 200 else "DOWN"
-    except:
-        status["resourcemanager"] = "DOWN"
-    
-    # Test MongoDB
-    if MONGODB_AVAILABLE:
+        return jsonify(result_cache.get_or_compute(
+            f"pig:{name}", version, name, lambda: _load_pig_output(name, version)))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@flask_app.route('/api/arrow')
+def arrow_catalog():
+    """Tables Arrow disponibles : lignes, colonnes, version et métadonnées d'export"""
+    if not ARROW_AVAILABLE:
+        return jsonify({"error": "pyarrow non installé"}), 503
+    tables = []
+    for name in arrow_tables.names():
         try:
-            client = pymongo.MongoClient("mongodb://mongodb:27017/", serverSelectionTimeoutMS=3000)
-            client.admin.command('ping')
-            status["mongodb"] = "UP"
-            client.close()
-        except:
-            status["mongodb"] = "DOWN"
-    else:
-        status["mongodb"] = "NOT_CONFIGURED"
-    
-    return jsonify(status)
+            tables.append(arrow_tables.describe(name))
+        except (KeyError, OSError):
+            continue  # fichier remplacé ou supprimé entre-temps
+    return jsonify({"directory": ARROW_DIR, "tables": tables})
+
+@flask_app.route('/api/arrow/<name>')
+def arrow_table(name):
+    """Tranche d'une table Arrow mappée en mémoire, en JSON ou en flux Arrow IPC
+
+    Paramètres : offset, limit (RESULTS_LIMIT par défaut), columns=a,b et
+    format=arrow (ou en-tête Accept: application/vnd.apache.arrow.stream).
+    """
+    if not ARROW_AVAILABLE:
+        return jsonify({"error": "pyarrow non installé"}), 503
+    try:
+        offset = max(0, int(request.args.get("offset", 0)))
+        limit = max(0, min(int(request.args.get("limit", RESULTS_LIMIT)), RESULTS_LIMIT))
+    except ValueError:
+        return jsonify({"error": "offset et limit doivent être des entiers"}), 400
+    columns = tuple(c for c in request.args.get("columns", "").split(",") if c)
+    as_arrow = request.args.get("format") == "arrow" or \
+        arrow_store.ARROW_STREAM_MIMETYPE in request.headers.get("Accept", "")
+
+    try:
+        version = arrow_tables.version(name)
+        if as_arrow:
+            body = arrow_store.to_ipc_stream(arrow_tables.slice(name, offset, limit, columns))
+            response = Response(body, mimetype=arrow_store.ARROW_STREAM_MIMETYPE)
+            response.headers["ETag"] = version
+            return response
+
+        def load():
+            table = arrow_tables.slice(name, offset, limit, columns)
+            return {"table": name, "version": version, "offset": offset,
+                    "total_rows": arrow_tables.table(name).num_rows, "rows": arrow_store.to_rows(table)}
+
+        return jsonify(result_cache.get_or_compute(
+            f"arrow:{name}", version, (offset, limit, columns), load))
+    except KeyError:
+        return jsonify({"error": f"table Arrow inconnue: {name}"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@flask_app.route('/api/cache_stats')
+def cache_stats():
+    """Compteurs du cache de résultats du worker (hits, misses, évictions...)"""
+    return jsonify(result_cache.stats())
+
+@flask_app.route('/api/schema')
+def sales_schema():
+    """Schéma déclaré des ventes (data/sales_schema.json)"""
+    try:
+        with open(SALES_SCHEMA_PATH, encoding="utf-8") as f:
+            return jsonify(json.load(f))
+    except OSError as e:
+        return jsonify({"error": str(e)}), 404
+
+@flask_app.route('/api/pool_stats')
+def pool_stats():
+    """Statistiques des pools de connexions du worker"""
+    return jsonify(connections.pool_stats())
+
+@flask_app.route('/metrics')
+def prometheus_metrics():
+    """Métriques au format Prometheus : latences des routes, sondes, pools"""
+    body = metrics.render(
+        request_metrics.render(),
+        metrics.probe_lines(health_prober.snapshot()),
+        metrics.pool_lines(connections.pool_stats()),
+    )
+    return Response(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+class LazyDashboard:
+    """Application WSGI du dashboard, construite au premier appel
+
+    L'import de Dash, Plotly et pandas coûte du temps et de la mémoire à
+    chaque worker : on ne le paie que si /dashboard/ est réellement visité.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        from dashboard import create_dashboard
+        dash_app = create_dashboard(
+            Flask("dashboard"),
+            requests_pathname_prefix="/dashboard/",
+            routes_pathname_prefix="/",
+        )
+        return dash_app.server
+
+    def __call__(self, environ, start_response):
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    self._app = self._build()
+        return self._app(environ, start_response)
+
+# Dashboard Dash monté sur /dashboard/, alimenté par les cubes des jobs Spark
+if DASH_AVAILABLE:
+    from werkzeug.middleware.dispatcher import DispatcherMiddleware
+    flask_app.wsgi_app = DispatcherMiddleware(flask_app.wsgi_app, {"/dashboard": LazyDashboard()})
 
 @flask_app.route('/dashboard')
 def dashboard():
-    """Page dashboard simplifiée"""
-    if not DASH_AVAILABLE:
-        return """
-        <h1>Dashboard Non Disponible</h1>
-        <p>Les dépendances Dash/Plotly ne sont pas correctement installées.</p>
-        <p><a href="/">Retour à l'accueil</a></p>
-        """
-    
+    """Dashboard indisponible (servi par LazyDashboard sinon)"""
     return """
-    <h1>Dashboard Interactif</h1>
-    <p>Fonctionnalité en cours de développement...</p>
+    <h1>Dashboard Non Disponible</h1>
+    <p>Les dépendances Dash/Plotly ne sont pas correctement installées.</p>
     <p><a href="/">Retour à l'accueil</a></p>
     """
 
 @flask_app.route('/health')
 def health():
     """Endpoint de santé pour Docker"""
-    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
+    snapshot = health_prober.snapshot()
+    degraded = sorted(
+        name for name, dep in snapshot["dependencies"].items()
+        if dep["status"] not in ("UP", "NOT_CONFIGURED", "UNKNOWN")
+    )
+    age = snapshot["snapshot_age_seconds"]
+    if not health_prober.is_alive() or (age is not None and age > 3 * PROBE_MAX_INTERVAL_SECONDS):
+        # Le thread de sondes est mort : le worker lui-même est à redémarrer
+        return jsonify({
+            "status": "unhealthy",
+            "reason": "health prober stalled",
+            "timestamp": datetime.now().isoformat(),
+        }), 503
+
+    return jsonify({
+        "status": "degraded" if degraded else "healthy",
+        "degraded_dependencies": degraded,
+        "dependencies": snapshot["dependencies"],
+        "snapshot_age_seconds": age,
+        "timestamp": datetime.now().isoformat(),
+    })
 
 if __name__ == '__main__':
     print("🚀 Démarrage de l'application Big Data UCAO")
     print(f"📊 Dash disponible: {DASH_AVAILABLE}")
     print(f"🍃 MongoDB disponible: {MONGODB_AVAILABLE}")
     
+    # Serveur de développement uniquement ; en production: gunicorn -c gunicorn.conf.py app:flask_app
     flask_app.run(
         host='0.0.0.0',
         port=5000,
-        debug=True,
+        debug=os.environ.get("FLASK_DEBUG") == "1",
+        threaded=True,
         use_reloader=False  # Éviter les problèmes avec Docker
     )
\ No newline at end of file
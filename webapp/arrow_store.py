@@ -0,0 +1,113 @@
+# webapp/arrow_store.py - Tables Arrow des jobs Spark, ouvertes par memory-map
+"""
+Les jobs Spark exportent leurs tables d'agrégats en fichiers Arrow IPC non
+compressés (hadoop-scripts/arrow_export.py). Ici, chaque fichier est ouvert
+par memory-map : la lecture ne copie ni n'analyse rien, les colonnes
+pointent directement dans les pages du fichier. Le cache de pages du
+noyau est partagé : N workers gunicorn servent la même table pour le coût
+mémoire d'une seule copie.
+
+Un fichier remplacé (renommage atomique) change d'inode : la table est
+rouverte à la lecture suivante, les anciennes tranches restent valides tant
+qu'elles sont référencées.
+
+pyarrow (et numpy) ne sont importés qu'à la première table ouverte, comme
+Dash/pandas dans app.py : le démarrage des workers n'en paie pas le coût.
+"""
+import importlib.util
+import os
+import re
+import threading
+
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+ARROW_SUFFIX = ".arrow"
+ARROW_STREAM_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+_NAME = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+
+class ArrowTableStore:
+    """Tables Arrow d'un répertoire, mappées en mémoire et rouvertes quand le fichier change"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        if not _NAME.match(name):
+            raise KeyError(name)
+        return os.path.join(self.directory, name + ARROW_SUFFIX)
+
+    def names(self):
+        try:
+            entries = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(entry[:-len(ARROW_SUFFIX)] for entry in entries
+                      if entry.endswith(ARROW_SUFFIX) and _NAME.match(entry[:-len(ARROW_SUFFIX)]))
+
+    def version(self, name):
+        """(inode, date de modification) du fichier ; KeyError s'il est absent"""
+        try:
+            stat = os.stat(self._path(name))
+        except OSError:
+            raise KeyError(name)
+        return f"{stat.st_ino}-{stat.st_mtime_ns}"
+
+    def table(self, name):
+        """Table mappée en mémoire (aucune copie des colonnes)"""
+        version = self.version(name)
+        with self._lock:
+            entry = self._tables.get(name)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+        import pyarrow as pa
+
+        source = pa.memory_map(self._path(name), "r")
+        table = pa.ipc.open_file(source).read_all()
+        with self._lock:
+            self._tables[name] = (version, table)
+        return table
+
+    def describe(self, name):
+        table = self.table(name)
+        metadata = {k.decode("utf-8"): v.decode("utf-8") for k, v in (table.schema.metadata or {}).items()}
+        return {
+            "name": name,
+            "version": self.version(name),
+            "rows": table.num_rows,
+            "columns": [{"name": field.name, "type": str(field.type)} for field in table.schema],
+            "metadata": metadata,
+        }
+
+    def slice(self, name, offset=0, limit=None, columns=None):
+        """Tranche [offset, offset+limit) des colonnes demandées (vue sans copie)"""
+        table = self.table(name)
+        if columns:
+            unknown = [c for c in columns if c not in table.schema.names]
+            if unknown:
+                raise ValueError(f"colonnes inconnues: {', '.join(unknown)}")
+            table = table.select(columns)
+        return table.slice(offset, limit)
+
+
+def to_rows(table):
+    """Lignes JSON : dates et horodatages en ISO 8601 (le reste tel quel)"""
+    import pyarrow as pa
+
+    for i, field in enumerate(table.schema):
+        if pa.types.is_temporal(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.string()))
+    return table.to_pylist()
+
+
+def to_ipc_stream(table):
+    """Sérialise une table (ou tranche) au format Arrow IPC stream"""
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# webapp/bench_startup.py - Budget de démarrage d'un worker
+"""
+Mesure le coût de démarrage d'un worker : temps d'import de app.py et RSS
+après import, puis le surcoût du premier accès à /dashboard/ (chargement
+paresseux de Dash/Plotly/pandas ; pyarrow à la première table Arrow).
+Chaque mesure est faite dans un processus neuf, répétée plusieurs fois, et
+comparée à un budget.
+
+Usage:
+    python bench_startup.py --repeat 5 --max-import-ms 500 --max-rss-mb 60
+Code de sortie 1 si le budget est dépassé.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Exécuté dans un processus neuf : aucun module déjà chargé ne fausse la mesure
+PROBE = r"""
+import json, sys, time
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+base = rss_mb()
+t0 = time.perf_counter()
+import app
+import_ms = (time.perf_counter() - t0) * 1000
+result = {"import_ms": import_ms, "rss_mb": rss_mb(), "rss_delta_mb": rss_mb() - base,
+          "heavy_modules_loaded": sorted(m for m in ("dash", "plotly", "pandas", "pyarrow", "numpy")
+                                         if m in sys.modules)}
+if "--dashboard" in sys.argv:
+    client = app.flask_app.test_client()
+    t0 = time.perf_counter()
+    status = client.get("/dashboard/").status_code
+    result["dashboard_first_hit_ms"] = (time.perf_counter() - t0) * 1000
+    result["dashboard_status"] = status
+    result["rss_after_dashboard_mb"] = rss_mb()
+print(json.dumps(result))
+"""
+
+
+def run_once(with_dashboard):
+    args = [sys.executable, "-c", PROBE]
+    if with_dashboard:
+        args.append("--dashboard")
+    output = subprocess.run(args, cwd=HERE, capture_output=True, text=True, check=True).stdout
+    # app.py peut afficher des avertissements avant le JSON
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Budget de démarrage de la webapp")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=500.0)
+    parser.add_argument("--max-rss-mb", type=float, default=60.0)
+    parser.add_argument("--dashboard", action="store_true",
+                        help="Mesure aussi le premier accès à /dashboard/")
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    runs = [run_once(args.dashboard) for _ in range(args.repeat)]
+    report = {
+        "repeat": args.repeat,
+        "import_ms_median": statistics.median(r["import_ms"] for r in runs),
+        "rss_mb_median": statistics.median(r["rss_mb"] for r in runs),
+        "heavy_modules_loaded": runs[0]["heavy_modules_loaded"],
+        "budget": {"max_import_ms": args.max_import_ms, "max_rss_mb": args.max_rss_mb},
+    }
+    if args.dashboard:
+        report["dashboard_first_hit_ms_median"] = statistics.median(
+            r["dashboard_first_hit_ms"] for r in runs
+        )
+        report["rss_after_dashboard_mb_median"] = statistics.median(
+            r["rss_after_dashboard_mb"] for r in runs
+        )
+
+    failures = []
+    if report["import_ms_median"] > args.max_import_ms:
+        failures.append(f"import {report['import_ms_median']:.0f} ms > {args.max_import_ms:.0f} ms")
+    if report["rss_mb_median"] > args.max_rss_mb:
+        failures.append(f"RSS {report['rss_mb_median']:.1f} Mo > {args.max_rss_mb:.1f} Mo")
+    if report["heavy_modules_loaded"]:
+        failures.append(f"modules lourds chargés à l'import: {report['heavy_modules_loaded']}")
+    report["failures"] = failures
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    if failures:
+        print("❌ Budget de démarrage dépassé: " + "; ".join(failures))
+        sys.exit(1)
+    print("✓ Budget de démarrage respecté")
+
+
+if __name__ == "__main__":
+    main()
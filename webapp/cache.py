@@ -0,0 +1,245 @@
+# webapp/cache.py - Cache des réponses d'API indexé par version des données
+"""
+Les résultats d'analyse ne changent qu'à la publication d'une nouvelle
+exécution (run_id de bigdata.runs) ou à la réécriture d'une sortie HDFS
+(date de modification). Plutôt qu'un TTL aveugle, chaque entrée est rangée
+sous la version des données dont elle dérive : tant que la version ne
+change pas, la réponse est servie sans requête ; dès qu'elle change, les
+entrées de l'ancienne version sont invalidées.
+
+Deux niveaux :
+- LRU en mémoire du worker (borné en nombre d'entrées) ;
+- optionnel, un répertoire partagé entre les workers gunicorn (fichiers
+  JSON écrits atomiquement) : un résultat calculé par un worker sert aux
+  autres. Sur /dev/shm, ce niveau reste en mémoire (tmpfs) : il est borné
+  en octets, les fichiers les moins récemment lus sont supprimés d'abord.
+
+Le coût résiduel est la lecture de la version, elle-même mémorisée
+quelques secondes (`VersionProbe`).
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+
+def _slug(value):
+    """Nom de fichier sûr pour une version ou un espace de noms"""
+    return hashlib.sha1(str(value).encode("utf-8")).hexdigest()[:16]
+
+
+class VersionedCache:
+    """Cache LRU (+ niveau disque partagé) dont les clés incluent la version des données"""
+
+    def __init__(self, maxsize=256, disk_dir=None, disk_max_bytes=32 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._disk_written = 0  # octets écrits depuis le dernier élagage
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.disk_writes = 0
+        self.disk_evictions = 0
+        self.disk_errors = 0
+
+    def _disk_path(self, namespace, version, key):
+        return os.path.join(self.disk_dir, _slug(namespace), _slug(version), _slug(key) + ".json")
+
+    def _observe_version(self, namespace, version):
+        """Nouvelle version d'un espace : les entrées des versions précédentes sont retirées"""
+        previous = self._versions.get(namespace)
+        if previous == version:
+            return
+        self._versions[namespace] = version
+        if previous is None:
+            return
+        stale = [k for k in self._data if k[0] == namespace and k[1] != version]
+        for k in stale:
+            del self._data[k]
+        self.invalidations += len(stale)
+        if self.disk_dir:
+            namespace_dir = os.path.join(self.disk_dir, _slug(namespace))
+            keep = _slug(version)
+            try:
+                names = os.listdir(namespace_dir)
+            except OSError:
+                names = []
+            for name in names:
+                if name != keep:
+                    shutil.rmtree(os.path.join(namespace_dir, name), ignore_errors=True)
+
+    def _read_disk(self, namespace, version, key):
+        path = self._disk_path(namespace, version, key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)  # date de dernière lecture : ordre d'éviction
+            return True, value
+        except FileNotFoundError:
+            return False, None
+        except (OSError, ValueError):
+            self.disk_errors += 1
+            return False, None
+
+    def _write_disk(self, namespace, version, key, value):
+        path = self._disk_path(namespace, version, key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+                size = f.tell()
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            self.disk_errors += 1
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self.disk_writes += 1
+            self._disk_written += size
+            # Élagage après 1/8 du budget écrit par ce worker : dépassement borné
+            prune = self._disk_written >= self.disk_max_bytes // 8
+            if prune:
+                self._disk_written = 0
+        if prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Ramène le niveau disque sous son budget (3/4) en supprimant les moins récemment lus"""
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue  # écriture en cours dans un autre worker
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= self.disk_max_bytes:
+            return
+        evicted = 0
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes * 3 // 4:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self.disk_evictions += evicted
+
+    def _remember(self, full_key, value):
+        self._data[full_key] = value
+        self._data.move_to_end(full_key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, namespace, version, key, compute):
+        """Valeur en cache pour (espace, version, clé), calculée par `compute()` sinon
+
+        Une version None (source indisponible) désactive le cache.
+        """
+        if version is None:
+            with self._lock:
+                self.misses += 1
+            return compute()
+
+        full_key = (namespace, version, key)
+        with self._lock:
+            self._observe_version(namespace, version)
+            if full_key in self._data:
+                self._data.move_to_end(full_key)
+                self.hits += 1
+                return self._data[full_key]
+
+        if self.disk_dir:
+            found, value = self._read_disk(namespace, version, key)
+            if found:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(full_key, value)
+                return value
+
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            # Une version plus récente a pu être observée pendant le calcul
+            if self._versions.get(namespace) == version:
+                self._remember(full_key, value)
+        if self.disk_dir:
+            self._write_disk(namespace, version, key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "pid": os.getpid(),
+                "entries": len(self._data),
+                "maxsize": self.maxsize,
+                "disk_dir": self.disk_dir,
+                "disk_max_bytes": self.disk_max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.disk_hits) / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "disk_writes": self.disk_writes,
+                "disk_evictions": self.disk_evictions,
+                "disk_errors": self.disk_errors,
+                "versions": {ns: str(v) for ns, v in self._versions.items()},
+            }
+
+
+class VersionProbe:
+    """Version d'une source, relue au plus toutes les `interval` secondes
+
+    `fetch(*args)` retourne la version courante (run_id, date de
+    modification...) ; une erreur donne None (cache contourné).
+    """
+
+    def __init__(self, fetch, interval=5.0, clock=time.monotonic):
+        self.fetch = fetch
+        self.interval = interval
+        self.clock = clock
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, *args):
+        now = self.clock()
+        with self._lock:
+            entry = self._values.get(args)
+            if entry is not None and now - entry[0] < self.interval:
+                return entry[1]
+        try:
+            version = self.fetch(*args)
+        except Exception:
+            version = None
+        with self._lock:
+            self._values[args] = (now, version)
+        return version
@@ -0,0 +1,260 @@
+# webapp/connections.py - Connexions partagées du processus
+"""
+Couche de connexions partagée par toutes les requêtes d'un worker Flask.
+
+- un seul MongoClient longue durée, avec un pool borné ;
+- une requests.Session keep-alive, avec un pool HTTP borné ;
+- un exécuteur pour lancer les sondes en parallèle sous une échéance
+  globale unique, au lieu de les enchaîner avec 3 s d'attente chacune.
+
+Les objets sont créés à la demande et recréés après un fork : un
+MongoClient ne doit pas être partagé entre un master gunicorn et ses workers.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+try:
+    import pymongo
+    from pymongo import monitoring
+    MONGODB_AVAILABLE = True
+except ImportError:
+    MONGODB_AVAILABLE = False
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+
+HADOOP_MASTER = os.environ.get("HADOOP_MASTER", "hadoop-master")
+MONGODB_URI = os.environ.get(
+    "MONGODB_URI", f"mongodb://{os.environ.get('MONGODB_HOST', 'mongodb')}:27017/"
+)
+
+# Le bean NameNodeStatus suffit : /jmx complet renvoie plusieurs centaines de Ko
+NAMENODE_URL = f"http://{HADOOP_MASTER}:9870/jmx?qry=Hadoop:service=NameNode,name=NameNodeStatus"
+RESOURCEMANAGER_URL = f"http://{HADOOP_MASTER}:8088/ws/v1/cluster/info"
+SPARK_MASTER_URL = f"http://{HADOOP_MASTER}:8080/json/"
+WEBHDFS_URL = f"http://{HADOOP_MASTER}:9870/webhdfs/v1"
+
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "1"))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "10"))
+PROBE_DEADLINE_SECONDS = float(os.environ.get("PROBE_DEADLINE_SECONDS", "3"))
+
+
+class _PoolListener(monitoring.ConnectionPoolListener if MONGODB_AVAILABLE else object):
+    """Compteurs du pool MongoDB alimentés par les événements du driver"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checkout_failures = 0
+
+    def _inc(self, name, delta=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def connection_created(self, event):
+        self._inc("created")
+
+    def connection_closed(self, event):
+        self._inc("closed")
+
+    def connection_checked_out(self, event):
+        self._inc("checked_out")
+
+    def connection_checked_in(self, event):
+        self._inc("checked_out", -1)
+
+    def connection_check_out_failed(self, event):
+        self._inc("checkout_failures")
+
+    # Événements sans intérêt pour les statistiques
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "open": self.created - self.closed,
+                "in_use": self.checked_out,
+                "created": self.created,
+                "checkout_failures": self.checkout_failures,
+            }
+
+
+_lock = threading.Lock()
+_mongo_client = None
+_mongo_listener = None
+_http_session = None
+_executor = None
+
+
+def _reset_after_fork():
+    """Oublie les connexions héritées du processus parent"""
+    global _lock, _mongo_client, _mongo_listener, _http_session, _executor
+    _lock = threading.Lock()
+    _mongo_client = None
+    _mongo_listener = None
+    _http_session = None
+    _executor = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_mongo_client():
+    """MongoClient partagé du processus (None si pymongo est absent)"""
+    global _mongo_client, _mongo_listener
+    if not MONGODB_AVAILABLE:
+        return None
+    with _lock:
+        if _mongo_client is None:
+            _mongo_listener = _PoolListener()
+            _mongo_client = pymongo.MongoClient(
+                MONGODB_URI,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                maxIdleTimeMS=60000,
+                waitQueueTimeoutMS=2000,
+                connectTimeoutMS=int(PROBE_DEADLINE_SECONDS * 1000),
+                serverSelectionTimeoutMS=int(PROBE_DEADLINE_SECONDS * 1000),
+                event_listeners=[_mongo_listener],
+            )
+        return _mongo_client
+
+
+def get_http_session():
+    """Session HTTP keep-alive partagée (None si requests est absent)"""
+    global _http_session
+    if not REQUESTS_AVAILABLE:
+        return None
+    with _lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE,
+                                  max_retries=0, pool_block=False)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="probe")
+        return _executor
+
+
+def probe_http(url, timeout=PROBE_DEADLINE_SECONDS):
+    """Sonde HTTP : UP si le service répond 200"""
+    session = get_http_session()
+    if session is None:
+        return "NOT_CONFIGURED"
+    response = session.get(url, timeout=timeout)
+    return "UP" if response.status_code == 200 else "DOWN"
+
+
+def probe_mongodb():
+    """Sonde MongoDB : ping sur le client partagé"""
+    client = get_mongo_client()
+    if client is None:
+        return "NOT_CONFIGURED"
+    client.admin.command("ping")
+    return "UP"
+
+
+def run_probes(probes, deadline=PROBE_DEADLINE_SECONDS):
+    """Exécute les sondes en parallèle sous une échéance globale
+
+    `probes` associe un nom à une fonction sans argument retournant un statut.
+    Retourne ({nom: statut}, {nom: latence en ms}) ; une sonde en erreur ou
+    non terminée à l'échéance est marquée DOWN.
+    """
+    executor = _get_executor()
+
+    def timed(fn):
+        start = time.perf_counter()
+        try:
+            return fn(), (time.perf_counter() - start) * 1000
+        except Exception:
+            return "DOWN", (time.perf_counter() - start) * 1000
+
+    futures = {name: executor.submit(timed, fn) for name, fn in probes.items()}
+    wait(futures.values(), timeout=deadline)
+
+    statuses, latencies = {}, {}
+    for name, future in futures.items():
+        if future.done():
+            statuses[name], latency = future.result()
+            latencies[name] = round(latency, 1)
+        else:
+            future.cancel()
+            statuses[name] = "DOWN"
+            latencies[name] = None
+    return statuses, latencies
+
+
+def cluster_probes():
+    """Sondes standard du cluster (NameNode, ResourceManager, Spark, MongoDB)"""
+    return {
+        "namenode": lambda: probe_http(NAMENODE_URL),
+        "resourcemanager": lambda: probe_http(RESOURCEMANAGER_URL),
+        "sparkmaster": lambda: probe_http(SPARK_MASTER_URL),
+        "mongodb": probe_mongodb,
+    }
+
+
+def pool_stats():
+    """Statistiques des pools MongoDB et HTTP du processus"""
+    stats = {"pid": os.getpid()}
+
+    if _mongo_listener is not None:
+        stats["mongodb"] = _mongo_listener.snapshot()
+    else:
+        stats["mongodb"] = None
+
+    session = _http_session
+    if session is not None:
+        hosts = {}
+        adapter = session.get_adapter("http://")
+        for key in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            hosts[f"{pool.host}:{pool.port}"] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                # La file contient des None pour les emplacements jamais ouverts
+                "idle": sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                if pool.pool is not None else 0,
+            }
+        stats["http"] = {"pool_maxsize": HTTP_POOL_MAXSIZE, "hosts": hosts}
+    else:
+        stats["http"] = None
+    return stats
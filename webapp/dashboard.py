@@ -0,0 +1,208 @@
+# webapp/dashboard.py - Dashboard Dash alimenté par des cubes pré-agrégés
+"""
+Dashboard interactif monté sur /dashboard/.
+
+Les graphiques ne lisent jamais les ventes brutes : ils interrogent un cube
+pré-agrégé (mois x catégorie x région x ville) écrit par les jobs Spark dans
+data/cubes/. Le cube est rechargé uniquement quand le fichier change, et les
+résultats des callbacks sont mémorisés par clé de filtre (LRU + TTL).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import plotly.express as px
+from dash import Dash, Input, Output, dcc, html
+
+CUBE_DIR = os.environ.get(
+    "CUBE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cubes")
+)
+CUBE_FILE = "sales_cube.csv"
+CUBE_DIMENSIONS = ["month", "category", "region", "city"]
+CUBE_MEASURES = ["orders", "quantity", "revenue"]
+
+
+class TTLLRUCache:
+    """Cache LRU borné dont les entrées expirent après `ttl` secondes"""
+
+    def __init__(self, maxsize=256, ttl=300.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < self.clock():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CubeStore:
+    """Cube des ventes rechargé uniquement quand le fichier est modifié"""
+
+    def __init__(self, cube_dir=CUBE_DIR, check_interval=5.0):
+        self.path = os.path.join(cube_dir, CUBE_FILE)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._cube = None
+        self._version = None
+        self._last_check = 0.0
+
+    def _empty(self):
+        return pd.DataFrame({
+            **{dim: pd.Series(dtype="object") for dim in CUBE_DIMENSIONS},
+            **{measure: pd.Series(dtype="float64") for measure in CUBE_MEASURES},
+        })
+
+    def get(self):
+        """Retourne (version, cube) ; la version change à chaque nouveau fichier"""
+        now = time.monotonic()
+        with self._lock:
+            if self._cube is not None and now - self._last_check < self.check_interval:
+                return self._version, self._cube
+            self._last_check = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                if self._cube is None:
+                    self._cube, self._version = self._empty(), None
+                return self._version, self._cube
+            if mtime != self._version:
+                cube = pd.read_csv(self.path, dtype={dim: "string" for dim in CUBE_DIMENSIONS})
+                for dim in CUBE_DIMENSIONS:
+                    cube[dim] = cube[dim].fillna("Inconnu").astype("category")
+                self._cube, self._version = cube, mtime
+            return self._version, self._cube
+
+
+def _filter_key(months, categories, regions):
+    return (
+        tuple(months or ()),
+        tuple(sorted(categories or ())),
+        tuple(sorted(regions or ())),
+    )
+
+
+def query_cube(store, cache, months=None, categories=None, regions=None):
+    """Agrégats par catégorie, région, mois et ville pour un jeu de filtres"""
+    version, cube = store.get()
+    key = (version, _filter_key(months, categories, regions))
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    mask = pd.Series(True, index=cube.index)
+    if months:
+        mask &= cube["month"].astype("string").between(months[0], months[-1])
+    if categories:
+        mask &= cube["category"].isin(categories)
+    if regions:
+        mask &= cube["region"].isin(regions)
+    selection = cube[mask]
+
+    result = {
+        dim: selection.groupby(dim, observed=True)["revenue"].sum()
+        .reset_index().sort_values("revenue", ascending=False)
+        for dim in CUBE_DIMENSIONS
+    }
+    result["month"] = result["month"].sort_values("month")
+    result["totals"] = {measure: float(selection[measure].sum()) for measure in CUBE_MEASURES}
+    cache.put(key, result)
+    return result
+
+
+def create_dashboard(server, requests_pathname_prefix="/dashboard/",
+                     routes_pathname_prefix="/dashboard/", store=None, cache=None):
+    """Construit l'application Dash et la monte sur le serveur Flask"""
+    store = store or CubeStore()
+    cache = cache or TTLLRUCache(
+        maxsize=int(os.environ.get("DASH_CACHE_SIZE", "256")),
+        ttl=float(os.environ.get("DASH_CACHE_TTL", "300")),
+    )
+    app = Dash(__name__, server=server,
+               requests_pathname_prefix=requests_pathname_prefix,
+               routes_pathname_prefix=routes_pathname_prefix,
+               title="Big Data UCAO - Dashboard")
+
+    def options(dim):
+        _, cube = store.get()
+        return [{"label": v, "value": v} for v in sorted(cube[dim].astype("string").dropna().unique())]
+
+    def serve_layout():
+        # Layout recalculé à chaque chargement de page : nouveaux mois/catégories
+        months = [o["value"] for o in options("month")]
+        return html.Div([
+            html.H1("Dashboard Interactif"),
+            html.P(html.A("Retour à l'accueil", href="/")),
+            html.Div([
+                dcc.Dropdown(id="filter-category", options=options("category"), multi=True,
+                             placeholder="Catégories"),
+                dcc.Dropdown(id="filter-region", options=options("region"), multi=True,
+                             placeholder="Régions"),
+                dcc.RangeSlider(
+                    id="filter-month", min=0, max=max(len(months) - 1, 0), step=1,
+                    value=[0, max(len(months) - 1, 0)],
+                    marks={i: m for i, m in enumerate(months)},
+                ),
+                dcc.Store(id="months", data=months),
+            ]),
+            html.H4(id="totals"),
+            dcc.Graph(id="graph-category"),
+            dcc.Graph(id="graph-region"),
+            dcc.Graph(id="graph-month"),
+            dcc.Graph(id="graph-city"),
+        ], style={"padding": "20px"})
+
+    app.layout = serve_layout
+
+    @app.callback(
+        Output("totals", "children"),
+        Output("graph-category", "figure"),
+        Output("graph-region", "figure"),
+        Output("graph-month", "figure"),
+        Output("graph-city", "figure"),
+        Input("filter-category", "value"),
+        Input("filter-region", "value"),
+        Input("filter-month", "value"),
+        Input("months", "data"),
+    )
+    def update(categories, regions, month_range, months):
+        selected = None
+        if months and month_range:
+            selected = [months[month_range[0]], months[month_range[1]]]
+        result = query_cube(store, cache, selected, categories, regions)
+        totals = result["totals"]
+        return (
+            f"{int(totals['orders'])} commandes - CA {totals['revenue']:.2f}",
+            px.bar(result["category"], x="category", y="revenue", title="CA par catégorie"),
+            px.pie(result["region"], names="region", values="revenue", title="CA par région"),
+            px.line(result["month"], x="month", y="revenue", markers=True, title="CA par mois"),
+            px.bar(result["city"].head(10), x="city", y="revenue", title="Top 10 villes"),
+        )
+
+    app.cube_store = store
+    app.result_cache = cache
+    return app
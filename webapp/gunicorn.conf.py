@@ -0,0 +1,70 @@
+# webapp/gunicorn.conf.py - Configuration de production
+"""
+Service de production : gunicorn -c gunicorn.conf.py app:flask_app
+
+Les endpoints sont limités par les E/S (sondes, MongoDB, flux SSE qui
+gardent une connexion ouverte) : on utilise des workers gthread, peu de
+processus et beaucoup de threads. Toutes les valeurs sont surchargeables
+par variables d'environnement.
+"""
+import os
+
+
+def _cpu_count():
+    """Nombre de CPU réellement alloués au conteneur (quota cgroup inclus)"""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            count = min(count, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+worker_class = "gthread"
+workers = int(os.environ.get("GUNICORN_WORKERS", min(max(2, _cpu_count()), 8)))
+# Chaque abonné /api/stream occupe un thread pendant toute sa connexion
+threads = int(os.environ.get("GUNICORN_THREADS", "32"))
+
+# Import unique dans le master puis fork : démarrage plus rapide des workers.
+# Les connexions et threads de fond sont créés après le fork (voir post_fork).
+preload_app = True
+
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "20"))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "500"))
+backlog = 512
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
+
+
+def post_fork(server, worker):
+    """Démarre les sondes de santé dès le fork, sans attendre une requête"""
+    import app
+    app.start_background_tasks()
+
+
+def worker_exit(server, worker):
+    """Dernière publication des métriques du worker avant sa sortie"""
+    import app
+    app.request_metrics.flush()
+
+
+def child_exit(server, worker):
+    """Master : fusionne les métriques du worker terminé (fichiers bornés)"""
+    import app
+    import metrics
+    try:
+        metrics.mark_process_dead(worker.pid, app.METRICS_DIR)
+    except OSError as e:
+        server.log.warning("Métriques du worker %s non fusionnées: %s", worker.pid, e)
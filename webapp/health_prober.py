@@ -0,0 +1,110 @@
+# webapp/health_prober.py - Sondes de santé en arrière-plan
+"""
+Sonde périodiquement les dépendances du cluster dans un thread dédié et
+conserve le dernier instantané. Les endpoints lisent cet instantané : le
+nombre de clients du dashboard n'a plus d'effet sur le trafic vers le cluster.
+
+Chaque dépendance a sa propre échéance : toutes les `interval` secondes si
+elle répond, avec un backoff exponentiel (plafonné à `max_interval`) quand
+elle échoue. Une gigue aléatoire évite que plusieurs workers ne sondent en
+même temps.
+"""
+import random
+import threading
+import time
+
+import connections
+
+
+class HealthProber:
+    """Thread de sondes avec instantané du dernier état connu"""
+
+    def __init__(self, probes, interval=10.0, max_interval=120.0, jitter=0.2,
+                 deadline=connections.PROBE_DEADLINE_SECONDS, clock=time.time):
+        self.probes = probes
+        self.interval = interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.deadline = deadline
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._next_due = {name: 0.0 for name in probes}
+        self._state = {
+            name: {"status": "UNKNOWN", "latency_ms": None, "checked_at": None,
+                   "consecutive_failures": 0}
+            for name in probes
+        }
+        self._last_round = None
+
+    def _delay(self, failures):
+        base = self.interval if failures == 0 else min(
+            self.max_interval, self.interval * (2 ** failures)
+        )
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def probe_once(self, names=None):
+        """Sonde les dépendances indiquées (toutes par défaut) et met à jour l'état"""
+        names = list(self.probes) if names is None else names
+        statuses, latencies = connections.run_probes(
+            {name: self.probes[name] for name in names}, deadline=self.deadline
+        )
+        now = self.clock()
+        with self._lock:
+            for name in names:
+                state = self._state[name]
+                state["status"] = statuses[name]
+                state["latency_ms"] = latencies[name]
+                state["checked_at"] = now
+                if statuses[name] in ("UP", "NOT_CONFIGURED"):
+                    state["consecutive_failures"] = 0
+                else:
+                    state["consecutive_failures"] += 1
+                self._next_due[name] = now + self._delay(state["consecutive_failures"])
+            self._last_round = now
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = self.clock()
+            with self._lock:
+                due = [name for name, t in self._next_due.items() if t <= now]
+            if due:
+                try:
+                    self.probe_once(due)
+                except Exception as e:
+                    print(f"Erreur lors des sondes de santé: {e}")
+            with self._lock:
+                wait = min(self._next_due.values()) - self.clock()
+            self._stop.wait(max(0.1, wait))
+
+    def start(self):
+        """Démarre le thread de sondes (idempotent)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def snapshot(self):
+        """Dernier état connu, avec l'âge de chaque mesure"""
+        now = self.clock()
+        with self._lock:
+            dependencies = {}
+            for name, state in self._state.items():
+                entry = dict(state)
+                entry["age_seconds"] = None if state["checked_at"] is None \
+                    else round(now - state["checked_at"], 3)
+                del entry["checked_at"]
+                dependencies[name] = entry
+            age = None if self._last_round is None else round(now - self._last_round, 3)
+        return {"dependencies": dependencies, "snapshot_age_seconds": age}
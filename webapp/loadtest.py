@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# webapp/loadtest.py - Test de charge des endpoints de la webapp
+"""
+Petit harnais de charge façon wrk : N clients concurrents (threads, chacun
+avec sa session keep-alive) frappent un endpoint pendant une durée donnée.
+Pour chaque endpoint on relève req/s, latences p50/p90/p99 et erreurs.
+
+Usage:
+    python loadtest.py --url http://localhost:5000 --concurrency 32 --duration 20
+    python loadtest.py --endpoints /api/stats /health --output results.json
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+DEFAULT_ENDPOINTS = ["/api/stats", "/api/hadoop_status", "/health"]
+
+
+def percentile(sorted_values, p):
+    """Percentile par rang le plus proche sur une liste triée"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_endpoint(url, concurrency, duration, warmup, timeout):
+    """Charge un endpoint et retourne ses métriques"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+
+    def client():
+        session = requests.Session()
+        local_latencies = []
+        local_errors = 0
+        start_barrier.wait()
+        # Échauffement : connexions ouvertes, caches chauds, hors mesure
+        warm_end = time.perf_counter() + warmup
+        while time.perf_counter() < warm_end:
+            try:
+                session.get(url, timeout=timeout)
+            except requests.RequestException:
+                pass
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end:
+            t0 = time.perf_counter()
+            try:
+                response = session.get(url, timeout=timeout)
+                ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - t0
+            if ok:
+                local_latencies.append(elapsed)
+            else:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    start_barrier.wait()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "req_per_s": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(ms, 50), 2) if ms else None,
+        "p90_ms": round(percentile(ms, 90), 2) if ms else None,
+        "p99_ms": round(percentile(ms, 99), 2) if ms else None,
+        "max_ms": round(ms[-1], 2) if ms else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de la webapp")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--endpoints", nargs="+", default=DEFAULT_ENDPOINTS)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    report = {
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "timestamp": datetime.now().isoformat(),
+        "endpoints": {},
+    }
+    print(f"{'endpoint':<22}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'erreurs':>10}")
+    for endpoint in args.endpoints:
+        result = run_endpoint(args.url.rstrip("/") + endpoint, args.concurrency,
+                              args.duration, args.warmup, args.timeout)
+        report["endpoints"][endpoint] = result
+        print(f"{endpoint:<22}{result['req_per_s']:>10}{str(result['p50_ms']):>10}"
+              f"{str(result['p99_ms']):>10}{result['errors']:>10}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Résultats enregistrés: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
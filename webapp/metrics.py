@@ -0,0 +1,292 @@
+# webapp/metrics.py - Métriques au format d'exposition Prometheus
+"""
+Instrumentation des chemins chauds de l'application, exposée sur /metrics
+au format texte de Prometheus (version 0.0.4), sans dépendance :
+
+- latence de chaque route (histogramme par route, méthode et code HTTP) ;
+- latence et état de la dernière sonde de chaque dépendance ;
+- occupation des pools MongoDB et HTTP du worker.
+
+Chaque worker gunicorn a ses propres compteurs. Avec `METRICS_DIR`
+(répertoire partagé, ex. /dev/shm), chaque worker y publie ses histogrammes
+au plus toutes les `flush_interval` secondes et /metrics additionne ceux de
+tous les workers, y compris ceux déjà recyclés (max_requests) : les
+compteurs restent monotones. À la sortie d'un worker, le master fusionne
+son fichier dans `requests-dead.json` et le supprime (`mark_process_dead`,
+hook gunicorn `child_exit`) : le nombre de fichiers suit celui des workers
+vivants. Les jauges décrivent le worker qui répond (label `pid`).
+"""
+import json
+import os
+import threading
+import time
+
+# Séries cumulées des workers terminés, avec les derniers pid fusionnés :
+# un fichier de worker encore présent après sa fusion n'est pas recompté
+DEAD_WORKERS_FILE = "requests-dead.json"
+DEAD_PIDS_KEPT = 16
+
+# Bornes (secondes) adaptées aux endpoints : cache mémoire ~1 ms, sondes ~3 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+class Histogram:
+    """Histogramme cumulatif étiqueté (une série par combinaison de labels)"""
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [comptes par borne (non cumulés) + débordement, somme]
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        series[0][index] += 1
+        series[1] += value
+
+    def dump(self):
+        return [[list(labels), counts, total] for labels, (counts, total) in self._series.items()]
+
+    def merge(self, dumped):
+        """Ajoute les séries exportées par `dump()` (autre worker)"""
+        for labels, counts, total in dumped:
+            labels = tuple(labels)
+            if len(counts) != len(self.buckets) + 1:
+                continue  # bornes modifiées entre deux versions : série ignorée
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0] = [a + b for a, b in zip(series[0], counts)]
+            series[1] += total
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels in sorted(self._series):
+            counts, total = self._series[labels]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _labels(self.label_names, labels, [("le", _number(float(bound)))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            plain = _labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{plain} {total}")
+            lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+def gauge(name, help_text, samples, label_names=()):
+    """Lignes d'une jauge ; `samples` : liste de (valeurs des labels, valeur)"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for values, value in samples:
+        if value is None:
+            continue
+        lines.append(f"{name}{_labels(label_names, values)} {_number(value)}")
+    return lines
+
+
+class RequestMetrics:
+    """Latence des routes Flask du worker, partagée entre workers via `disk_dir`"""
+
+    NAME = "webapp_request_duration_seconds"
+
+    def __init__(self, disk_dir=None, flush_interval=5.0, buckets=DEFAULT_BUCKETS, clock=time.monotonic):
+        self.disk_dir = disk_dir
+        self.flush_interval = flush_interval
+        self.buckets = buckets
+        self.clock = clock
+        self._histogram = self._new_histogram()
+        self._lock = threading.Lock()
+        self._last_flush = clock()
+        self._pid = os.getpid()
+
+    def _new_histogram(self):
+        return Histogram(self.NAME, "Durée de traitement des requêtes par route",
+                         ("route", "method", "status"), self.buckets)
+
+    def _reset_if_forked(self):
+        # Le master (preload_app) n'a rien servi, mais un fork hérite de l'objet
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._histogram = self._new_histogram()
+            self._lock = threading.Lock()
+
+    def observe(self, route, method, status, seconds):
+        self._reset_if_forked()
+        with self._lock:
+            self._histogram.observe((route, method, str(status)), seconds)
+            due = self.disk_dir and self.clock() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Publie les séries du worker dans `disk_dir` (écriture atomique)"""
+        if not self.disk_dir:
+            return
+        with self._lock:
+            payload = self._histogram.dump()
+            self._last_flush = self.clock()
+        path = os.path.join(self.disk_dir, f"requests-{os.getpid()}.json")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def render(self):
+        """Histogramme de tous les workers (ou du seul worker sans `disk_dir`)"""
+        self._reset_if_forked()
+        if not self.disk_dir:
+            with self._lock:
+                return self._histogram.render()
+
+        self.flush()
+        merged = self._new_histogram()
+        try:
+            names = os.listdir(self.disk_dir)
+        except OSError:
+            names = []
+        dead_pids = set()
+        if DEAD_WORKERS_FILE in names:
+            try:
+                with open(os.path.join(self.disk_dir, DEAD_WORKERS_FILE), encoding="utf-8") as f:
+                    dead = json.load(f)
+                merged.merge(dead["series"])
+                dead_pids = {f"requests-{pid}.json" for pid in dead["pids"]}
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+        for name in names:
+            if not (name.startswith("requests-") and name.endswith(".json")) \
+                    or name == DEAD_WORKERS_FILE or name in dead_pids:
+                continue
+            try:
+                with open(os.path.join(self.disk_dir, name), encoding="utf-8") as f:
+                    merged.merge(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return merged.render()
+
+
+def _write_json(path, payload):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def mark_process_dead(pid, disk_dir, buckets=DEFAULT_BUCKETS):
+    """Fusionne les séries d'un worker terminé dans DEAD_WORKERS_FILE et supprime son fichier
+
+    Appelé par le master gunicorn (child_exit), seul écrivain de DEAD_WORKERS_FILE.
+    """
+    if not disk_dir:
+        return
+    path = os.path.join(disk_dir, f"requests-{pid}.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            dumped = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError):
+        dumped = []
+    dead_path = os.path.join(disk_dir, DEAD_WORKERS_FILE)
+    merged = Histogram(RequestMetrics.NAME, "", ("route", "method", "status"), buckets)
+    pids = []
+    try:
+        with open(dead_path, encoding="utf-8") as f:
+            dead = json.load(f)
+        merged.merge(dead["series"])
+        pids = dead["pids"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    merged.merge(dumped)
+    pids = (pids + [pid])[-DEAD_PIDS_KEPT:]
+    _write_json(dead_path, {"pids": pids, "series": merged.dump()})
+    os.remove(path)
+
+
+def probe_lines(snapshot):
+    """Jauges des sondes de santé à partir de `HealthProber.snapshot()`"""
+    dependencies = snapshot["dependencies"]
+    latency = [((name,), None if dep["latency_ms"] is None else dep["latency_ms"] / 1000.0)
+               for name, dep in sorted(dependencies.items())]
+    up = [((name,), 1 if dep["status"] in ("UP", "NOT_CONFIGURED") else 0)
+          for name, dep in sorted(dependencies.items()) if dep["status"] != "UNKNOWN"]
+    failures = [((name,), dep["consecutive_failures"]) for name, dep in sorted(dependencies.items())]
+    age = [((name,), dep["age_seconds"]) for name, dep in sorted(dependencies.items())]
+    return (
+        gauge("webapp_probe_latency_seconds", "Latence de la dernière sonde", latency, ("dependency",))
+        + gauge("webapp_probe_up", "Dernière sonde réussie (1) ou en échec (0)", up, ("dependency",))
+        + gauge("webapp_probe_consecutive_failures", "Échecs consécutifs de la sonde",
+                failures, ("dependency",))
+        + gauge("webapp_probe_age_seconds", "Âge de la dernière sonde", age, ("dependency",))
+    )
+
+
+def pool_lines(stats):
+    """Jauges des pools de connexions à partir de `connections.pool_stats()`"""
+    pid = (str(stats["pid"]),)
+    lines = []
+    mongo = stats.get("mongodb")
+    if mongo is not None:
+        lines += gauge("webapp_mongo_pool_max_size", "Taille maximale du pool MongoDB",
+                       [(pid, mongo["max_pool_size"])], ("pid",))
+        lines += gauge("webapp_mongo_pool_open_connections", "Connexions MongoDB ouvertes",
+                       [(pid, mongo["open"])], ("pid",))
+        lines += gauge("webapp_mongo_pool_in_use_connections", "Connexions MongoDB empruntées",
+                       [(pid, mongo["in_use"])], ("pid",))
+        lines += gauge("webapp_mongo_pool_checkout_failures", "Échecs d'emprunt au pool MongoDB (cumul)",
+                       [(pid, mongo["checkout_failures"])], ("pid",))
+    http = stats.get("http")
+    if http is not None:
+        hosts = sorted(http["hosts"].items())
+        lines += gauge("webapp_http_pool_opened_connections", "Connexions HTTP ouvertes par hôte (cumul)",
+                       [((pid[0], host), h["connections_opened"]) for host, h in hosts], ("pid", "host"))
+        lines += gauge("webapp_http_pool_idle_connections", "Connexions HTTP inactives par hôte",
+                       [((pid[0], host), h["idle"]) for host, h in hosts], ("pid", "host"))
+    return lines
+
+
+def render(*sections):
+    """Document d'exposition complet à partir de listes de lignes"""
+    return "\n".join(line for section in sections for line in section) + "\n"
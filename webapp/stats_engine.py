@@ -0,0 +1,233 @@
+# webapp/stats_engine.py - Agrégats incrémentaux pour /api/stats
+"""
+Moteur de statistiques maintenues en continu à partir de bigdata.sales.
+
+Au lieu de relancer une agrégation complète à chaque appel de /api/stats,
+le moteur rattrape une seule fois l'historique puis applique uniquement les
+nouvelles ventes, soit via un change stream MongoDB (replica set), soit en
+suivant un filigrane (watermark) sur `_id`. Une requête HTTP ne coûte alors
+qu'une lecture O(1) de l'état courant.
+
+La collection est injectée : un client pymongo réel ou une collection
+mongomock conviennent tous les deux.
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+try:
+    from bson import ObjectId
+except ImportError:  # pymongo absent : le moteur reste importable
+    ObjectId = None
+
+
+class HyperLogLog:
+    """Sketch HyperLogLog pour estimer le nombre de clients distincts"""
+
+    def __init__(self, precision=14):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision doit être comprise entre 4 et 18")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registres = bytearray(self.m)
+
+    def add(self, valeur):
+        h = int.from_bytes(
+            hashlib.blake2b(str(valeur).encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        index = h >> (64 - self.precision)
+        reste = h & ((1 << (64 - self.precision)) - 1)
+        rang = (64 - self.precision) - reste.bit_length() + 1
+        if rang > self.registres[index]:
+            self.registres[index] = rang
+
+    def merge(self, autre):
+        if autre.precision != self.precision:
+            raise ValueError("Impossible de fusionner des sketches de précisions différentes")
+        self.registres = bytearray(max(a, b) for a, b in zip(self.registres, autre.registres))
+
+    def __len__(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimation = alpha * m * m / sum(2.0 ** -r for r in self.registres)
+        vides = self.registres.count(0)
+        # Correction petites cardinalités (linear counting)
+        if estimation <= 2.5 * m and vides:
+            estimation = m * math.log(m / vides)
+        return int(round(estimation))
+
+
+class SalesStatsEngine:
+    """Agrégats courants (ventes, CA, fenêtre glissante, clients uniques)"""
+
+    def __init__(self, collection, window_seconds=3600, distinct="exact",
+                 batch_size=1000, overlap_seconds=5, clock=time.time):
+        self.collection = collection
+        self.window_seconds = window_seconds
+        self.batch_size = batch_size
+        self.overlap_seconds = overlap_seconds
+        self.clock = clock
+
+        self.total_sales = 0
+        self.total_revenue = 0.0
+        self.customers = HyperLogLog() if distinct == "hll" else set()
+
+        # Horodatages des ventes dans la fenêtre glissante (ordre croissant)
+        self._window = deque()
+        # Derniers _id vus pendant la période de recouvrement, pour dédoublonner
+        self._recent_ids = deque()
+        self._recent_set = set()
+        self._watermark = None
+        self._last_update = None
+        self._mode = "watermark"
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Application des ventes
+    # ------------------------------------------------------------------
+    def _event_time(self, doc):
+        """Heure de la vente : horodatage de l'ObjectId, sinon l'heure courante"""
+        oid = doc.get("_id")
+        if ObjectId is not None and isinstance(oid, ObjectId):
+            return oid.generation_time.timestamp()
+        return self.clock()
+
+    def apply(self, doc):
+        """Intègre une vente dans les agrégats (ignorée si déjà vue)"""
+        oid = doc.get("_id")
+        with self._lock:
+            if oid is not None and oid in self._recent_set:
+                return
+            event_time = self._event_time(doc)
+            if "total_value" in doc:
+                revenue = float(doc["total_value"] or 0)
+            else:
+                revenue = float(doc.get("quantity") or 0) * float(doc.get("price") or 0)
+
+            self.total_sales += 1
+            self.total_revenue += revenue
+            if doc.get("customer_id") is not None:
+                self.customers.add(doc["customer_id"])
+
+            # Insertion triée : les ventes arrivent quasiment dans l'ordre,
+            # l'historique ancien n'entre jamais dans la fenêtre
+            if event_time >= self.clock() - self.window_seconds:
+                i = len(self._window)
+                while i > 0 and self._window[i - 1] > event_time:
+                    i -= 1
+                self._window.insert(i, event_time)
+
+            if oid is not None:
+                self._recent_ids.append((event_time, oid))
+                self._recent_set.add(oid)
+                if self._watermark is None or event_time > self._watermark:
+                    self._watermark = event_time
+            self._forget_old_ids()
+            self._last_update = self.clock()
+
+    def _forget_old_ids(self):
+        if self._watermark is None:
+            return
+        # Une seconde de marge : les ObjectId sont horodatés à la seconde
+        limite = self._watermark - self.overlap_seconds - 1
+        while self._recent_ids and self._recent_ids[0][0] < limite:
+            _, oid = self._recent_ids.popleft()
+            self._recent_set.discard(oid)
+
+    # ------------------------------------------------------------------
+    # Lecture de MongoDB
+    # ------------------------------------------------------------------
+    def _tail_query(self):
+        """Filtre des ventes postérieures au filigrane (avec recouvrement)
+
+        Les ObjectId générés par plusieurs clients ne sont monotones qu'à la
+        seconde près : on relit donc une petite période de recouvrement, les
+        doublons étant écartés par `apply`.
+        """
+        if self._watermark is None or ObjectId is None:
+            return {}
+        debut = datetime.fromtimestamp(self._watermark - self.overlap_seconds, tz=timezone.utc)
+        return {"_id": {"$gte": ObjectId.from_datetime(debut)}}
+
+    def catch_up(self):
+        """Applique toutes les ventes insérées depuis le dernier filigrane"""
+        with self._lock:
+            query = self._tail_query()
+        applied = 0
+        cursor = self.collection.find(query).sort("_id", 1).batch_size(self.batch_size)
+        for doc in cursor:
+            self.apply(doc)
+            applied += 1
+        with self._lock:
+            self._last_update = self.clock()
+        return applied
+
+    def _watch(self):
+        """Consomme le change stream ; lève une exception hors replica set"""
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        with self.collection.watch(pipeline, max_await_time_ms=1000) as stream:
+            # Le flux est ouvert avant le rattrapage : aucune insertion perdue
+            self.catch_up()
+            self._mode = "change_stream"
+            while not self._stop.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    self.apply(change["fullDocument"])
+                else:
+                    with self._lock:
+                        self._last_update = self.clock()
+
+    def _run(self, poll_interval):
+        try:
+            self._watch()
+        except Exception as e:
+            # MongoDB autonome ou mongomock : pas de change streams
+            print(f"Change stream indisponible ({e}), suivi par filigrane _id")
+        self._mode = "watermark"
+        while not self._stop.is_set():
+            try:
+                self.catch_up()
+            except Exception as e:
+                print(f"Erreur lors du rattrapage des ventes: {e}")
+            self._stop.wait(poll_interval)
+
+    def start(self, poll_interval=2.0):
+        """Démarre la mise à jour en arrière-plan (idempotent)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(poll_interval,), name="stats-engine", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    # ------------------------------------------------------------------
+    # Lecture des agrégats
+    # ------------------------------------------------------------------
+    def snapshot(self):
+        """État courant des métriques, en temps constant amorti"""
+        now = self.clock()
+        with self._lock:
+            limite = now - self.window_seconds
+            while self._window and self._window[0] < limite:
+                self._window.popleft()
+            return {
+                "total_sales": self.total_sales,
+                "total_revenue": round(self.total_revenue, 2),
+                "realtime_sales": len(self._window),
+                "unique_customers": len(self.customers),
+                "window_seconds": self.window_seconds,
+                "update_mode": self._mode,
+                "last_update_age": None if self._last_update is None
+                else round(now - self._last_update, 3),
+            }
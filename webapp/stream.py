@@ -0,0 +1,135 @@
+# webapp/stream.py - Diffusion Server-Sent Events
+"""
+Canal push pour le dashboard : un seul thread calcule l'état (statistiques +
+statut des services) et le diffuse à tous les abonnés, au lieu que chaque
+navigateur interroge deux endpoints toutes les 10 secondes.
+
+- un abonné reçoit d'abord l'état complet (`snapshot`), puis seulement les
+  valeurs modifiées (`delta`) ;
+- chaque abonné a une file bornée : un client trop lent ne bloque jamais la
+  diffusion. En cas de débordement, sa file est vidée et remplacée par un
+  nouvel état complet, ce qui garde ses deltas cohérents.
+"""
+import json
+import queue
+import threading
+
+
+def compute_delta(old, new):
+    """Différence récursive entre deux états (clés modifiées ou ajoutées)"""
+    delta = {}
+    for key, value in new.items():
+        previous = old.get(key) if isinstance(old, dict) else None
+        if isinstance(value, dict) and isinstance(previous, dict):
+            sub = compute_delta(previous, value)
+            if sub:
+                delta[key] = sub
+        elif previous != value or key not in old:
+            delta[key] = value
+    return delta
+
+
+def format_sse(event, data):
+    """Encode un événement au format text/event-stream"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Broadcaster:
+    """Diffuse un état calculé une fois vers N abonnés"""
+
+    def __init__(self, compute_state, interval=2.0, queue_size=16, heartbeat=15.0):
+        self.compute_state = compute_state
+        self.interval = interval
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._state = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.dropped = 0
+
+    def subscribe(self):
+        """Nouvel abonné : sa file commence par l'état complet courant"""
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if self._state is not None:
+                q.put_nowait(("snapshot", self._state))
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _offer(self, q, event, data):
+        try:
+            q.put_nowait((event, data))
+        except queue.Full:
+            # Client lent : on abandonne ses deltas en attente et on le resynchronise
+            self.dropped += 1
+            while True:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    break
+            q.put_nowait(("snapshot", self._state))
+
+    def publish_once(self):
+        """Calcule l'état et diffuse le delta s'il y a du changement"""
+        new_state = self.compute_state()
+        with self._lock:
+            if self._state is None:
+                self._state = new_state
+                for q in self._subscribers:
+                    self._offer(q, "snapshot", new_state)
+                return new_state
+            delta = compute_delta(self._state, new_state)
+            if not delta:
+                return None
+            self._state = new_state
+            for q in self._subscribers:
+                self._offer(q, "delta", delta)
+            return delta
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.publish_once()
+            except Exception as e:
+                print(f"Erreur lors de la diffusion: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Démarre le thread de diffusion (idempotent)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sse-broadcaster", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def events(self):
+        """Générateur SSE pour un abonné ; se désabonne à la déconnexion"""
+        q = self.subscribe()
+        try:
+            yield f"retry: {int(self.interval * 1000)}\n\n"
+            while True:
+                try:
+                    event, data = q.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    # Commentaire SSE : garde la connexion ouverte à travers les proxys
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event, data)
+        finally:
+            self.unsubscribe(q)